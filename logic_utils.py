@@ -5,42 +5,87 @@
 
 """Python infrastructure for our logic course."""
 
+from collections import OrderedDict
 from functools import wraps
-from typing import Any, Dict, Iterator, Set, Type, TypeVar
+from threading import Lock
+from types import FunctionType
+from typing import (Any, Callable, Dict, Hashable, Iterator, NamedTuple, Set,
+                    Type, TypeVar)
 
 T = TypeVar('T')
 
 def frozen(cls: Type[T]) -> Type[T]:
     """A class decorator that disallows assignment to instance variables after
-    construction."""
-    original_init = cls.__init__
-    original_setattr = cls.__setattr__
-    original_delattr = cls.__delattr__
-    mutable_ids: Set[int] = set()
-    @wraps(cls.__setattr__)
-    def setattr_wrapper(self, name, value):
-        if id(self) in mutable_ids:
-            original_setattr(self, name, value)
-        else:
-            raise Exception("Cannot assign to field '" + name +
-                            "' of immutable class '" + cls.__name__ + "'")
-    @wraps(cls.__delattr__)
-    def delattr_wrapper(self, name, value):
-        if id(self) in mutable_ids:
-            original_delattr(self, name, value)
-        else:
-            raise Exception("Cannot delete field '" + name +
-                            "' of immutable class '" + cls.__name__ + "'")
-    @wraps(cls.__init__)
-    def init_wrapper(self, *args, **kwargs):
-        mutable_ids.add(id(self))
-        original_init(self, *args, **kwargs)
-        mutable_ids.remove(id(self))
-
-    setattr(cls, '__setattr__', setattr_wrapper)
-    setattr(cls, '__delattr__',  delattr_wrapper)
-    setattr(cls, '__init__', init_wrapper)
-    return cls
+    construction.
+
+    The decorated class is rebuilt with a ``__slots__`` entry for each of its
+    annotated fields, so its instances carry no ``__dict__``. Assignments are
+    allowed only while ``__init__`` runs: for that duration (only) the instance
+    being constructed is switched to a mutable twin of the class, which keeps
+    attribute writes native and involves no state shared between instances or
+    threads. Fields may still be populated outside of ``__init__`` (e.g., by
+    ``__new__``) through ``object.__setattr__``, which is also how instances
+    are restored when they are unpickled or copied."""
+    inherited_slots = set()
+    for base in cls.__mro__[1:]:
+        inherited_slots.update(base.__dict__.get('__slots__', ()))
+        if '__weakref__' in base.__dict__:
+            inherited_slots.add('__weakref__')
+    slots = tuple(name for name in cls.__dict__.get('__annotations__', {})
+                  if name not in inherited_slots)
+    if '__weakref__' not in inherited_slots:
+        slots += ('__weakref__',)
+    namespace = {key: value for key, value in cls.__dict__.items()
+                 if key not in slots and key not in ('__dict__', '__weakref__')}
+    namespace['__slots__'] = slots
+    namespace['__qualname__'] = cls.__qualname__
+    frozen_cls = type(cls)(cls.__name__, cls.__bases__, namespace)
+    # Zero-argument super() in methods refers to the class being replaced
+    for value in namespace.values():
+        if isinstance(value, (staticmethod, classmethod)):
+            value = value.__func__
+        if isinstance(value, FunctionType) and value.__closure__ is not None:
+            for name, cell in zip(value.__code__.co_freevars,
+                                  value.__closure__):
+                if name == '__class__' and cell.cell_contents is cls:
+                    cell.cell_contents = frozen_cls
+
+    def setattr_error(self, name, value):
+        raise Exception("Cannot assign to field '" + name +
+                        "' of immutable class '" + cls.__name__ + "'")
+    def delattr_error(self, name):
+        raise Exception("Cannot delete field '" + name +
+                        "' of immutable class '" + cls.__name__ + "'")
+    frozen_cls.__setattr__ = setattr_error
+    frozen_cls.__delattr__ = delattr_error
+    if '__setstate__' not in namespace and '__reduce__' not in namespace:
+        def setstate(self, state):
+            # pickle and copy pass the fields of a slotted instance as the
+            # second item of the state, and would assign them one by one
+            instance_dict, slot_values = state if isinstance(state, tuple) \
+                                         else (state, None)
+            for values in (instance_dict, slot_values):
+                for name, value in (values or {}).items():
+                    object.__setattr__(self, name, value)
+        frozen_cls.__setstate__ = setstate
+
+    if '__init__' in namespace:
+        mutable_cls = type(cls.__name__, (frozen_cls,),
+                           {'__slots__': (),
+                            '__setattr__': object.__setattr__,
+                            '__delattr__': object.__delattr__,
+                            '__module__': cls.__module__,
+                            '__qualname__': cls.__qualname__})
+        original_init = namespace['__init__']
+        @wraps(original_init)
+        def init_wrapper(self, *args, **kwargs):
+            object.__setattr__(self, '__class__', mutable_cls)
+            try:
+                original_init(self, *args, **kwargs)
+            finally:
+                object.__setattr__(self, '__class__', frozen_cls)
+        frozen_cls.__init__ = init_wrapper
+    return frozen_cls
 
 class frozendict(Dict[Any, Any]):
     """An immutable variant of the built-in dict class."""
@@ -54,6 +99,95 @@ class frozendict(Dict[Any, Any]):
     __delattr__ = __delitem__ = __setattr__ = __setitem__ = clear = pop = \
                   popitem = setdefault = update
 
+class CacheInfo(NamedTuple):
+    """Statistics of an `LRUCache`."""
+    hits: int
+    misses: int
+    capacity: int
+    size: int
+
+class LRUCache:
+    """A bounded, thread-safe cache that evicts its least recently used entry
+    when full, and counts its hits and misses. Meant for immutable values,
+    which may be shared freely between callers and threads."""
+
+    def __init__(self, capacity: int) -> None:
+        """Initializes an empty cache.
+
+        Parameters:
+            capacity: maximal number of entries to keep, or ``0`` to disable
+                caching.
+        """
+        assert capacity >= 0
+        self.__capacity = capacity
+        self.__entries = OrderedDict()
+        self.__lock = Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    def get(self, key: Hashable, compute: Callable[[], T]) -> T:
+        """Returns the value cached for the given key, computing and caching it
+        first if it is not cached.
+
+        Parameters:
+            key: key to look up.
+            compute: function computing the value of the given key. It is
+                called without holding the lock, so that a slow or failing
+                computation does not block other threads, and if it raises
+                nothing is cached.
+
+        Returns:
+            The value of the given key.
+        """
+        with self.__lock:
+            if key in self.__entries:
+                self.__hits += 1
+                self.__entries.move_to_end(key)
+                return self.__entries[key]
+            self.__misses += 1
+        value = compute()
+        with self.__lock:
+            if self.__capacity > 0:
+                self.__entries[key] = value
+                self.__entries.move_to_end(key)
+                self.__evict()
+        return value
+
+    @property
+    def capacity(self) -> int:
+        """The maximal number of entries kept."""
+        return self.__capacity
+
+    @capacity.setter
+    def capacity(self, capacity: int) -> None:
+        assert capacity >= 0
+        with self.__lock:
+            self.__capacity = capacity
+            self.__evict()
+
+    def info(self) -> CacheInfo:
+        """Returns the statistics of this cache."""
+        with self.__lock:
+            return CacheInfo(self.__hits, self.__misses, self.__capacity,
+                             len(self.__entries))
+
+    def clear(self) -> None:
+        """Removes all entries and resets the statistics of this cache."""
+        with self.__lock:
+            self.__entries.clear()
+            self.__hits = 0
+            self.__misses = 0
+
+    def __evict(self) -> None:
+        while len(self.__entries) > self.__capacity:
+            self.__entries.popitem(last=False)
+
+# A cache shared by the parsers of formulas and terms of both logics, keyed by
+# the class to parse into and the string to parse. Its capacity can be changed
+# by assigning to parse_cache.capacity, and parse_cache.info() reports how
+# often it was hit.
+parse_cache: LRUCache = LRUCache(4096)
+
 class __prefix_with_index_sequence_generator:
     """ A generator for a sequence of the form 'z1', 'z2', 'z3', ..., where the
     prefix 'z' is customizable. """
@@ -90,7 +90,7 @@ class Schema:
         return not self == other
 
     def __hash__(self) -> int:
-        return hash(str(self))
+        return hash((self.formula, self.templates))
 
     class BoundVariableError(Exception):
         """Raised by `_instantiate_helper` when a variable name becomes bound
@@ -14,6 +14,11 @@ from predicates.syntax import *
 #: A generic type for a universe element in a model.
 T = TypeVar('T')
 
+# Kinds of tasks on the explicit stack of `Model.evaluate_formula`
+_EVALUATE, _NEGATE, _COMBINE, _QUANTIFY = range(4)
+#: Marks that all universe elements were tried in a quantification.
+_NO_ELEMENT = object()
+
 @frozen
 class Model(Generic[T]):
     """An immutable model for first-order logic constructs.
@@ -144,19 +149,44 @@ class Model(Generic[T]):
             assert function in self.function_meanings and \
                    self.function_arities[function] == arity
         # Task 7.7
-        # if term is a var:
-        if is_variable(term.root):
-            return assignment[term.root]
+        return self._evaluate_term(term, assignment)
+
+    def _evaluate_term(self, term: Term, assignment: Mapping[str, T]) -> T:
+        """Calculates the value of the given term in the current model, for the
+        given assignment of values to variables names, bottom-up with an
+        explicit stack and without checking that the model has the needed
+        meanings.
 
-        # if term is a constant
-        if is_constant(term.root):
-            return self.constant_meanings[term.root]
+        Parameters:
+            term: term to calculate the value of.
+            assignment: mapping from each variable name in the given term to a
+                universe element to which it is to be evaluated.
 
-        # if term is a function
-        if is_function(term.root):
-            arg_val_list = [self.evaluate_term(arg, assignment) for arg in term.arguments]
-            arg_val_tuple = tuple(arg_val_list)
-            return self.function_meanings[term.root][arg_val_tuple]
+        Returns:
+            The value of the given term in the current model, for the given
+            assignment of values to variable names.
+        """
+        values = {}
+        stack = [term]
+        while stack:
+            subterm = stack[-1]
+            if subterm in values:
+                stack.pop()
+                continue
+            if is_variable(subterm.root):
+                values[subterm] = assignment[subterm.root]
+            elif is_constant(subterm.root):
+                values[subterm] = self.constant_meanings[subterm.root]
+            else:
+                missing = [argument for argument in subterm.arguments
+                           if argument not in values]
+                if missing:
+                    stack.extend(missing)
+                    continue
+                values[subterm] = self.function_meanings[subterm.root][
+                    tuple(values[argument] for argument in subterm.arguments)]
+            stack.pop()
+        return values[term]
 
     def evaluate_formula(self, formula: Formula,
                          assignment: Mapping[str, T] = frozendict()) -> bool:
@@ -185,55 +215,63 @@ class Model(Generic[T]):
             assert relation in self.relation_meanings and \
                    self.relation_arities[relation] in {-1, arity}
         # Task 7.8
-
-        # case 1 if root is an equality:
-        if is_equality(formula.root):
-            first_val = self.evaluate_term(formula.arguments[0], assignment)
-            second_val = self.evaluate_term(formula.arguments[1], assignment)
-            return first_val == second_val
-
-        # case 2 if is an n-ary relation:
-        if is_relation(formula.root):
-            term_vals = tuple([self.evaluate_term(term, assignment) for term in formula.arguments])
-            return term_vals in self.relation_meanings[formula.root]
-
-        # case 3 if root is unary
-        if is_unary(formula.root):
-            return not self.evaluate_formula(Formula.parse(str(formula)[1:]), assignment)
-
-        # case 4 if root is binary:
-        if is_binary(formula.root):
-            first_val = self.evaluate_formula(formula.first, assignment)
-            second_val = self.evaluate_formula(formula.second, assignment)
-            if formula.root == '&':
-                return first_val and second_val
-
-            if formula.root == '|':
-                return first_val or second_val
-
-            if formula.root == '->':
-                return not first_val or second_val
-
-        # case 5 if root is quantification
-        if is_quantifier(formula.root):
-            if formula.root == 'A':
-                for val in self.universe:
-                    temp_assign = {**assignment}
-                    temp_assign[formula.variable] = val
-                    truth_val = self.evaluate_formula(formula.predicate, assignment=temp_assign)
-                    if not truth_val:
-                        return False
-                return True
-
-            if formula.root == 'E':
-                for val in self.universe:
-                    temp_assign = {**assignment}
-                    temp_assign[formula.variable] = val
-                    truth_val = self.evaluate_formula(formula.predicate, assignment=temp_assign)
-                    if truth_val:
-                        return True
-            return False
-
+        # evaluate with an explicit stack of tasks, and a stack of the truth
+        # values of the subformulas evaluated so far
+        values = []
+        tasks = [(_EVALUATE, formula, assignment)]
+        while tasks:
+            task = tasks.pop()
+            if task[0] == _EVALUATE:
+                _, formula, assignment = task
+                if is_equality(formula.root):
+                    first_val = self._evaluate_term(formula.arguments[0],
+                                                    assignment)
+                    second_val = self._evaluate_term(formula.arguments[1],
+                                                     assignment)
+                    values.append(first_val == second_val)
+                elif is_relation(formula.root):
+                    term_vals = tuple(self._evaluate_term(term, assignment)
+                                      for term in formula.arguments)
+                    values.append(
+                        term_vals in self.relation_meanings[formula.root])
+                elif is_unary(formula.root):
+                    tasks.append((_NEGATE,))
+                    tasks.append((_EVALUATE, formula.first, assignment))
+                elif is_binary(formula.root):
+                    tasks.append((_COMBINE, formula.root))
+                    tasks.append((_EVALUATE, formula.second, assignment))
+                    tasks.append((_EVALUATE, formula.first, assignment))
+                else:
+                    tasks.append((_QUANTIFY, formula, assignment,
+                                  iter(self.universe), False))
+            elif task[0] == _NEGATE:
+                values.append(not values.pop())
+            elif task[0] == _COMBINE:
+                second_val = values.pop()
+                first_val = values.pop()
+                if task[1] == '&':
+                    values.append(first_val and second_val)
+                elif task[1] == '|':
+                    values.append(first_val or second_val)
+                else:
+                    values.append(not first_val or second_val)
+            else:
+                # a quantification: evaluate its predicate for one universe
+                # element at a time, until the truth value is decided
+                _, formula, assignment, elements, started = task
+                if started:
+                    truth_val = values.pop()
+                    if truth_val == (formula.root == 'E'):
+                        values.append(truth_val)
+                        continue
+                val = next(elements, _NO_ELEMENT)
+                if val is _NO_ELEMENT:
+                    values.append(formula.root == 'A')
+                    continue
+                tasks.append((_QUANTIFY, formula, assignment, elements, True))
+                tasks.append((_EVALUATE, formula.predicate,
+                              {**assignment, formula.variable: val}))
+        return values.pop()
 
     def is_model_of(self, formulas: AbstractSet[Formula]) -> bool:
         """Checks if the current model is a model for the given formulas.
@@ -127,10 +127,37 @@ def test_is_model_of(debug=False):
             print('... is said', '' if result else 'not', 'to satisfy', formula)
         assert not result
 
+# Tests for extensions beyond the course tasks
+
+def test_evaluate_deep_formula(debug=False):
+    model = Model({0, 1, 2}, {'c': 0}, {'R': {(1,), (2,)}, 'Q': {(0,), (1,)}},
+                  {'f': {(0,): 1, (1,): 2, (2,): 0}})
+    n = 50000
+    s = 'x'
+    for i in range(n):
+        s = 'f(' + s + ')'
+    term = Term.parse(s)
+    if debug:
+        print('Testing evaluation of a term of depth', n)
+    for x in range(3):
+        assert model.evaluate_term(term, {'x': x}) == (x + n) % 3
+    formula = Formula.parse('R(x)')
+    for i in range(n):
+        formula = Formula('~', Formula('&', formula, Formula.parse('Q(y)')))
+    formula = Formula('A', 'y', Formula('E', 'x', formula))
+    if debug:
+        print('Testing evaluation of a formula of depth', 2 * n + 2)
+    assert model.evaluate_formula(formula)
+    assert not model.evaluate_formula(Formula('~', formula))
+
 def test_ex7(debug=False):
     test_evaluate_term(debug)
     test_evaluate_formula(debug)
     test_is_model_of(debug)
 
+def test_semantics_extensions(debug=False):
+    test_evaluate_deep_formula(debug)
+
 def test_all(debug=False):
     test_ex7(debug)
+    test_semantics_extensions(debug)
@@ -0,0 +1,280 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: predicates/serialization.py
+
+"""Compact binary serialization of predicate-logic formulas and proofs, in the
+file format of `propositions.serialization`. The nodes section holds the
+distinct terms and formulas of a file."""
+
+from __future__ import annotations
+from collections.abc import Sequence as SequenceABC
+from typing import Any, FrozenSet, Iterable, List, Sequence, Tuple, Union
+
+from propositions.serialization import TableFile, TableWriter
+
+from predicates.syntax import *
+from predicates.proofs import *
+
+_FORMULAS_KIND = b'PREDFRML'
+_PROOF_KIND = b'PREDPROF'
+# Sections following the strings and nodes sections
+_ROOTS, _SCHEMAS, _LINES = 2, 3, 4
+# Kinds of node records
+_TERM, _FORMULA, _QUANTIFIED_FORMULA = 0, 1, 2
+# Kinds of line records
+_ASSUMPTION_LINE, _MP_LINE, _UG_LINE, _TAUTOLOGY_LINE = 0, 1, 2, 3
+# Kinds of values in the instantiation map of an assumption line record
+_TERM_VALUE, _STRING_VALUE, _FORMULA_VALUE = 0, 1, 2
+
+def _children(node: Union[Term, Formula]) -> Tuple[Union[Term, Formula], ...]:
+    """Returns the arguments, operands or predicate of the given term or
+    formula.
+
+    Parameters:
+        node: term or formula to return the children of.
+
+    Returns:
+        The arguments of the given term or equality or relation invocation,
+        the operands of the given unary or binary formula, or the predicate of
+        the given quantified formula.
+    """
+    if isinstance(node, Term):
+        return node.arguments if is_function(node.root) else ()
+    if is_equality(node.root) or is_relation(node.root):
+        return node.arguments
+    if is_unary(node.root):
+        return node.first,
+    if is_binary(node.root):
+        return node.first, node.second
+    return node.predicate,
+
+def _add_node(writer: TableWriter, node: Union[Term, Formula]) -> int:
+    """Adds the given term or formula and its subterms and subformulas to the
+    given writer.
+
+    Parameters:
+        writer: writer to add to.
+        node: term or formula to add.
+
+    Returns:
+        The number of the given term or formula in the nodes section.
+    """
+    def record(node: Union[Term, Formula], children: List[int]) -> List[int]:
+        if isinstance(node, Term):
+            return [_TERM, writer.string(node.root)] + children
+        if is_quantifier(node.root):
+            return [_QUANTIFIED_FORMULA, writer.string(node.root),
+                    writer.string(node.variable)] + children
+        return [_FORMULA, writer.string(node.root)] + children
+    return writer.add_node(node, _children, record)
+
+def _read_node(file: TableFile, number: int) -> Union[Term, Formula]:
+    """Reads a term or formula from the given file.
+
+    Parameters:
+        file: file to read from.
+        number: number of the term or formula in the nodes section.
+
+    Returns:
+        The requested term or formula.
+    """
+    def children(record: Tuple[int, ...]) -> Tuple[int, ...]:
+        return record[3:] if record[0] == _QUANTIFIED_FORMULA else record[2:]
+    def build(record: Tuple[int, ...],
+              children: List[Union[Term, Formula]]) -> Union[Term, Formula]:
+        root = file.string(record[1])
+        if record[0] == _TERM:
+            return Term(root, children) if is_function(root) else Term(root)
+        if record[0] == _QUANTIFIED_FORMULA:
+            return Formula(root, file.string(record[2]), children[0])
+        if is_equality(root) or is_relation(root):
+            return Formula(root, children)
+        return Formula(root, *children)
+    return file.node(number, children, build)
+
+def save_formulas(formulas: Iterable[Formula], path: str) -> None:
+    """Serializes the given formulas into a file, storing each distinct
+    subterm and subformula once.
+
+    Parameters:
+        formulas: formulas to serialize.
+        path: path of the file to write.
+    """
+    writer = TableWriter(_FORMULAS_KIND, 3)
+    writer.add(_ROOTS, [_add_node(writer, formula) for formula in formulas])
+    writer.write(path)
+
+def load_formulas(path: str) -> List[Formula]:
+    """Deserializes formulas from a file written by `save_formulas`.
+
+    Parameters:
+        path: path of the file to read.
+
+    Returns:
+        The serialized formulas, in order.
+    """
+    with TableFile(path, _FORMULAS_KIND) as file:
+        return [_read_node(file, number) for number in file.record(_ROOTS, 0)]
+
+def save_proof(proof: Proof, path: str) -> None:
+    """Serializes the given proof into a file, storing each distinct subterm,
+    subformula and schema once.
+
+    Parameters:
+        proof: proof to serialize.
+        path: path of the file to write.
+    """
+    writer = TableWriter(_PROOF_KIND, 5)
+    schema_numbers = {}
+    def add_schema(schema: Schema) -> int:
+        number = schema_numbers.get(schema)
+        if number is None:
+            number = schema_numbers[schema] = writer.add(
+                _SCHEMAS, [_add_node(writer, schema.formula)] +
+                          [writer.string(template)
+                           for template in sorted(schema.templates)])
+        return number
+    writer.add(_ROOTS, [_add_node(writer, proof.conclusion)] +
+                       [add_schema(assumption)
+                        for assumption in proof.assumptions])
+    for line in proof.lines:
+        formula = _add_node(writer, line.formula)
+        if isinstance(line, Proof.AssumptionLine):
+            record = [_ASSUMPTION_LINE, formula, add_schema(line.assumption)]
+            for key, value in line.instantiation_map.items():
+                if isinstance(value, str):
+                    record.extend((writer.string(key), _STRING_VALUE,
+                                   writer.string(value)))
+                else:
+                    record.extend((writer.string(key),
+                                   _TERM_VALUE if isinstance(value, Term)
+                                   else _FORMULA_VALUE,
+                                   _add_node(writer, value)))
+            writer.add(_LINES, record)
+        elif isinstance(line, Proof.MPLine):
+            writer.add(_LINES, (_MP_LINE, formula, line.antecedent_line_number,
+                                line.conditional_line_number))
+        elif isinstance(line, Proof.UGLine):
+            writer.add(_LINES, (_UG_LINE, formula,
+                                line.predicate_line_number))
+        else:
+            assert isinstance(line, Proof.TautologyLine)
+            writer.add(_LINES, (_TAUTOLOGY_LINE, formula))
+    writer.write(path)
+
+class LazyProof:
+    """A proof serialized by `save_proof`, whose lines are read from the
+    memory-mapped file only when accessed.
+
+    Attributes:
+        assumptions (`~typing.FrozenSet`\\[`~predicates.proofs.Schema`]): the
+            assumption/axioms of the proof.
+        conclusion (`~predicates.syntax.Formula`): the conclusion of the proof.
+        lines (`~typing.Sequence`\\[`~predicates.proofs.Proof.Line`]): the lines
+            of the proof, each read when accessed.
+    """
+    assumptions: FrozenSet[Schema]
+    conclusion: Formula
+    lines: Sequence[Proof.Line]
+
+    def __init__(self, path: str) -> None:
+        """Opens a proof serialized by `save_proof`.
+
+        Parameters:
+            path: path of the file to read.
+
+        Raises:
+            ValueError: If the given file is not a serialized proof.
+        """
+        self._file = file = TableFile(path, _PROOF_KIND)
+        self._schemas = [
+            Schema(_read_node(file, record[0]),
+                   {file.string(template) for template in record[1:]})
+            for record in (file.record(_SCHEMAS, number)
+                           for number in range(file.count(_SCHEMAS)))]
+        roots = file.record(_ROOTS, 0)
+        self.conclusion = _read_node(file, roots[0])
+        self.assumptions = frozenset(self._schemas[number]
+                                     for number in roots[1:])
+        self.lines = _LazyLines(self)
+
+    def _line(self, number: int) -> Proof.Line:
+        file = self._file
+        record = file.record(_LINES, number)
+        formula = _read_node(file, record[1])
+        if record[0] == _ASSUMPTION_LINE:
+            instantiation_map = {}
+            for position in range(3, len(record), 3):
+                key, kind, value = record[position:position + 3]
+                instantiation_map[file.string(key)] = \
+                    file.string(value) if kind == _STRING_VALUE \
+                    else _read_node(file, value)
+            return Proof.AssumptionLine(formula, self._schemas[record[2]],
+                                        instantiation_map)
+        if record[0] == _MP_LINE:
+            return Proof.MPLine(formula, record[2], record[3])
+        if record[0] == _UG_LINE:
+            return Proof.UGLine(formula, record[2])
+        return Proof.TautologyLine(formula)
+
+    def proof(self) -> Proof:
+        """Reads all lines of the current proof.
+
+        Returns:
+            The current proof as a `~predicates.proofs.Proof`.
+        """
+        return Proof(self.assumptions, self.conclusion, self.lines)
+
+    def close(self) -> None:
+        """Closes the file of the current proof. Lines can no longer be read
+        afterwards."""
+        self._file.close()
+
+    def __enter__(self) -> LazyProof:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+class _LazyLines(SequenceABC):
+    """The lines of a `LazyProof`, each read when accessed."""
+
+    def __init__(self, proof: LazyProof) -> None:
+        self._proof = proof
+        self._count = proof._file.count(_LINES)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: Union[int, slice]) -> \
+            Union[Proof.Line, List[Proof.Line]]:
+        if isinstance(index, slice):
+            return [self._proof._line(number)
+                    for number in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        return self._proof._line(index)
+
+def open_proof(path: str) -> LazyProof:
+    """Opens a proof serialized by `save_proof` without reading its lines.
+
+    Parameters:
+        path: path of the file to read.
+
+    Returns:
+        The serialized proof, whose lines are read when accessed.
+    """
+    return LazyProof(path)
+
+def load_proof(path: str) -> Proof:
+    """Deserializes a proof serialized by `save_proof`.
+
+    Parameters:
+        path: path of the file to read.
+
+    Returns:
+        The serialized proof.
+    """
+    with open_proof(path) as proof:
+        return proof.proof()
@@ -0,0 +1,65 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: predicates/serialization_test.py
+
+"""Tests for the predicates.serialization module."""
+
+import os
+from tempfile import TemporaryDirectory
+
+from predicates.syntax import *
+from predicates.proofs import *
+from predicates.serialization import *
+
+def test_save_formulas(debug=False):
+    n = 20000
+    deep = Formula.parse('R(f(x),c)')
+    for i in range(n):
+        deep = Formula('A', 'x' + str(i % 5),
+                       Formula('|', deep, Formula('=', [Term('c'), Term('d')])))
+    formulas = [Formula.parse('(Ax[R(f(x,y),c)]->(Q()|~Ey[y=g(x)]))'), deep]
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'formulas')
+        if debug:
+            print('Testing serialization of formulas of depth up to', 2 * n)
+        save_formulas(formulas, path)
+        assert load_formulas(path) == formulas
+
+def test_save_proof(debug=False):
+    assumption = Schema(Formula.parse('Ax[R(x)]'))
+    universal_instantiation = Schema(Formula.parse('(Ax[R(x)]->R(c))'),
+                                     {'R', 'x', 'c'})
+    proof = Proof({assumption, universal_instantiation},
+                  Formula.parse('Ax[(R(c)|Q(c))]'), [
+        Proof.AssumptionLine(Formula.parse('Ax[R(x)]'), assumption, {}),
+        Proof.AssumptionLine(Formula.parse('(Ax[R(x)]->R(c))'),
+                             universal_instantiation,
+                             {'R': Formula.parse('R(_)'), 'x': 'x',
+                              'c': Term('c')}),
+        Proof.MPLine(Formula.parse('R(c)'), 0, 1),
+        Proof.TautologyLine(Formula.parse('(R(c)->(R(c)|Q(c)))')),
+        Proof.MPLine(Formula.parse('(R(c)|Q(c))'), 2, 3),
+        Proof.UGLine(Formula.parse('Ax[(R(c)|Q(c))]'), 4)])
+    assert proof.is_valid()
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'proof')
+        if debug:
+            print('Testing serialization of a proof with every kind of line')
+        save_proof(proof, path)
+        loaded = load_proof(path)
+        assert loaded.assumptions == proof.assumptions
+        assert loaded.conclusion is proof.conclusion
+        assert [str(line) for line in loaded.lines] == \
+               [str(line) for line in proof.lines]
+        assert loaded.is_valid()
+        if debug:
+            print('Testing lazy loading of the proof')
+        with open_proof(path) as lazy:
+            assert len(lazy.lines) == len(proof.lines)
+            assert str(lazy.lines[1]) == str(proof.lines[1])
+            assert lazy.lines[-1].formula is proof.conclusion
+
+def test_serialization(debug=False):
+    test_save_formulas(debug)
+    test_save_proof(debug)
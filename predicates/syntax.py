@@ -6,9 +6,11 @@
 """Syntactic handling of first-order formulas and terms."""
 
 from __future__ import annotations
-from typing import AbstractSet, Mapping, Optional, Sequence, Set, Tuple, Union
+from typing import AbstractSet, Iterable, Iterator, Mapping, Optional, \
+    Sequence, Set, Tuple, Union
+from weakref import WeakValueDictionary
 
-from logic_utils import fresh_variable_name_generator, frozen
+from logic_utils import fresh_variable_name_generator, frozen, parse_cache
 
 from propositions.syntax import Formula as PropositionalFormula, \
     is_variable as is_propositional_variable
@@ -31,6 +33,30 @@ class ForbiddenVariableError(Exception):
         self.variable_name = variable_name
 
 
+class ParseError(Exception):
+    """Raised by `Term.parse_prefix`, `Term.parse`, `Formula.parse_prefix`, and
+    `Formula.parse` when the given string is not a valid representation (or
+    has no prefix that is a valid representation) of a term or formula.
+
+    Attributes:
+        message (`str`): human-readable description of the failure.
+        position (`int`): index in the parsed string at which parsing failed.
+    """
+    message: str
+    position: int
+
+    def __init__(self, message: str, position: int) -> None:
+        """Initializes a `ParseError` from its description and position.
+
+        Parameters:
+            message: human-readable description of the failure.
+            position: index in the parsed string at which parsing failed.
+        """
+        super().__init__(message + ' (at position ' + str(position) + ')')
+        self.message = message
+        self.position = position
+
+
 def is_constant(s: str) -> bool:
     """Checks if the given string is a constant name.
 
@@ -68,6 +94,9 @@ def is_function(s: str) -> bool:
     return s[0] >= 'f' and s[0] <= 't' and s.isalnum()
 
 
+#: Table of all live terms, keyed by their root and root arguments.
+_term_table: WeakValueDictionary = WeakValueDictionary()
+
 @frozen
 class Term:
     """An immutable first-order term in tree representation, composed from
@@ -82,24 +111,59 @@ class Term:
     root: str
     arguments: Optional[Tuple[Term, ...]]
 
-    def __init__(self, root: str,
-                 arguments: Optional[Sequence[Term]] = None) -> None:
-        """Initializes a `Term` from its root and root arguments.
+    _hash: int
+
+    def __new__(cls, root: str,
+                arguments: Optional[Sequence[Term]] = None) -> Term:
+        """Returns the unique `Term` with the given root and root arguments,
+        creating it if no equal term currently exists.
+
+        Terms are hash-consed: structurally equal terms are the very same
+        object, so equality is an identity check and repeated subterms are
+        stored only once. Consequently, all fields are populated here rather
+        than in ``__init__``.
 
         Parameters:
             root: the root for the formula tree.
             arguments: the arguments to the root, if the root is a function
                 name.
+
+        Returns:
+            The term with the given root and root arguments.
         """
+        if arguments is not None:
+            arguments = tuple(arguments)
+        key = (root, arguments)
+        term = _term_table.get(key)
+        if term is not None:
+            return term
+        term = super().__new__(cls)
         if is_constant(root) or is_variable(root):
             assert arguments is None
-            self.root = root
+            object.__setattr__(term, 'root', root)
+            structural_hash = hash(root)
         else:
             assert is_function(root)
             assert arguments is not None
-            self.root = root
-            self.arguments = tuple(arguments)
-            assert len(self.arguments) > 0
+            assert len(arguments) > 0
+            object.__setattr__(term, 'root', root)
+            object.__setattr__(term, 'arguments', arguments)
+            structural_hash = hash((root, arguments))
+        object.__setattr__(term, '_hash', structural_hash)
+        # Another thread may have interned an equal term in the meantime
+        return _term_table.setdefault(key, term)
+
+    def __reduce__(self) -> Tuple[type, tuple]:
+        """Reduces the current term to its constructor arguments, so that
+        unpickled and copied terms are interned as well.
+
+        Returns:
+            The `Term` class and the arguments to construct the current term
+            from.
+        """
+        if is_function(self.root):
+            return Term, (self.root, self.arguments)
+        return Term, (self.root,)
 
     def __repr__(self) -> str:
         """Computes the string representation of the current term.
@@ -108,25 +172,7 @@ class Term:
             The standard string representation of the current term.
         """
         # Task 7.1
-        # recursively add the string
-
-        # base case: root is a variable name, or constant
-        ret_string = ""
-        if is_variable(self.root) or is_constant(self.root):
-            return self.root
-
-        # case 2 root is a function
-        if is_function(self.root):
-            if self.arguments:
-                arg_str = ""
-                for i in range(len(self.arguments)):
-                    if i < len(self.arguments) - 1:
-                        arg_str += (self.arguments[i].__repr__() + ",")
-                    else:
-                        arg_str += self.arguments[i].__repr__()
-                return self.root + '(' + arg_str + ')'
-            else:
-                return self.root + '(' + ')'
+        return _to_string(self)
 
     def __eq__(self, other: object) -> bool:
         """Compares the current term with the given one.
@@ -138,7 +184,8 @@ class Term:
             ``True`` if the given object is a `Term` object that equals the
             current term, ``False`` otherwise.
         """
-        return isinstance(other, Term) and str(self) == str(other)
+        # Terms are interned, so equal terms are the same object
+        return self is other
 
     def __ne__(self, other: object) -> bool:
         """Compares the current term with the given one.
@@ -153,7 +200,7 @@ class Term:
         return not self == other
 
     def __hash__(self) -> int:
-        return hash(str(self))
+        return self._hash
 
     @staticmethod
     def parse_prefix(s: str) -> Tuple[Term, str]:
@@ -168,31 +215,14 @@ class Term:
             the given string has as a prefix a constant name (e.g., ``'c12'``)
             or a variable name (e.g., ``'x12'``), then the parsed prefix will be
             that entire name (and not just a part of it, such as ``'x1'``).
+
+        Raises:
+            ParseError: If no prefix of the given string is a valid
+                representation of a term.
         """
         # Task 7.3.1
-        # Base Case 1: empty string
-        if s == '':
-            return Term(''), ''  # TODO check what they want
-
-        cur_token = s[0]
-        # Base Case 2: s is a variable
-        if is_variable(cur_token):
-            return get_variable(s)
-
-        # Base Case 3: s is a constant
-        if is_constant(cur_token):
-            return get_constant(s)
-
-        # Last case, the term is a function call:
-        if is_function(cur_token):
-            return get_function(s)
-
-
-
-
-
-
-
+        term, position = _parse_term(s, 0)
+        return term, s[position:]
 
     @staticmethod
     def parse(s: str) -> Term:
@@ -203,9 +233,18 @@ class Term:
 
         Returns:
             A term whose standard string representation is the given string.
+
+        Raises:
+            ParseError: If the given string is not a valid representation of a
+                term.
         """
         # Task 7.3.2
-        return Term.parse_prefix(s)[0]
+        def parse_uncached() -> Term:
+            term, position = _parse_term(s, 0)
+            if position != len(s):
+                raise ParseError('Unexpected character after term', position)
+            return term
+        return parse_cache.get((Term, s), parse_uncached)
 
     def constants(self) -> Set[str]:
         """Finds all constant names in the current term.
@@ -214,16 +253,8 @@ class Term:
             A set of all constant names used in the current term.
         """
         # Task 7.5.1
-        const_set = set()
-        if is_constant(self.root):
-            const_set |= set([self.root])
-            return const_set
-        if is_variable(self.root):
-            return const_set
-        if is_function(self.root):
-            for next_set in self.arguments:
-                const_set |= next_set.constants()
-            return const_set
+        return {term.root for term in _subterms([self])
+                if is_constant(term.root)}
 
     def variables(self) -> Set[str]:
         """Finds all variable names in the current term.
@@ -232,16 +263,8 @@ class Term:
             A set of all variable names used in the current term.
         """
         # Task 7.5.2
-        variable_set = set()
-        if is_variable(self.root):
-            variable_set.add(self.root)
-            return variable_set
-        if is_constant(self.root):
-            return variable_set
-        if is_function(self.root):
-            for next_set in self.arguments:
-                variable_set |= next_set.variables()
-            return variable_set
+        return {term.root for term in _subterms([self])
+                if is_variable(term.root)}
 
     def functions(self) -> Set[Tuple[str, int]]:
         """Finds all function names in the current term, along with their
@@ -252,17 +275,8 @@ class Term:
             all function names used in the current term.
         """
         # Task 7.5.3
-        func_set = set()
-        if is_variable(self.root) or is_constant(self.root):
-            return func_set
-        if is_function(self.root):
-            for term in self.arguments:
-                if is_function(term.root):
-                    func_set |= term.functions()
-            func_set.add((self.root, len(self.arguments)))
-        return func_set
-
-
+        return {(term.root, len(term.arguments))
+                for term in _subterms([self]) if is_function(term.root)}
 
     def substitute(self, substitution_map: Mapping[str, Term],
                    forbidden_variables: AbstractSet[str] = frozenset()) -> Term:
@@ -326,112 +340,259 @@ class Term:
 
 
 
-def get_variable(s: str) -> Tuple[Term, str]:
+def _scan_name(s: str, position: int) -> int:
     """
-    Helper function for parse, Checks a string and gets the variable from it
-    :param s: current string
-    :return: tuple of term of the string and the suffix of the rest without the variable
+    Helper function for parsing, finds where the name starting at the given
+    position ends
+    :param s: the parsed string
+    :param position: index of the first character of the name
+    :return: the index right after the last alphanumeric character of the name
     """
-    # check and see if there is a number after the variable name
-    cur_token = s[0]
-    i = 1
-    cur_variable_num = ''
-    while i < len(s):
-        if s[i].isalnum():
-            cur_variable_num += s[i]
-            i += 1
-        else:
-            break
+    position += 1
+    length = len(s)
+    while position < length and s[position].isalnum():
+        position += 1
+    return position
 
-    # either adds the number to the token, or if it didnt exist, adds an empty string
-    cur_token += cur_variable_num
-    return Term(cur_token), s[len(cur_token):]
+def _expect(s: str, position: int, token: str) -> int:
+    """
+    Helper function for parsing, checks that the given token appears at the
+    given position
+    :param s: the parsed string
+    :param position: index at which the token should appear
+    :param token: the expected token
+    :return: the index right after the token
+    """
+    if not s.startswith(token, position):
+        raise ParseError("Expected '" + token + "'", position)
+    return position + len(token)
 
-def get_constant(s: str) -> Tuple[Term, str]:
+def _parse_arguments(s: str, position: int) -> Tuple[Tuple[Term, ...], int]:
     """
-    Helper function for parse prefix, checks a string and returns a constant from it
-    :param s: the current string
-    :return: return tuple of term of the constant, and the rest of the string
+    Helper function for parsing, parses a parenthesized, comma-separated and
+    possibly empty list of terms
+    :param s: the parsed string
+    :param position: index of the opening '('
+    :return: tuple of the parsed terms and the index right after the ')'
     """
+    position = _expect(s, position, '(')
+    arguments = []
+    if s.startswith(')', position):
+        return tuple(arguments), position + 1
+    while True:
+        argument, position = _parse_term(s, position)
+        arguments.append(argument)
+        if s.startswith(',', position):
+            position += 1
+        else:
+            return tuple(arguments), _expect(s, position, ')')
 
-    cur_token = s[0]
-    i = 1
-    cur_variable_suffix = ''
-    if cur_token == '_':
-        return Term(cur_token), s[len(cur_token):]
-    if cur_token.isdigit() or 'a' <= cur_token <= 'd':
-        while i < len(s):
-            if s[i].isalnum():
-                cur_variable_suffix += s[i]
-                i += 1
-            else:
+def _parse_term(s: str, position: int) -> Tuple[Term, int]:
+    """
+    Helper function for parsing, parses the term starting at the given
+    position, without slicing the string and without recursion
+    :param s: the parsed string
+    :param position: index at which the term starts
+    :return: tuple of the parsed term and the index right after it
+    """
+    # function applications whose arguments are still being parsed wait on a
+    # stack as pairs of function name and arguments parsed so far
+    pending = []
+    while True:
+        if position == len(s):
+            raise ParseError('Expected a term', position)
+        cur_token = s[position]
+        if cur_token == '_':
+            term = Term('_')
+            position += 1
+        elif is_constant(cur_token) or is_variable(cur_token):
+            end = _scan_name(s, position)
+            term = Term(s[position:end])
+            position = end
+        elif is_function(cur_token):
+            end = _scan_name(s, position)
+            pending.append((s[position:end], []))
+            position = _expect(s, end, '(')
+            if s.startswith(')', position):
+                raise ParseError('Expected a function argument', position)
+            continue
+        else:
+            raise ParseError('Expected a term', position)
+        # complete every function application whose arguments are now parsed
+        while pending:
+            function_name, arguments = pending[-1]
+            arguments.append(term)
+            if s.startswith(',', position):
+                position += 1
                 break
-        cur_token += cur_variable_suffix
-        return Term(cur_token), s[len(cur_token):]
+            position = _expect(s, position, ')')
+            pending.pop()
+            term = Term(function_name, arguments)
+        else:
+            return term, position
 
-def get_function(s: str) -> Tuple[Term, str]:
+def _parse_formula(s: str, position: int) -> Tuple[Formula, int]:
     """
-    Helper function for parse, takes a string starting from a possible correct function name.
-    if the function is correct it returns the entire term of the function, otherwise it returns
-    an empty term and the suffix which is all of s
-    :param s: the current string
-    :return: the term and its' suffix
+    Helper function for parsing, parses the formula starting at the given
+    position, without slicing the string and without recursion
+    :param s: the parsed string
+    :param position: index at which the formula starts
+    :return: tuple of the parsed formula and the index right after it
     """
-
-    # cur_token = s[0]
-    cur_suffix = ''
-    function_name = s[0]
-    arguments = []
-    # cur_token was a valid start for a function name, so we'll create the function name
-    i = 1
-    while s[i].isalnum():
-        function_name += s[i]
-        i += 1
-    if s[i] != '(':
-        return Term(''), s  #TODO what to send instead of Term('')
-    i += 1
-
-    # After opening the parenthesis we expect n terms.
-    while is_variable(s[i]) or is_function(s[i]) or is_constant(s[i]) or s[i] == ')':
-
-        # variable case:
-        if is_variable(s[i]):
-            cur_term, cur_suffix = get_variable(s[i:])
-            arguments.append(cur_term)
-            i += len(cur_term.root) + 1 # we do +1 because of the ','
-            if cur_suffix[0] == ',':
-                continue
-            elif cur_suffix[0] == ')':
-                break
-            else:
-                return Term(''), s  #TODO Term('')
-
-        # constant case:
-        if is_constant(s[i]):
-            cur_term, cur_suffix = get_constant(s[i:])
-            arguments.append(cur_term)
-            i += len(cur_term.root) + 1 # we do +1 because of the ','
-            if cur_suffix[0] == ',':
-                continue
-            elif cur_suffix[0] == ')':
-                break
-            else:
-                return Term(''), s  #TODO Term('')
-
-        # function case:
-        if is_function(s[i]):
-            cur_term, cur_suffix = get_function(s[i:])
-            arguments.append(cur_term)
-            i += len(cur_term.__repr__()) + 1
-            if cur_suffix[0] == ',':
-                continue
-            elif cur_suffix[0] == ')':
+    # operators and quantifiers whose operands are still being parsed wait on
+    # a stack: ['~'], ['(', first operand, operator] once '(' was consumed, or
+    # [quantifier, variable] once '[' was consumed
+    pending = []
+    while True:
+        if position == len(s):
+            raise ParseError('Expected a formula', position)
+        cur_token = s[position]
+        if is_unary(cur_token):
+            pending.append([cur_token])
+            position += 1
+            continue
+        if cur_token == '(':
+            pending.append([cur_token, None, None])
+            position += 1
+            continue
+        if is_quantifier(cur_token):
+            if position + 1 == len(s) or not is_variable(s[position + 1]):
+                raise ParseError('Expected a quantified variable', position + 1)
+            end = _scan_name(s, position + 1)
+            pending.append([cur_token, s[position + 1:end]])
+            position = _expect(s, end, '[')
+            continue
+        if is_relation(cur_token):
+            # relation invocation
+            end = _scan_name(s, position)
+            arguments, after = _parse_arguments(s, end)
+            formula = Formula(s[position:end], arguments)
+            position = after
+        else:
+            # equality
+            first_term, position = _parse_term(s, position)
+            second_term, position = _parse_term(s, _expect(s, position, '='))
+            formula = Formula('=', [first_term, second_term])
+        # complete every pending formula whose operands are now parsed
+        while pending:
+            top = pending[-1]
+            if is_unary(top[0]):
+                pending.pop()
+                formula = Formula(top[0], formula)
+            elif is_quantifier(top[0]):
+                position = _expect(s, position, ']')
+                pending.pop()
+                formula = Formula(top[0], top[1], formula)
+            elif top[1] is None:
+                # formula is the first operand, a binary operator follows
+                if s.startswith('->', position):
+                    operator = '->'
+                elif s.startswith('&', position) or \
+                        s.startswith('|', position):
+                    operator = s[position]
+                else:
+                    raise ParseError('Expected a binary operator', position)
+                top[1], top[2] = formula, operator
+                position += len(operator)
                 break
             else:
-                return Term(''), s
+                position = _expect(s, position, ')')
+                pending.pop()
+                formula = Formula(top[2], top[1], formula)
+        else:
+            return formula, position
+
+
+def _to_string(node: Union[Term, Formula]) -> str:
+    """
+    Helper function for __repr__, computes the standard string representation
+    of a term or formula without recursion
+    :param node: the term or formula
+    :return: the standard string representation of the given term or formula
+    """
+    # the stack holds terms, formulas and string pieces, in reverse order
+    pieces = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if type(node) is str:
+            pieces.append(node)
+            continue
+        root = node.root
+        if type(node) is Term and not is_function(root):
+            pieces.append(root)
+        elif type(node) is Term or is_relation(root):
+            pieces.append(root + '(')
+            stack.append(')')
+            for i in range(len(node.arguments) - 1, -1, -1):
+                stack.append(node.arguments[i])
+                if i > 0:
+                    stack.append(',')
+        elif is_equality(root):
+            stack.extend((node.arguments[1], '=', node.arguments[0]))
+        elif is_unary(root):
+            pieces.append(root)
+            stack.append(node.first)
+        elif is_binary(root):
+            pieces.append('(')
+            stack.extend((')', node.second, root, node.first))
+        else:
+            pieces.append(root + node.variable + '[')
+            stack.extend((']', node.predicate))
+    return ''.join(pieces)
 
-    cur_suffix = s[i:]
-    return Term(function_name, arguments), cur_suffix
+def _subterms(terms: Iterable[Term]) -> Iterator[Term]:
+    """
+    Helper function for collecting names, iterates over all subterms of the
+    given terms without recursion
+    :param terms: the terms whose subterms to iterate over
+    :return: an iterator over each distinct subterm of the given terms once
+    """
+    visited = set()
+    stack = list(terms)
+    while stack:
+        term = stack.pop()
+        if term in visited:
+            continue
+        visited.add(term)
+        yield term
+        if is_function(term.root):
+            stack.extend(term.arguments)
+
+def _subformulas(formula: Formula) -> Iterator[Formula]:
+    """
+    Helper function for collecting names, iterates over all subformulas of the
+    given formula without recursion
+    :param formula: the formula whose subformulas to iterate over
+    :return: an iterator over each distinct subformula of the given formula
+        (including itself) once
+    """
+    visited = set()
+    stack = [formula]
+    while stack:
+        formula = stack.pop()
+        if formula in visited:
+            continue
+        visited.add(formula)
+        yield formula
+        if is_unary(formula.root):
+            stack.append(formula.first)
+        elif is_binary(formula.root):
+            stack.extend((formula.first, formula.second))
+        elif is_quantifier(formula.root):
+            stack.append(formula.predicate)
+
+def _formula_subterms(formula: Formula) -> Iterator[Term]:
+    """
+    Helper function for collecting names, iterates over all terms in the given
+    formula without recursion
+    :param formula: the formula whose terms to iterate over
+    :return: an iterator over each distinct subterm of the given formula once
+    """
+    return _subterms(argument for subformula in _subformulas(formula)
+                     if is_equality(subformula.root) or
+                     is_relation(subformula.root)
+                     for argument in subformula.arguments)
 
 
 def is_equality(s: str) -> bool:
@@ -495,6 +656,10 @@ def is_quantifier(s: str) -> bool:
     return s == 'A' or s == 'E'
 
 
+#: Table of all live formulas, keyed by their root and root arguments,
+#: operands, or quantified variable and predicate.
+_formula_table: WeakValueDictionary = WeakValueDictionary()
+
 @frozen
 class Formula:
     """An immutable first-order formula in tree representation, composed from
@@ -523,12 +688,20 @@ class Formula:
     variable: Optional[str]
     predicate: Optional[Formula]
 
-    def __init__(self, root: str,
-                 arguments_or_first_or_variable: Union[Sequence[Term],
-                                                       Formula, str],
-                 second_or_predicate: Optional[Formula] = None) -> None:
-        """Initializes a `Formula` from its root and root arguments, root
-        operands, or root quantified variable and predicate.
+    _hash: int
+
+    def __new__(cls, root: str,
+                arguments_or_first_or_variable: Union[Sequence[Term],
+                                                      Formula, str],
+                second_or_predicate: Optional[Formula] = None) -> Formula:
+        """Returns the unique `Formula` with the given root and root arguments,
+        root operands, or root quantified variable and predicate, creating it
+        if no equal formula currently exists.
+
+        Formulas are hash-consed: structurally equal formulas are the very same
+        object, so equality is an identity check and shared subformulas and
+        subterms are stored only once. Consequently, all fields are populated
+        here rather than in ``__init__``.
 
         Parameters:
             root: the root for the formula tree.
@@ -540,35 +713,71 @@ class Formula:
             second_or_predicate: the second operand to the root, if the root is
                 a binary operator; the predicate quantified by the root, if the
                 root is a quantification.
+
+        Returns:
+            The formula with the given root and root arguments, operands, or
+            quantified variable and predicate.
         """
         if is_equality(root) or is_relation(root):
-            # Populate self.root and self.arguments
-            assert second_or_predicate is None
             assert isinstance(arguments_or_first_or_variable, Sequence) and \
                    not isinstance(arguments_or_first_or_variable, str)
-            self.root, self.arguments = \
-                root, tuple(arguments_or_first_or_variable)
+            arguments_or_first_or_variable = \
+                tuple(arguments_or_first_or_variable)
+        key = (root, arguments_or_first_or_variable, second_or_predicate)
+        formula = _formula_table.get(key)
+        if formula is not None:
+            return formula
+        formula = super().__new__(cls)
+        if is_equality(root) or is_relation(root):
+            # Populate self.root and self.arguments
+            assert second_or_predicate is None
+            object.__setattr__(formula, 'root', root)
+            object.__setattr__(formula, 'arguments',
+                               arguments_or_first_or_variable)
             if is_equality(root):
-                assert len(self.arguments) == 2
+                assert len(arguments_or_first_or_variable) == 2
         elif is_unary(root):
             # Populate self.first
             assert isinstance(arguments_or_first_or_variable, Formula) and \
                    second_or_predicate is None
-            self.root, self.first = root, arguments_or_first_or_variable
+            object.__setattr__(formula, 'root', root)
+            object.__setattr__(formula, 'first', arguments_or_first_or_variable)
         elif is_binary(root):
             # Populate self.first and self.second
             assert isinstance(arguments_or_first_or_variable, Formula) and \
                    second_or_predicate is not None
-            self.root, self.first, self.second = \
-                root, arguments_or_first_or_variable, second_or_predicate
+            object.__setattr__(formula, 'root', root)
+            object.__setattr__(formula, 'first', arguments_or_first_or_variable)
+            object.__setattr__(formula, 'second', second_or_predicate)
         else:
             assert is_quantifier(root)
             # Populate self.variable and self.predicate
             assert isinstance(arguments_or_first_or_variable, str) and \
                    is_variable(arguments_or_first_or_variable) and \
                    second_or_predicate is not None
-            self.root, self.variable, self.predicate = \
-                root, arguments_or_first_or_variable, second_or_predicate
+            object.__setattr__(formula, 'root', root)
+            object.__setattr__(formula, 'variable',
+                               arguments_or_first_or_variable)
+            object.__setattr__(formula, 'predicate', second_or_predicate)
+        object.__setattr__(formula, '_hash', hash(key))
+        # Another thread may have interned an equal formula in the meantime
+        return _formula_table.setdefault(key, formula)
+
+    def __reduce__(self) -> Tuple[type, tuple]:
+        """Reduces the current formula to its constructor arguments, so that
+        unpickled and copied formulas are interned as well.
+
+        Returns:
+            The `Formula` class and the arguments to construct the current
+            formula from.
+        """
+        if is_equality(self.root) or is_relation(self.root):
+            return Formula, (self.root, self.arguments)
+        if is_unary(self.root):
+            return Formula, (self.root, self.first)
+        if is_binary(self.root):
+            return Formula, (self.root, self.first, self.second)
+        return Formula, (self.root, self.variable, self.predicate)
 
     def __repr__(self) -> str:
         """Computes the string representation of the current formula.
@@ -577,38 +786,7 @@ class Formula:
             The standard string representation of the current formula.
         """
         # Task 7.2
-        # we will print the string recursively:
-
-        # Case 1, base case root is equality
-        if is_equality(self.root):
-            return self.arguments[0].__repr__() + '=' + self.arguments[1].__repr__()
-
-        # Case 2 base case root is unary operator
-        if is_unary(self.root):
-            return self.root + self.first.__repr__()
-
-        # Case 3 base case, root is a binary operator
-        if is_binary(self.root):
-            return '(' + self.first.__repr__() + self.root + self.second.__repr__() + ')'
-
-        # Case 4 relation invocation
-        if is_relation(self.root):
-            if self.arguments:
-                arg_str = ""
-                for i in range(len(self.arguments)):
-                    if i < len(self.arguments) - 1:
-                        arg_str += (self.arguments[i].__repr__() + ",")
-                    else:
-                        arg_str += self.arguments[i].__repr__()
-                        return self.root + '(' + arg_str + ')'
-            else:
-                return self.root + '(' + ')'
-
-        # Case 5 quantification
-        if is_quantifier(self.root):
-            return self.root + self.variable + '[' + self.predicate.__repr__() + ']'
-
-
+        return _to_string(self)
 
     def __eq__(self, other: object) -> bool:
         """Compares the current formula with the given one.
@@ -620,7 +798,8 @@ class Formula:
             ``True`` if the given object is a `Formula` object that equals the
             current formula, ``False`` otherwise.
         """
-        return isinstance(other, Formula) and str(self) == str(other)
+        # Formulas are interned, so equal formulas are the same object
+        return self is other
 
     def __ne__(self, other: object) -> bool:
         """Compares the current formula with the given one.
@@ -635,7 +814,7 @@ class Formula:
         return not self == other
 
     def __hash__(self) -> int:
-        return hash(str(self))
+        return self._hash
 
     @staticmethod
     def parse_prefix(s: str) -> Tuple[Formula, str]:
@@ -651,74 +830,14 @@ class Formula:
             followed by a constant name (e.g., ``'c12'``) or by a variable name
             (e.g., ``'x12'``), then the parsed prefix will include that entire
             name (and not just a part of it, such as ``'x1'``).
+
+        Raises:
+            ParseError: If no prefix of the given string is a valid
+                representation of a formula.
         """
         # Task 7.4.1
-        cur_token = s[0]
-        # cur_token is unary
-        if is_unary(cur_token):
-            cur_term, cur_suffix = Formula.parse_prefix(s[1:])
-            return Formula('~', cur_term), cur_suffix
-
-        # cur_token is binary
-        if cur_token == '(':
-            first_formula, cur_suffix = Formula.parse_prefix(s[1:])
-            cur_operator = ''
-            # cur_formula returns the first formula, suffix must be the binary operator
-            if cur_suffix[0] == '&' or cur_suffix[0] == '|':
-                cur_operator = cur_suffix[0]
-                second_formula, cur_suffix = Formula.parse_prefix(cur_suffix[1:])
-            else:  # operator is ->
-                cur_operator = cur_suffix[:2]
-                second_formula, cur_suffix = Formula.parse_prefix(cur_suffix[2:])
-            binary_formula = Formula(cur_operator, first_formula, second_formula)
-            return binary_formula, cur_suffix[1:]  # from the 1st spot because we need to skip the ')'
-
-        # cur_token is the start of an equality
-        if is_constant(cur_token) or is_function(cur_token) or is_variable(cur_token):
-            first_term, cur_suffix = Term.parse_prefix(s)
-            if cur_suffix[0] == '=':
-                second_term, cur_suffix = Term.parse_prefix(cur_suffix[1:])
-                equality_formula = Formula('=', [first_term, second_term])
-                return equality_formula, cur_suffix
-
-        # cur token is the start of a relation
-        if is_relation(cur_token):
-            arguments = []
-            relation_name = cur_token
-            i = 1
-            while s[i].isalnum():
-                relation_name += s[i]
-                i += 1
-            if s[i] == '(':
-                i += 1
-                if s[i] == ')':
-                    return Formula(relation_name, arguments), s[i+1:]
-                while(is_variable(s[i]) or is_function(s[i]) or is_constant(s[i])):
-                    cur_term, cur_suffix = Term.parse_prefix(s[i:])
-                    arguments.append(cur_term)
-                    i += len(str(cur_term)) + 1
-                    if cur_suffix[0] == ',':
-                        continue
-                    if cur_suffix[0] == ')':
-                        break
-                    # We can assume the +1 is either for a '(' or a ','
-                return Formula(relation_name, arguments), s[i:]
-
-        # cur_token is the start of a quantification
-        if is_quantifier(cur_token):
-            quantifier = cur_token
-            if is_variable(s[1]):
-                cur_variable, cur_suffix = Term.parse_prefix(s[1:])
-                if cur_suffix[0] == '[':
-                    cur_formula, cur_suffix = Formula.parse_prefix(cur_suffix[1:])
-                    return Formula(quantifier, cur_variable.root, cur_formula), cur_suffix[1:]  # from the 1st place to ignore ']'
-
-
-
-
-
-
-
+        formula, position = _parse_formula(s, 0)
+        return formula, s[position:]
 
     @staticmethod
     def parse(s: str) -> Formula:
@@ -729,9 +848,19 @@ class Formula:
 
         Returns:
             A formula whose standard string representation is the given string.
+
+        Raises:
+            ParseError: If the given string is not a valid representation of a
+                formula.
         """
         # Task 7.4.2
-        return Formula.parse_prefix(s)[0]
+        def parse_uncached() -> Formula:
+            formula, position = _parse_formula(s, 0)
+            if position != len(s):
+                raise ParseError('Unexpected character after formula',
+                                 position)
+            return formula
+        return parse_cache.get((Formula, s), parse_uncached)
 
     def constants(self) -> Set[str]:
         """Finds all constant names in the current formula.
@@ -740,40 +869,8 @@ class Formula:
             A set of all constant names used in the current formula.
         """
         # Task 7.6.1
-        ret_set = set()
-
-        # case where root is equality
-        if is_equality(self.root):
-            first_terms = self.arguments[0].constants()
-            second_terms = self.arguments[1].constants()
-            ret_set |= first_terms
-            ret_set |= second_terms
-            return ret_set
-
-        # case where root is unary
-        if is_unary(self.root):
-            ret_set |= self.first.constants()
-            return ret_set
-
-        # Case where root is binary
-        if is_binary(self.root):
-            first_set = self.first.constants()
-            second_set = self.second.constants()
-            ret_set |= first_set
-            ret_set |= second_set
-            return ret_set
-
-        # Case Quantification
-        if is_quantifier(self.root):
-            ret_set |= self.predicate.constants()
-            return ret_set
-
-        # Case of n Array case
-        if is_relation(self.root):
-            for term in self.arguments:
-                ret_set |= (term.constants())
-            return ret_set
-
+        return {term.root for term in _formula_subterms(self)
+                if is_constant(term.root)}
 
     def variables(self) -> Set[str]:
         """Finds all variable names in the current formula.
@@ -782,41 +879,11 @@ class Formula:
             A set of all variable names used in the current formula.
         """
         # Task 7.6.2
-        ret_set = set()
-
-        # case where root is equality
-        if is_equality(self.root):
-            first_terms = self.arguments[0].variables()
-            second_terms = self.arguments[1].variables()
-            ret_set = ret_set.union(first_terms)
-            ret_set = ret_set.union(second_terms)
-            return ret_set
-
-        # case where root is unary
-        if is_unary(self.root):
-            ret_set = ret_set.union(self.first.variables())
-            return ret_set
-
-        # Case where root is binary
-        if is_binary(self.root):
-            first_set = self.first.variables()
-            second_set = self.second.variables()
-            ret_set = ret_set.union(first_set)
-            ret_set = ret_set.union(second_set)
-            return ret_set
-
-        # Case Quantification
-        if is_quantifier(self.root):
-            ret_set = ret_set.union(self.predicate.variables())
-            return ret_set.union(self.variable)
-
-        # Case of n Array case
-        if is_relation(self.root):
-            for term in self.arguments:
-              ret_set = ret_set.union(term.variables())
-            return ret_set
-
-
+        variables = {term.root for term in _formula_subterms(self)
+                     if is_variable(term.root)}
+        variables.update(formula.variable for formula in _subformulas(self)
+                         if is_quantifier(formula.root))
+        return variables
 
     def free_variables(self) -> Set[str]:
         """Finds all variable names that are free in the current formula.
@@ -826,46 +893,30 @@ class Formula:
             within a scope of a quantification on those variable names.
         """
         # Task 7.6.3
-        free_var_set = set()
-
-        if is_equality(self.root):
-            first_terms = self.arguments[0].variables()
-            second_terms = self.arguments[1].variables()
-            free_var_set = free_var_set.union(first_terms, second_terms)
-            return free_var_set
-
-        # case where root is unary
-        if is_unary(self.root):
-            free_var_set |= self.first.free_variables()
-            return free_var_set
-
-        # Case where root is binary
-        if is_binary(self.root):
-            first_set = self.first.free_variables()
-            second_set = self.second.free_variables()
-            free_var_set |= first_set
-            free_var_set |= second_set
-            return free_var_set
-
-        # Case Quantification
-        if is_quantifier(self.root):
-            temp_var_set = self.predicate.free_variables()
-            if self.variable in temp_var_set:
-                temp_var_set.discard(self.variable)
-            free_var_set = free_var_set.union(temp_var_set)
-            return free_var_set
-
-        if is_relation(self.root):
-            for term in self.arguments:
-                free_var_set |= term.variables()
-            return free_var_set
-
-
-
-
-
-
-
+        # go down the formula with the set of variables bound on the way there
+        free_variables = set()
+        visited = set()
+        stack = [(self, frozenset())]
+        while stack:
+            item = stack.pop()
+            if item in visited:
+                continue
+            visited.add(item)
+            formula, bound_variables = item
+            if is_equality(formula.root) or is_relation(formula.root):
+                for term in _subterms(formula.arguments):
+                    if is_variable(term.root) and \
+                            term.root not in bound_variables:
+                        free_variables.add(term.root)
+            elif is_unary(formula.root):
+                stack.append((formula.first, bound_variables))
+            elif is_binary(formula.root):
+                stack.append((formula.first, bound_variables))
+                stack.append((formula.second, bound_variables))
+            else:
+                stack.append((formula.predicate,
+                              bound_variables | {formula.variable}))
+        return free_variables
 
     def functions(self) -> Set[Tuple[str, int]]:
         """Finds all function names in the current formula, along with their
@@ -876,37 +927,8 @@ class Formula:
             all function names used in the current formula.
         """
         # Task 7.6.4
-        func_set = set()
-
-        if is_equality(self.root):
-            first_terms = self.arguments[0].functions()
-            second_terms = self.arguments[1].functions()
-            func_set = func_set.union(first_terms, second_terms)
-            return func_set
-
-        # case where root is unary
-        if is_unary(self.root):
-            func_set |= self.first.functions()
-            return func_set
-
-        # Case where root is binary
-        if is_binary(self.root):
-            first_set = self.first.functions()
-            second_set = self.second.functions()
-            func_set |= first_set
-            func_set |= second_set
-            return func_set
-
-        # Case Quantification
-        if is_quantifier(self.root):
-            func_set |= self.predicate.functions()
-            return func_set
-
-        if is_relation(self.root):
-            for term in self.arguments:
-                func_set |= term.functions()
-            return func_set
-        
+        return {(term.root, len(term.arguments))
+                for term in _formula_subterms(self) if is_function(term.root)}
 
     def relations(self) -> Set[Tuple[str, int]]:
         """Finds all relation names in the current formula, along with their
@@ -917,36 +939,8 @@ class Formula:
             all relation names used in the current formula.
         """
         # Task 7.6.5
-        relation_set = set()
-
-        if is_equality(self.root):
-            return set()
-
-        # case where root is unary
-        if is_unary(self.root):
-            relation_set |= self.first.relations()
-            return relation_set
-
-        # Case where root is binary
-        if is_binary(self.root):
-            first_set = self.first.relations()
-            second_set = self.second.relations()
-            relation_set |= first_set
-            relation_set |= second_set
-            return relation_set
-
-        # Case Quantification
-        if is_quantifier(self.root):
-            relation_set |= self.predicate.relations()
-            return relation_set
-
-        if is_relation(self.root):
-            relation_name = self.root
-            tup = relation_name, len(self.arguments)
-            temp_set = set([tup])
-            relation_set |= temp_set
-            return relation_set
-
+        return {(formula.root, len(formula.arguments))
+                for formula in _subformulas(self) if is_relation(formula.root)}
 
     def substitute(self, substitution_map: Mapping[str, Term],
                    forbidden_variables: AbstractSet[str] = frozenset()) -> \
@@ -1044,7 +1038,7 @@ class Formula:
             if is_relation(formula.root) or is_quantifier(formula.root) or is_equality(formula.root):
                 # check if the value is in the map
                 for key, val in formula_map.items():
-                    if str(val) == str(formula):
+                    if val == formula:
                         return PropositionalFormula(key), formula_map
                 else:
                     new_term = Term(next(fresh_variable_name_generator))
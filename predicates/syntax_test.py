@@ -5,6 +5,8 @@
 
 """Tests for the predicates.syntax module."""
 
+from logic_utils import parse_cache
+
 from predicates.syntax import *
 
 def test_term_repr(debug=False):
@@ -358,6 +360,113 @@ def test_from_propositional_skeleton(debug=False):
                   'returned', formula)
         assert str(formula) == expected
 
+# Tests for extensions beyond the course tasks
+
+def test_hash_consing(debug=False):
+    for s in ['x', 'c12', 'plus(x,1)', 'f(g(x),plus(x,1),_)']:
+        if debug:
+            print('Testing that equal terms are interned for', s)
+        assert Term.parse(s) is Term.parse(s)
+    for s in ['R(plus(x,1))', 'x=y', '~Q()', '(R(x)->Ax[S(x,plus(x,1))])',
+              'Ey[(y=0|~y=plus(y,1))]']:
+        if debug:
+            print('Testing that equal formulas are interned for', s)
+        f1 = Formula.parse(s)
+        f2 = Formula.parse(s)
+        assert f1 is f2
+        assert hash(f1) == hash(f2)
+    if debug:
+        print('Testing sharing of repeated subterms')
+    f = Formula.parse('plus(x,1)=plus(x,1)')
+    assert f.arguments[0] is f.arguments[1]
+    assert Formula.parse('Ax[R(x)]') != Formula.parse('Ay[R(y)]')
+    assert Term('x') != Formula('R', [Term('x')])
+    if debug:
+        print('Testing that copies and unpickled formulas are interned')
+    import copy, pickle
+    f = Formula.parse('Ax[(R(f(x))&~c=x)]')
+    assert copy.deepcopy(f) is f
+    assert pickle.loads(pickle.dumps(f)) is f
+
+def test_parse_errors(debug=False):
+    for parse, s, position in [
+            (Term.parse_prefix, '', 0), (Term.parse_prefix, 'f(', 2),
+            (Term.parse_prefix, 'f()', 2), (Term.parse_prefix, 'plus(x,1', 8),
+            (Term.parse_prefix, 'plus', 4), (Term.parse_prefix, 'R(x)', 0),
+            (Term.parse, 'f(x)y', 4), (Formula.parse_prefix, '', 0),
+            (Formula.parse_prefix, '(R(x)', 5),
+            (Formula.parse_prefix, '(R(x)+Q(y))', 5),
+            (Formula.parse_prefix, 'Ax[R(x)', 7),
+            (Formula.parse_prefix, 'A[R(x)]', 1),
+            (Formula.parse_prefix, 'Ax(R(x))', 2),
+            (Formula.parse_prefix, 'R(x,)', 4), (Formula.parse_prefix, 'x', 1),
+            (Formula.parse_prefix, 'x=', 2), (Formula.parse, 'R(x))', 4)]:
+        if debug:
+            print('Testing the error raised by', parse.__qualname__, 'on', s)
+        try:
+            parse(s)
+            assert False, 'Parsing did not fail'
+        except ParseError as e:
+            assert e.position == position, e
+    if debug:
+        print('Testing parsing of a long relation invocation')
+    n = 20000
+    s = 'R(' + ','.join('plus(x' + str(i) + ',1)' for i in range(n)) + ')'
+    formula = Formula.parse(s)
+    assert len(formula.arguments) == n
+    assert str(formula) == s
+
+def test_deep_formulas(debug=False):
+    n = 50000
+    s = 'R(x)'
+    for i in range(n):
+        s = 'Avar' + str(i % 7) + '[~(' + s + '->Q(var' + str(i % 9) + '))]'
+    if debug:
+        print('Testing a quantified formula of depth', 3 * n)
+    formula = Formula.parse(s)
+    assert str(formula) == s
+    free_variables = {'x'}
+    for i in range(n):
+        if all(i % 9 != j % 7 for j in range(i, min(n, i + 7))):
+            free_variables.add('var' + str(i % 9))
+    assert formula.free_variables() == free_variables
+    assert formula.variables() == \
+           {'x'}.union('var' + str(i) for i in range(9))
+    assert formula.relations() == {('R', 1), ('Q', 1)}
+    s = 'x'
+    for i in range(n):
+        s = 'f(' + s + ',c)'
+    term = Term.parse(s)
+    assert str(term) == s
+    assert term.functions() == {('f', 2)}
+    assert term.constants() == {'c'}
+
+def test_parse_cache(debug=False):
+    capacity = parse_cache.capacity
+    try:
+        parse_cache.clear()
+        if debug:
+            print('Testing the parse cache with terms and formulas')
+        term = Term.parse('f(x,c)')
+        formula = Formula.parse('R(f(x,c))')
+        assert Term.parse('f(x,c)') is term
+        assert Formula.parse('R(f(x,c))') is formula
+        assert Term.parse('x') is not Formula.parse('x=x')
+        info = parse_cache.info()
+        assert (info.hits, info.misses, info.size) == (2, 4, 4), info
+        try:
+            Formula.parse('R(x')
+            assert False, 'Parsing did not fail'
+        except ParseError:
+            pass
+        assert parse_cache.info().size == 4
+        parse_cache.capacity = 1
+        assert parse_cache.info().size == 1
+        assert Formula.parse('x=x') is Formula('=', [Term('x'), Term('x')])
+    finally:
+        parse_cache.clear()
+        parse_cache.capacity = capacity
+
 def test_ex7(debug=False):
     test_term_repr(debug) 
     test_formula_repr(debug)
@@ -380,6 +489,13 @@ def test_ex9(debug=False):
     test_propositional_skeleton(debug)
     test_from_propositional_skeleton(debug)
 
+def test_extensions(debug=False):
+    test_hash_consing(debug)
+    test_parse_errors(debug)
+    test_deep_formulas(debug)
+    test_parse_cache(debug)
+
 def test_all(debug=False):
     test_ex7(debug)
     test_ex9(debug)
+    test_extensions(debug)
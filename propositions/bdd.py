@@ -0,0 +1,588 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: propositions/bdd.py
+
+"""Reduced ordered binary decision diagrams (BDDs) of propositional
+formulas."""
+
+from __future__ import annotations
+from typing import AbstractSet, Collection, Dict, Iterable, List, Mapping, \
+                   Optional, Sequence, Tuple
+from weakref import WeakValueDictionary
+
+from propositions.syntax import *
+
+# The nodes of the terminal diagrams, of the constant functions
+_FALSE, _TRUE = 0, 1
+
+class BDD:
+    """A manager of reduced ordered binary decision diagrams over a common,
+    reorderable order of variables.
+
+    Each node of a diagram is numbered, and is either terminal or labelled by a
+    variable, with a low child for when that variable is false and a high child
+    for when it is true. A unique table per variable keeps a single node per
+    pair of children, so that equivalent functions have the very same diagram,
+    and a fixed-size computed table remembers recent results of `_ite`, each
+    evicting whichever earlier result hashes to the same entry.
+
+    Functions are handed out as `Function` objects, a single one per node,
+    whose nodes are kept by `collect_garbage` and `reorder` while they are in
+    use.
+    """
+
+    def __init__(self, variables: Iterable[str] = (),
+                 cache_size: int = 1 << 16) -> None:
+        """Initializes a manager without diagrams.
+
+        Parameters:
+            variables: variables to order first, in order.
+            cache_size: number of entries of the computed table, a power of
+                two.
+        """
+        assert cache_size > 0 and cache_size & (cache_size - 1) == 0
+        # per node; the variable number of a terminal node is -1
+        self._node_variables = [-1, -1]
+        self._lows = [_FALSE, _TRUE]
+        self._highs = [_FALSE, _TRUE]
+        self._free = []
+        # per variable number
+        self._names = []
+        self._levels = []
+        self._unique: List[Dict[Tuple[int, int], int]] = []
+        # per level
+        self._order = []
+        self._numbers: Dict[str, int] = {}
+        self._cache_mask = cache_size - 1
+        self._cache: List[Optional[Tuple[int, int, int, int]]] = \
+            [None] * cache_size
+        self._functions: WeakValueDictionary = WeakValueDictionary()
+        for variable in variables:
+            self.variable(variable)
+
+    @property
+    def variables(self) -> Tuple[str, ...]:
+        """The variables of the current manager, in their current order."""
+        return tuple(self._names[number] for number in self._order)
+
+    @property
+    def true(self) -> Function:
+        """The constant true function."""
+        return self._function(_TRUE)
+
+    @property
+    def false(self) -> Function:
+        """The constant false function."""
+        return self._function(_FALSE)
+
+    def variable(self, name: str) -> Function:
+        """Returns the function that is true exactly when the given variable
+        is, adding the variable after all others if it is new.
+
+        Parameters:
+            name: variable name.
+
+        Returns:
+            The function of the given variable.
+        """
+        number = self._numbers.get(name)
+        if number is None:
+            assert is_variable(name)
+            number = self._numbers[name] = len(self._names)
+            self._names.append(name)
+            self._levels.append(len(self._order))
+            self._unique.append({})
+            self._order.append(number)
+        return self._function(self._node(number, _FALSE, _TRUE))
+
+    def __len__(self) -> int:
+        """Returns the number of non-terminal nodes in the unique tables,
+        including those no longer in use that were not collected yet."""
+        return sum(len(table) for table in self._unique)
+
+    def _function(self, node: int) -> Function:
+        function = self._functions.get(node)
+        if function is None:
+            function = self._functions[node] = Function(self, node)
+        return function
+
+    def _level(self, node: int) -> int:
+        """
+        Finds the position in the order of the variable of a node.
+
+        :param node: the node to locate
+        :return: the level of the node, which is the number of variables for a
+            terminal node
+        """
+        number = self._node_variables[node]
+        return len(self._order) if number < 0 else self._levels[number]
+
+    def _node(self, number: int, low: int, high: int) -> int:
+        """
+        Finds or creates the node of a variable with the given children.
+
+        :param number: the number of the variable of the node
+        :param low: the child for when the variable is false
+        :param high: the child for when the variable is true
+        :return: the requested node, or the common child if both are the same
+        """
+        if low == high:
+            return low
+        table = self._unique[number]
+        node = table.get((low, high))
+        if node is None:
+            if self._free:
+                node = self._free.pop()
+                self._node_variables[node] = number
+                self._lows[node] = low
+                self._highs[node] = high
+            else:
+                node = len(self._lows)
+                self._node_variables.append(number)
+                self._lows.append(low)
+                self._highs.append(high)
+            table[(low, high)] = node
+        return node
+
+    def _ite(self, condition: int, then: int, otherwise: int) -> int:
+        """
+        Computes the function that is the first function where the condition
+        holds and the second elsewhere.
+
+        :param condition: the node of the condition
+        :param then: the node of the first function
+        :param otherwise: the node of the second function
+        :return: the node of the computed function
+        """
+        if condition == _TRUE:
+            return then
+        if condition == _FALSE:
+            return otherwise
+        if then == otherwise:
+            return then
+        if then == _TRUE and otherwise == _FALSE:
+            return condition
+        index = hash((condition, then, otherwise)) & self._cache_mask
+        entry = self._cache[index]
+        if entry is not None and entry[0] == condition and \
+                entry[1] == then and entry[2] == otherwise:
+            return entry[3]
+        level = min(self._level(condition), self._level(then),
+                    self._level(otherwise))
+        number = self._order[level]
+        node_variables, lows, highs = \
+            self._node_variables, self._lows, self._highs
+        cofactors = [(lows[node], highs[node])
+                     if node_variables[node] == number else (node, node)
+                     for node in (condition, then, otherwise)]
+        low = self._ite(cofactors[0][0], cofactors[1][0], cofactors[2][0])
+        high = self._ite(cofactors[0][1], cofactors[1][1], cofactors[2][1])
+        result = self._node(number, low, high)
+        self._cache[index] = (condition, then, otherwise, result)
+        return result
+
+    def _not(self, node: int) -> int:
+        return self._ite(node, _FALSE, _TRUE)
+
+    def _apply(self, operator: str, first: int, second: int) -> int:
+        """
+        Combines two functions with a binary operator.
+
+        :param operator: the binary operator
+        :param first: the node of the first operand
+        :param second: the node of the second operand
+        :return: the node of the combined function
+        """
+        if operator == '&':
+            return self._ite(first, second, _FALSE)
+        if operator == '|':
+            return self._ite(first, _TRUE, second)
+        if operator == '->':
+            return self._ite(first, second, _TRUE)
+        if operator == '+':
+            return self._ite(first, self._not(second), second)
+        if operator == '<->':
+            return self._ite(first, second, self._not(second))
+        if operator == '-&':
+            return self._not(self._ite(first, second, _FALSE))
+        assert operator == '-|'
+        return self._not(self._ite(first, _TRUE, second))
+
+    def from_formula(self, formula: Formula) -> Function:
+        """Builds the diagram of the given formula, adding its new variables
+        after all others in the order of their first occurrence.
+
+        Parameters:
+            formula: formula to build the diagram of.
+
+        Returns:
+            The function of the given formula.
+        """
+        nodes: Dict[Formula, int] = {}
+        stack = [formula]
+        while stack:
+            current = stack[-1]
+            if current in nodes:
+                stack.pop()
+                continue
+            root = current.root
+            if is_variable(root):
+                nodes[current] = self.variable(root)._node
+            elif is_constant(root):
+                nodes[current] = _TRUE if root == 'T' else _FALSE
+            elif is_unary(root):
+                if current.first not in nodes:
+                    stack.append(current.first)
+                    continue
+                nodes[current] = self._not(nodes[current.first])
+            else:
+                if current.first not in nodes or current.second not in nodes:
+                    stack.extend((current.second, current.first))
+                    continue
+                nodes[current] = self._apply(root, nodes[current.first],
+                                             nodes[current.second])
+            stack.pop()
+        return self._function(nodes[formula])
+
+    def from_values(self, variables: Sequence[str],
+                    values: Iterable[bool]) -> Function:
+        """Builds the diagram of the function with the given truth table.
+
+        Parameters:
+            variables: variables of the truth table.
+            values: values of the function in every model over the given
+                variables, in the order returned by
+                `~propositions.semantics.all_models`\\ ``(``\\ `variables`\\ ``)``.
+
+        Returns:
+            The function with the given truth table.
+        """
+        numbers = [self.variable(variable)._node for variable in variables]
+        nodes = [_TRUE if value else _FALSE for value in values]
+        assert len(nodes) == 2 ** len(numbers)
+        # combine pairs of halves of the truth table, the last variable first
+        for variable in reversed(numbers):
+            nodes = [self._ite(variable, nodes[index + 1], nodes[index])
+                     for index in range(0, len(nodes), 2)]
+        return self._function(nodes[0])
+
+    def collect_garbage(self) -> int:
+        """Removes the nodes that are not part of any diagram in use.
+
+        Returns:
+            The number of remaining non-terminal nodes.
+        """
+        lows, highs = self._lows, self._highs
+        live = set()
+        stack = [node for node in list(self._functions.keys()) if node > 1]
+        while stack:
+            node = stack.pop()
+            if node not in live:
+                live.add(node)
+                for child in (lows[node], highs[node]):
+                    if child > 1 and child not in live:
+                        stack.append(child)
+        collected = False
+        for table in self._unique:
+            dead = [key for key, node in table.items() if node not in live]
+            for key in dead:
+                self._free.append(table.pop(key))
+                collected = True
+        if collected:
+            # the computed table may refer to the freed nodes
+            self._cache = [None] * len(self._cache)
+        return len(live)
+
+    def _swap(self, level: int) -> None:
+        """
+        Swaps the variables of a level and of the level below it, keeping
+        every node the same function.
+
+        :param level: the level to swap with the next one
+        """
+        upper, lower = self._order[level], self._order[level + 1]
+        node_variables, lows, highs = \
+            self._node_variables, self._lows, self._highs
+        table = self._unique[upper]
+        moved = [node for node in table.values()
+                 if node_variables[lows[node]] == lower or
+                 node_variables[highs[node]] == lower]
+        for node in moved:
+            del table[(lows[node], highs[node])]
+        self._order[level], self._order[level + 1] = lower, upper
+        self._levels[upper], self._levels[lower] = level + 1, level
+        for node in moved:
+            low, high = lows[node], highs[node]
+            low_low, low_high = (lows[low], highs[low]) \
+                if node_variables[low] == lower else (low, low)
+            high_low, high_high = (lows[high], highs[high]) \
+                if node_variables[high] == lower else (high, high)
+            low = self._node(upper, low_low, high_low)
+            high = self._node(upper, low_high, high_high)
+            node_variables[node], lows[node], highs[node] = lower, low, high
+            self._unique[lower][(low, high)] = node
+
+    def reorder(self) -> int:
+        """Reorders the variables by sifting: moves each variable in turn,
+        those labelling the most nodes first, to the position at which the
+        diagrams in use have the fewest nodes.
+
+        Returns:
+            The number of non-terminal nodes after reordering.
+        """
+        size = self.collect_garbage()
+        numbers = sorted(range(len(self._names)),
+                         key=lambda number: -len(self._unique[number]))
+        last = len(self._order) - 1
+        for number in numbers:
+            best_size, best_level = size, self._levels[number]
+            # sift the variable down to the last level, then up to the first
+            for direction, stop in ((1, last), (-1, 0)):
+                while self._levels[number] != stop:
+                    level = self._levels[number]
+                    self._swap(level if direction == 1 else level - 1)
+                    size = self.collect_garbage()
+                    if size < best_size:
+                        best_size, best_level = size, self._levels[number]
+            while self._levels[number] != best_level:
+                self._swap(self._levels[number])
+            size = self.collect_garbage()
+        return size
+
+class Function:
+    """A Boolean function, represented by a node of a `BDD`.
+
+    As each manager hands out a single `Function` per node, and equivalent
+    functions of a manager share their node, two functions of the same manager
+    are equivalent if and only if they are the very same object.
+
+    Attributes:
+        manager (`BDD`): the manager of the diagram of the function.
+    """
+    __slots__ = ('manager', '_node', '__weakref__')
+
+    manager: BDD
+
+    def __init__(self, manager: BDD, node: int) -> None:
+        self.manager = manager
+        self._node = node
+
+    def _combine(self, operator: str, other: Function) -> Function:
+        assert self.manager is other.manager
+        return self.manager._function(
+            self.manager._apply(operator, self._node, other._node))
+
+    def __invert__(self) -> Function:
+        return self.manager._function(self.manager._not(self._node))
+
+    def __and__(self, other: Function) -> Function:
+        return self._combine('&', other)
+
+    def __or__(self, other: Function) -> Function:
+        return self._combine('|', other)
+
+    def __xor__(self, other: Function) -> Function:
+        return self._combine('+', other)
+
+    def implies(self, other: Function) -> Function:
+        """Returns the implication from the current function to the given
+        one."""
+        return self._combine('->', other)
+
+    def iff(self, other: Function) -> Function:
+        """Returns the equivalence of the current function and the given
+        one."""
+        return self._combine('<->', other)
+
+    def ite(self, then: Function, otherwise: Function) -> Function:
+        """Returns the function that is the first given function where the
+        current function holds and the second one elsewhere."""
+        assert self.manager is then.manager is otherwise.manager
+        return self.manager._function(self.manager._ite(
+            self._node, then._node, otherwise._node))
+
+    def exists(self, variables: Iterable[str]) -> Function:
+        """Existentially quantifies the given variables.
+
+        Parameters:
+            variables: variables to quantify.
+
+        Returns:
+            The function that is true in a model if and only if the current
+            function is true in some model that differs from it at most in the
+            given variables.
+        """
+        manager = self.manager
+        numbers = {manager._numbers[variable] for variable in variables
+                   if variable in manager._numbers}
+        results = {_FALSE: _FALSE, _TRUE: _TRUE}
+        for node in self._nodes():
+            number = manager._node_variables[node]
+            low = results[manager._lows[node]]
+            high = results[manager._highs[node]]
+            results[node] = manager._ite(low, _TRUE, high) \
+                if number in numbers else manager._node(number, low, high)
+        return manager._function(results[self._node])
+
+    def is_tautology(self) -> bool:
+        """Checks if the current function is true in every model."""
+        return self._node == _TRUE
+
+    def is_contradiction(self) -> bool:
+        """Checks if the current function is false in every model."""
+        return self._node == _FALSE
+
+    def is_satisfiable(self) -> bool:
+        """Checks if the current function is true in some model."""
+        return self._node != _FALSE
+
+    def is_equivalent(self, other: Function) -> bool:
+        """Checks if the current function has the same value as the given
+        function of the same manager in every model."""
+        assert self.manager is other.manager
+        return self is other
+
+    def _nodes(self) -> List[int]:
+        """
+        Lists the non-terminal nodes of the diagram of the current function.
+
+        :return: the nodes, each after all of its descendants
+        """
+        lows, highs = self.manager._lows, self.manager._highs
+        order = []
+        visited = set()
+        stack = [self._node]
+        while stack:
+            node = stack[-1]
+            if node <= _TRUE or node in visited:
+                stack.pop()
+                continue
+            pending = [child for child in (highs[node], lows[node])
+                       if child > _TRUE and child not in visited]
+            if len(pending) > 0:
+                stack.extend(pending)
+                continue
+            visited.add(node)
+            order.append(node)
+            stack.pop()
+        return order
+
+    def size(self) -> int:
+        """Returns the number of non-terminal nodes of the diagram of the
+        current function."""
+        return len(self._nodes())
+
+    def support(self) -> AbstractSet[str]:
+        """Returns the variables that the current function depends on."""
+        manager = self.manager
+        return {manager._names[manager._node_variables[node]]
+                for node in self._nodes()}
+
+    def count_models(self, variables: Optional[Collection[str]] = None) -> int:
+        """Counts the models in which the current function is true.
+
+        Parameters:
+            variables: variables of the models, which must include every
+                variable that the current function depends on. Defaults to
+                those variables.
+
+        Returns:
+            The number of models over the given variables in which the current
+            function is true.
+        """
+        manager = self.manager
+        nodes = self._nodes()
+        support = {manager._node_variables[node] for node in nodes}
+        if variables is None:
+            count = len(support)
+        else:
+            assert support <= {manager._numbers.get(variable)
+                               for variable in variables}
+            count = len(set(variables))
+        # counts[node] is the number of models over the variables of the levels
+        # from that of the node on
+        total = len(manager._order)
+        counts = {_FALSE: 0, _TRUE: 1}
+        levels = {_FALSE: total, _TRUE: total}
+        for node in nodes:
+            level = levels[node] = manager._level(node)
+            low, high = manager._lows[node], manager._highs[node]
+            counts[node] = (counts[low] << (levels[low] - level - 1)) + \
+                           (counts[high] << (levels[high] - level - 1))
+        # scale the number of models over all variables of the manager to the
+        # given variables
+        node = self._node
+        return (counts[node] << levels[node] << count) >> total
+
+    def satisfying_model(self) -> Optional[Dict[str, bool]]:
+        """Finds a model in which the current function is true.
+
+        Returns:
+            A model over the variables that the current function depends on in
+            which it is true, or ``None`` if there is none.
+        """
+        if self._node == _FALSE:
+            return None
+        manager = self.manager
+        model = dict.fromkeys(self.support(), False)
+        node = self._node
+        while node > _TRUE:
+            name = manager._names[manager._node_variables[node]]
+            model[name] = manager._lows[node] == _FALSE
+            node = manager._highs[node] if model[name] else manager._lows[node]
+        return model
+
+    def evaluate(self, model: Mapping[str, bool]) -> bool:
+        """Calculates the value of the current function in the given model.
+
+        Parameters:
+            model: model over the variables that the current function depends
+                on.
+
+        Returns:
+            The value of the current function in the given model.
+        """
+        manager = self.manager
+        node = self._node
+        while node > _TRUE:
+            node = manager._highs[node] \
+                if model[manager._names[manager._node_variables[node]]] \
+                else manager._lows[node]
+        return node == _TRUE
+
+    def to_formula(self) -> Formula:
+        """Converts the current function to a formula that branches on the
+        variables of its diagram, sharing a subformula per node.
+
+        Returns:
+            A formula with the same value as the current function in every
+            model.
+        """
+        manager = self.manager
+        formulas = {_FALSE: Formula('F'), _TRUE: Formula('T')}
+        for node in self._nodes():
+            variable = Formula(manager._names[manager._node_variables[node]])
+            low, high = manager._lows[node], manager._highs[node]
+            if low == _FALSE and high == _TRUE:
+                formula = variable
+            elif low == _TRUE and high == _FALSE:
+                formula = Formula('~', variable)
+            elif high == _TRUE:
+                formula = Formula('|', variable, formulas[low])
+            elif low == _FALSE:
+                formula = Formula('&', variable, formulas[high])
+            elif high == _FALSE:
+                formula = Formula('&', Formula('~', variable), formulas[low])
+            elif low == _TRUE:
+                formula = Formula('->', variable, formulas[high])
+            else:
+                formula = Formula('|',
+                                  Formula('&', variable, formulas[high]),
+                                  Formula('&', Formula('~', variable),
+                                          formulas[low]))
+            formulas[node] = formula
+        return formulas[self._node]
+
+    def __repr__(self) -> str:
+        return repr(self.to_formula())
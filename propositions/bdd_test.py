@@ -0,0 +1,103 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: propositions/bdd_test.py
+
+"""Tests for the propositions.bdd module."""
+
+from propositions.syntax import *
+from propositions.semantics import *
+from propositions.bdd import *
+
+_FORMULAS = ['p', '~p', 'T', 'F', '(p&~p)', '(p|~p)', '(p->q)', '~(p->q)',
+             '(p+q)', '(p<->q)', '(p-&q)', '(p-|q)', '((p+q)+(r+s))',
+             '((p->q)<->(~q->~p))', '((p|q)&(~p|r))', '~((p&(q->F))-|(r+T))',
+             '(((p<->q)&(q+r))|~(s-&(p->r)))']
+
+def test_bdd_functions(debug=False):
+    manager = BDD()
+    variables = ['p', 'q', 'r', 's']
+    functions = {}
+    for infix in _FORMULAS:
+        formula = Formula.parse(infix)
+        if debug:
+            print('Testing the diagram of', infix)
+        function = manager.from_formula(formula)
+        functions[formula] = function
+        values = list(truth_values(formula, all_models(variables)))
+        for model, value in zip(all_models(variables), values):
+            assert function.evaluate(model) == value
+        assert function.is_tautology() == is_tautology(formula)
+        assert function.is_contradiction() == is_contradiction(formula)
+        assert function.is_satisfiable() == is_satisfiable(formula)
+        assert function.count_models(variables) == sum(values)
+        assert function.support() <= formula.variables()
+        assert manager.from_formula(function.to_formula()) is function
+        assert manager.from_values(variables, values) is function
+        model = function.satisfying_model()
+        if model is None:
+            assert not function.is_satisfiable()
+        else:
+            assert function.evaluate(model)
+
+    if debug:
+        print('Testing equivalence of diagrams')
+    assert functions[Formula.parse('((p->q)<->(~q->~p))')] is manager.true
+    assert functions[Formula.parse('(p&~p)')] is manager.false
+    assert functions[Formula.parse('(p+q)')].is_equivalent(
+        ~functions[Formula.parse('(p<->q)')])
+    p, q, r = manager.variable('p'), manager.variable('q'), \
+              manager.variable('r')
+    assert (p & q) | (p & r) is p & (q | r)
+    assert p.implies(q) is ~p | q
+    assert p.iff(q) is ~(p ^ q)
+    assert p.ite(q, r) is (p & q) | (~p & r)
+    assert (p ^ q ^ r).size() == 5
+    assert (p | q).count_models() == 3
+    assert (p | q).count_models(['p', 'q', 'r']) == 6
+    assert manager.true.count_models() == 1
+    assert manager.false.count_models(['p']) == 0
+    assert ((p & q) | (~p & r)).exists(['p']) is q | r
+    assert (p ^ q).exists(['q', 'z']) is manager.true
+    assert (p & q).exists([]) is p & q
+
+def test_bdd_large(debug=False):
+    if debug:
+        print('Testing the diagram of the parity of 60 variables')
+    parity = Formula('x0')
+    for i in range(1, 60):
+        parity = Formula('+', parity, Formula('x' + str(i)))
+    manager = BDD()
+    function = manager.from_formula(parity)
+    assert function.size() == 2 * 60 - 1
+    assert function.count_models() == 2 ** 59
+    assert not function.is_tautology()
+    assert manager.from_formula(Formula('+', parity, parity)) is manager.false
+    assert manager.from_formula(function.to_formula()) is function
+
+    if debug:
+        print('Testing reordering of a diagram')
+    n = 8
+    manager = BDD(['x' + str(i) for i in range(n)] +
+                  ['y' + str(i) for i in range(n)])
+    formula = Formula('F')
+    for i in range(n):
+        formula = Formula('|', formula, Formula('&', Formula('x' + str(i)),
+                                                Formula('y' + str(i))))
+    function = manager.from_formula(formula)
+    other = manager.from_formula(Formula.parse('(x0->(y7&x3))'))
+    assert function.size() == 2 ** (n + 1) - 2
+    count = function.count_models()
+    manager.reorder()
+    assert function.size() == 2 * n
+    assert manager.collect_garbage() == len(manager)
+    assert function.count_models() == count
+    assert manager.from_formula(formula) is function
+    assert manager.from_formula(Formula.parse('(x0->(y7&x3))')) is other
+    for model in all_models(['x0', 'x3', 'y7']):
+        assert other.evaluate(model) == \
+               (not model['x0'] or (model['y7'] and model['x3']))
+
+def test_bdd(debug=False):
+    test_bdd_functions(debug)
+    test_bdd_large(debug)
@@ -93,12 +93,11 @@ def combine_proofs(antecedent1_proof: Proof, antecedent2_proof: Proof,
         # for each line adjust the index if the line has assumptions
         lines = lines.__add__(tuple([Proof.Line(line.formula, line.rule if not line.is_assumption() else None, None if line.is_assumption() else tuple(x + len_proof_one for x in line.assumptions)) for line in antecedent2_proof.lines]))
     #  add lines in following order: prove full double conditional
-    lines = lines.__add__(tuple([Proof.Line(Formula.parse('(' + str(antecedent1_proof.statement.conclusion) + '->' +
-                                                          '(' + str(antecedent2_proof.statement.conclusion) + '->' + str(consequent) + ')' + ')'),
+    inner_conditional = Formula('->', antecedent2_proof.statement.conclusion, consequent)
+    lines = lines.__add__(tuple([Proof.Line(Formula('->', antecedent1_proof.statement.conclusion, inner_conditional),
                                             rule=double_conditional, assumptions=[])]))
     # Prove inner conditional using MP
-    lines = lines.__add__(tuple([Proof.Line(Formula.parse('(' + str(antecedent2_proof.statement.conclusion) +
-                                                          '->' + str(consequent) + ')'),
+    lines = lines.__add__(tuple([Proof.Line(inner_conditional,
                                             rule=MP, assumptions=[len_proof_one-1, len_proof_combined])]))
     # Prove conclusion using MP on the inner condition and outer condition
     lines = lines.__add__(tuple([Proof.Line(consequent, MP, [len_proof_combined-1, len_proof_combined+1])]))
@@ -0,0 +1,390 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: propositions/normal_forms.py
+
+"""Conversion of propositional formulas to conjunctive and disjunctive normal
+forms."""
+
+from typing import AbstractSet, Dict, FrozenSet, Iterable, Iterator, List, \
+                   Optional, Sequence, Tuple
+
+from logic_utils import LRUCache
+
+from propositions.syntax import *
+from propositions.sat import add_formula_clauses
+
+#: A clause or term, as the disjunction or conjunction of its literals, each a
+#: variable or the negation of a variable.
+Clause = List[Formula]
+
+class FreshNames:
+    """A supply of variable names ``'t1'``, ``'t2'``, ..., with a customizable
+    prefix, that skips reserved names.
+
+    Each conversion that introduces variables draws them from its own supply,
+    which reserves the variables of the converted formula. Passing the same
+    supply to several conversions keeps their new variables distinct.
+    """
+
+    def __init__(self, prefix: str = 't', reserved: Iterable[str] = ()) -> \
+            None:
+        """Initializes a supply of names.
+
+        Parameters:
+            prefix: prefix of the supplied names.
+            reserved: names not to supply.
+        """
+        assert is_variable(prefix) and prefix.isalpha()
+        self._prefix = prefix
+        self._counter = 0
+        self._reserved = set(reserved)
+
+    def reserve(self, names: Iterable[str]) -> None:
+        """Excludes the given names from the names supplied from now on.
+
+        Parameters:
+            names: names not to supply.
+        """
+        self._reserved.update(names)
+
+    def __iter__(self) -> Iterator[str]:
+        return self
+
+    def __next__(self) -> str:
+        while True:
+            self._counter += 1
+            name = self._prefix + str(self._counter)
+            if name not in self._reserved:
+                return name
+
+class _ClauseList:
+    """A recipient of the clauses of `~propositions.sat.add_formula_clauses`
+    that keeps them instead of solving them."""
+
+    def __init__(self) -> None:
+        self.variable_count = 0
+        self.clauses = []
+
+    def new_variable(self) -> int:
+        self.variable_count += 1
+        return self.variable_count
+
+    def add_clause(self, literals: Iterable[int]) -> None:
+        self.clauses.append(list(literals))
+
+def tseitin_clauses(formula: Formula, names: Optional[FreshNames] = None) -> \
+        List[Clause]:
+    """Computes the Tseitin encoding of the given formula: clauses, linear in
+    the number of distinct subformulas of the given formula, that can be
+    satisfied exactly by the models of the given formula extended to new
+    variables defining its binary subformulas.
+
+    Parameters:
+        formula: formula to encode.
+        names: supply of the new variables, by default a `FreshNames` that
+            reserves the variables of the given formula.
+
+    Returns:
+        The clauses of the encoding, each a list of literals.
+    """
+    if names is None:
+        names = FreshNames(reserved=formula.variables())
+    else:
+        names.reserve(formula.variables())
+    clause_list = _ClauseList()
+    literals = {}
+    root = add_formula_clauses(clause_list, formula, literals)
+    variables = [None] * (clause_list.variable_count + 1)
+    for node, literal in literals.items():
+        if literal > 0 and is_variable(node.root):
+            variables[literal] = node
+    for number in range(1, len(variables)):
+        if variables[number] is None:
+            variables[number] = Formula(next(names))
+    def literal_formula(literal: int) -> Formula:
+        variable = variables[abs(literal)]
+        return variable if literal > 0 else Formula('~', variable)
+    return [[literal_formula(literal) for literal in clause]
+            for clause in clause_list.clauses + [[root]]]
+
+def tseitin_cnf(formula: Formula, names: Optional[FreshNames] = None) -> \
+        Formula:
+    """Converts the given formula to an equisatisfiable formula in conjunctive
+    normal form by the Tseitin encoding of `tseitin_clauses`.
+
+    Parameters:
+        formula: formula to convert.
+        names: supply of the new variables, by default a `FreshNames` that
+            reserves the variables of the given formula.
+
+    Returns:
+        A conjunction of disjunctions of literals, whose size is linear in the
+        number of distinct subformulas of the given formula, that is satisfied
+        by a model if and only if the given formula is satisfied by its
+        restriction to the variables of the given formula.
+    """
+    return clauses_to_cnf(tseitin_clauses(formula, names))
+
+def clauses_to_cnf(clauses: Sequence[Clause]) -> Formula:
+    """Combines the given clauses into a formula in conjunctive normal form.
+
+    Parameters:
+        clauses: clauses to combine.
+
+    Returns:
+        The conjunction of the disjunctions of the given clauses, ``'T'`` if
+        there are no clauses, where an empty clause is ``'F'``.
+    """
+    return _combine([_combine(clause, '|', 'F') for clause in clauses],
+                    '&', 'T')
+
+def terms_to_dnf(terms: Sequence[Clause]) -> Formula:
+    """Combines the given terms into a formula in disjunctive normal form.
+
+    Parameters:
+        terms: terms to combine.
+
+    Returns:
+        The disjunction of the conjunctions of the given terms, ``'F'`` if there
+        are no terms, where an empty term is ``'T'``.
+    """
+    return _combine([_combine(term, '&', 'T') for term in terms], '|', 'F')
+
+def _combine(formulas: Sequence[Formula], operator: str, empty: str) -> \
+        Formula:
+    """
+    Combines formulas with a binary operator.
+
+    :param formulas: the formulas to combine
+    :param operator: the operator to combine them with
+    :param empty: the constant to return when there are no formulas
+    :return: the formulas combined from left to right
+    """
+    if len(formulas) == 0:
+        return Formula(empty)
+    combined = formulas[0]
+    for formula in formulas[1:]:
+        combined = Formula(operator, combined, formula)
+    return combined
+
+def to_dimacs(clauses: Sequence[Clause]) -> str:
+    """Writes the given clauses in the DIMACS CNF format read by SAT solvers.
+
+    Parameters:
+        clauses: clauses to write.
+
+    Returns:
+        The DIMACS text of the given clauses, numbering the variables in order
+        of appearance and listing each variable name in a comment line.
+    """
+    numbers = {}
+    lines = []
+    for clause in clauses:
+        codes = []
+        for literal in clause:
+            variable = literal.first if literal.root == '~' else literal
+            assert is_variable(variable.root)
+            number = numbers.setdefault(variable.root, len(numbers) + 1)
+            codes.append(str(-number if literal.root == '~' else number))
+        lines.append(' '.join(codes + ['0']))
+    return '\n'.join(['c ' + str(number) + ' ' + name
+                      for name, number in numbers.items()] +
+                     ['p cnf ' + str(len(numbers)) + ' ' + str(len(clauses))] +
+                     lines) + '\n'
+
+# A literal of a clause set below is a variable name and whether it appears
+# unnegated. A clause set is the conjunction of its clauses, each the
+# disjunction of its literals.
+_ClauseSet = FrozenSet[FrozenSet[Tuple[str, bool]]]
+
+_TRUE_CLAUSES: _ClauseSet = frozenset()
+_FALSE_CLAUSES: _ClauseSet = frozenset([frozenset()])
+
+def _clause_union(first: _ClauseSet, second: _ClauseSet) -> _ClauseSet:
+    """
+    Computes the conjunction of two clause sets.
+
+    :param first: the first clause set
+    :param second: the second clause set
+    :return: a minimal clause set equivalent to their conjunction
+    """
+    return _minimal(first | second)
+
+def _clause_product(first: _ClauseSet, second: _ClauseSet) -> _ClauseSet:
+    """
+    Computes the disjunction of two clause sets by distributing it over their
+    conjunctions.
+
+    :param first: the first clause set
+    :param second: the second clause set
+    :return: a minimal clause set equivalent to their disjunction
+    """
+    clauses = set()
+    for clause in first:
+        for other in second:
+            combined = clause | other
+            if not any((name, not positive) in combined
+                       for name, positive in clause):
+                clauses.add(combined)
+    return _minimal(clauses)
+
+def _minimal(clauses: AbstractSet[FrozenSet[Tuple[str, bool]]]) -> _ClauseSet:
+    """
+    Removes subsumed clauses.
+
+    :param clauses: the clauses of a clause set
+    :return: the clauses that do not contain another of the given clauses
+    """
+    kept = []
+    for clause in sorted(clauses, key=len):
+        if not any(other <= clause for other in kept):
+            kept.append(clause)
+    return frozenset(kept)
+
+def _clause_set(formula: Formula, positive: bool) -> _ClauseSet:
+    """
+    Computes a minimal clause set equivalent to a formula or its negation,
+    converting each distinct subformula once per polarity.
+
+    :param formula: the formula to convert
+    :param positive: False to convert the negation of the formula instead
+    :return: the clause set equivalent to the formula or its negation
+    """
+    memo: Dict[Tuple[Formula, bool], _ClauseSet] = {}
+    top = (formula, positive)
+    stack = [top]
+    while stack:
+        key = stack[-1]
+        if key in memo:
+            stack.pop()
+            continue
+        node, positive = key
+        root = node.root
+        if is_variable(root):
+            memo[key] = frozenset([frozenset([(root, positive)])])
+        elif is_constant(root):
+            memo[key] = _TRUE_CLAUSES if (root == 'T') == positive \
+                        else _FALSE_CLAUSES
+        elif is_unary(root):
+            operand = (node.first, not positive)
+            if operand not in memo:
+                stack.append(operand)
+                continue
+            memo[key] = memo[operand]
+        else:
+            first, second = node.first, node.second
+            if root in ('-&', '-|'):
+                root, positive = root[1], not positive
+            if root == '->':
+                # (p->q) is (~p|q) and ~(p->q) is (p&~q)
+                operands = (((first, not positive), (second, positive)),)
+                combine = _clause_product if positive else _clause_union
+            elif root in ('&', '|'):
+                operands = (((first, positive), (second, positive)),)
+                combine = _clause_union if (root == '&') == positive \
+                          else _clause_product
+            else:
+                # (p+q) is ((p|q)&(~p|~q)) and (p<->q) is ((~p|q)&(p|~q))
+                if (root == '+') == positive:
+                    operands = (((first, True), (second, True)),
+                                ((first, False), (second, False)))
+                else:
+                    operands = (((first, False), (second, True)),
+                                ((first, True), (second, False)))
+                combine = None
+            missing = [operand for pair in operands for operand in pair
+                       if operand not in memo]
+            if len(missing) > 0:
+                stack.extend(reversed(missing))
+                continue
+            if combine is None:
+                memo[key] = _clause_union(
+                    *[_clause_product(memo[left], memo[right])
+                      for left, right in operands])
+            else:
+                (left, right), = operands
+                memo[key] = combine(memo[left], memo[right])
+        stack.pop()
+    return memo[top]
+
+def _sorted_clauses(clauses: _ClauseSet, negate: bool) -> \
+        Tuple[Tuple[Formula, ...], ...]:
+    """
+    Orders a clause set and converts its literals to formulas.
+
+    :param clauses: the clause set to convert
+    :param negate: whether to negate each literal
+    :return: the clauses, shortest first, each listing its literals by name
+    """
+    ordered = sorted(sorted((name, positive != negate)
+                            for name, positive in clause)
+                     for clause in clauses)
+    ordered.sort(key=len)
+    return tuple(tuple(Formula(name) if positive
+                       else Formula('~', Formula(name))
+                       for name, positive in clause)
+                 for clause in ordered)
+
+# A cache of the conversions below, keyed by the normal form and the formula.
+normal_forms: LRUCache = LRUCache(1024)
+
+def cnf_clauses(formula: Formula) -> List[Clause]:
+    """Computes the clauses of a conjunctive normal form of the given formula,
+    with no new variables, no clause containing both a variable and its
+    negation, and no clause containing another clause.
+
+    Parameters:
+        formula: formula to convert.
+
+    Returns:
+        Clauses whose conjunction has the same truth table as the given
+        formula.
+    """
+    return [list(clause) for clause in normal_forms.get(
+        ('cnf', formula), lambda: _sorted_clauses(_clause_set(formula, True),
+                                                  False))]
+
+def dnf_terms(formula: Formula) -> List[Clause]:
+    """Computes the terms of a disjunctive normal form of the given formula,
+    with no new variables, no term containing both a variable and its
+    negation, and no term containing another term.
+
+    Parameters:
+        formula: formula to convert.
+
+    Returns:
+        Terms whose disjunction has the same truth table as the given formula.
+    """
+    # the negation of a conjunctive normal form of the negation
+    return [list(term) for term in normal_forms.get(
+        ('dnf', formula), lambda: _sorted_clauses(_clause_set(formula, False),
+                                                  True))]
+
+def to_cnf(formula: Formula) -> Formula:
+    """Converts the given formula to an equivalent formula in conjunctive
+    normal form, by distributing disjunctions over conjunctions once per
+    distinct subformula.
+
+    Parameters:
+        formula: formula to convert.
+
+    Returns:
+        A conjunction of disjunctions of literals, the clauses of
+        `cnf_clauses`, that has the same truth table as the given formula.
+    """
+    return clauses_to_cnf(cnf_clauses(formula))
+
+def to_dnf(formula: Formula) -> Formula:
+    """Converts the given formula to an equivalent formula in disjunctive
+    normal form, by distributing conjunctions over disjunctions once per
+    distinct subformula.
+
+    Parameters:
+        formula: formula to convert.
+
+    Returns:
+        A disjunction of conjunctions of literals, the terms of `dnf_terms`,
+        that has the same truth table as the given formula.
+    """
+    return terms_to_dnf(dnf_terms(formula))
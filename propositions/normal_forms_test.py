@@ -0,0 +1,105 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: propositions/normal_forms_test.py
+
+"""Tests for the propositions.normal_forms module."""
+
+from propositions.syntax import *
+from propositions.semantics import *
+from propositions.operators import to_not_and_or
+from propositions.sat import satisfying_model
+from propositions.normal_forms import *
+
+_FORMULAS = ['p', '~p', 'T', 'F', '(p&~p)', '(p|~p)', '(p->q)', '~(p->q)',
+             '(p+q)', '(p<->q)', '(p-&q)', '(p-|q)', '((p+q)+(r+s))',
+             '((p->q)<->(~q->~p))', '((p|q)&(~p|r))', '~((p&(q->F))-|(r+T))',
+             '(((p<->q)&(q+r))|~(s-&(p->r)))']
+
+def _is_literal(formula: Formula) -> bool:
+    return is_variable(formula.root) or \
+           (formula.root == '~' and is_variable(formula.first.root))
+
+def test_to_cnf_and_dnf(debug=False):
+    for infix in _FORMULAS:
+        formula = Formula.parse(infix)
+        if debug:
+            print('Testing normal forms of', infix)
+        clauses = cnf_clauses(formula)
+        terms = dnf_terms(formula)
+        for normal_form in clauses, terms:
+            for clause in normal_form:
+                assert all(_is_literal(literal) for literal in clause)
+                assert not any(Formula('~', literal) in clause
+                               for literal in clause)
+            for clause in normal_form:
+                assert not any(set(other) < set(clause)
+                               for other in normal_form)
+        assert is_tautology(Formula('<->', formula, to_cnf(formula)))
+        assert is_tautology(Formula('<->', formula, to_dnf(formula)))
+        assert to_cnf(formula).variables() <= formula.variables()
+    assert str(to_cnf(Formula.parse('(p+q)'))) == '((~p|~q)&(p|q))'
+    assert str(to_dnf(Formula.parse('(p<->q)'))) == '((~p&~q)|(p&q))'
+    assert str(to_cnf(Formula.parse('(p|~p)'))) == 'T'
+    assert str(to_dnf(Formula.parse('(p&~p)'))) == 'F'
+    assert str(to_cnf(Formula.parse('((p&q)|p)'))) == 'p'
+
+    if debug:
+        print('Testing that shared subformulas are converted once')
+    shared = Formula.parse('((p+q)+(r+s))')
+    for i in range(100):
+        shared = Formula('&', shared, shared)
+    assert len(cnf_clauses(shared)) == 8
+    cnf_clauses(shared).clear()
+    assert len(cnf_clauses(shared)) == 8
+
+def test_tseitin(debug=False):
+    for infix in _FORMULAS:
+        formula = Formula.parse(infix)
+        if debug:
+            print('Testing the Tseitin encoding of', infix)
+        clauses = tseitin_clauses(formula)
+        cnf = tseitin_cnf(formula)
+        for clause in clauses:
+            assert all(_is_literal(literal) for literal in clause)
+        assert (satisfying_model([cnf]) is None) == \
+               (satisfying_model([formula]) is None)
+        new_variables = sorted(cnf.variables() - formula.variables())
+        for model in all_models(sorted(formula.variables())):
+            extended = any(evaluate(cnf, dict(model, **values))
+                           for values in all_models(new_variables))
+            assert extended == evaluate(formula, model)
+
+    if debug:
+        print('Testing new variable names')
+    formula = Formula.parse('((t1&t2)|t3)')
+    variables = tseitin_cnf(formula).variables()
+    assert variables == {'t1', 't2', 't3', 't4', 't5'}, variables
+    names = FreshNames('y')
+    first = tseitin_cnf(Formula.parse('(p&q)'), names)
+    second = tseitin_cnf(Formula.parse('(p|q)'), names)
+    assert first.variables() & second.variables() == {'p', 'q'}
+
+    if debug:
+        print('Testing the size of the encoding of a chain of 40 xors')
+    chain = Formula('x0')
+    for i in range(1, 40):
+        chain = Formula('+', chain, Formula('x' + str(i)))
+    assert len(tseitin_clauses(chain)) == 4 * 39 + 1
+    assert len(str(tseitin_cnf(chain))) < 5000
+    short_chain = Formula('x0')
+    for i in range(1, 9):
+        short_chain = Formula('+', short_chain, Formula('x' + str(i)))
+    assert 8 * len(str(tseitin_cnf(short_chain))) < \
+           len(str(to_not_and_or(short_chain)))
+
+def test_to_dimacs(debug=False):
+    if debug:
+        print('Testing DIMACS output')
+    clauses = [[Formula('p'), Formula.parse('~q')], [Formula('q')], []]
+    assert to_dimacs(clauses) == 'c 1 p\nc 2 q\np cnf 2 3\n1 -2 0\n2 0\n0\n'
+
+def test_normal_forms(debug=False):
+    test_to_cnf_and_dnf(debug)
+    test_tseitin(debug)
+    test_to_dimacs(debug)
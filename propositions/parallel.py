@@ -0,0 +1,347 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: propositions/parallel.py
+
+"""Exhaustive evaluation of propositional formulas over many models, and
+proofs of tautologies by cases over them, sharded between processes."""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+from multiprocessing.shared_memory import SharedMemory
+from os import cpu_count, path
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, Optional, Sequence
+
+from logic_utils import frozendict
+
+from propositions.syntax import *
+from propositions.proofs import *
+from propositions.semantics import Model, evaluate_partially, is_model, \
+                                   is_tautology, truth_vector
+from propositions.serialization import load_proof, save_proof
+from propositions.tautology import prove_tautology, reduce_assumption
+
+# The smallest number of variables left free in each shard, so that the truth
+# vector of every shard fills whole bytes of the shared bitset
+_SHARD_VARIABLES = 3
+
+# The largest number of variables left free in each block of a shard searched
+# by `sharded_model_search`, which checks before each block whether the search
+# was stopped
+_SEARCH_BLOCK_VARIABLES = 12
+
+# Workers are forked where possible, so that they neither pickle the formula
+# tables again nor import the main module, which may run code at import time
+_CONTEXT = get_context('fork') if 'fork' in get_all_start_methods() else None
+
+def _shard_prefix_length(variable_count: int, workers: int) -> int:
+    """
+    Decides how many leading variables to fix in each shard.
+
+    :param variable_count: the number of variables of the models
+    :param workers: the number of worker processes
+    :return: the number of variables to fix, so that there are about four
+        shards per worker
+    """
+    prefix_length = 0
+    while 1 << prefix_length < 4 * workers and \
+            variable_count - prefix_length > _SHARD_VARIABLES:
+        prefix_length += 1
+    return prefix_length
+
+def _shard_formula(formula: Formula, variables: Sequence[str],
+                   prefix_length: int, shard: int) -> Formula:
+    """
+    Fixes the leading variables of a formula to the values of a shard.
+
+    :param formula: the formula to evaluate
+    :param variables: the variables of the models
+    :param prefix_length: the number of leading variables to fix
+    :param shard: the values of the leading variables, as the binary digits
+        of the shard number with the first variable most significant
+    :return: the formula with each leading variable replaced by a constant
+    """
+    return formula.substitute_variables({
+        variables[i]:
+            Formula('T' if shard >> (prefix_length - 1 - i) & 1 else 'F')
+        for i in range(prefix_length)})
+
+def _evaluate_shard(formula: Formula, variables: Sequence[str],
+                    prefix_length: int, shard: int, bitset_name: str) -> None:
+    """
+    Writes the truth vector of a shard into the shared bitset.
+
+    :param formula: the formula to evaluate
+    :param variables: the variables of the models
+    :param prefix_length: the number of leading variables fixed in each shard
+    :param shard: the number of the shard to evaluate
+    :param bitset_name: the name of the shared memory of the full truth vector
+    """
+    vector = truth_vector(
+        _shard_formula(formula, variables, prefix_length, shard),
+        variables[prefix_length:])
+    size = (1 << (len(variables) - prefix_length)) // 8
+    bitset = SharedMemory(bitset_name)
+    try:
+        bitset.buf[shard * size:(shard + 1) * size] = \
+            vector.to_bytes(size, 'little')
+    finally:
+        bitset.close()
+
+def _search_shard(formula: Formula, variables: Sequence[str],
+                  prefix_length: int, shard: int, value: bool,
+                  stop_name: str) -> Optional[int]:
+    """
+    Searches a shard for a model in which a formula has a given value, block
+    by block, checking before each block whether the search was stopped.
+
+    :param formula: the formula to evaluate
+    :param variables: the variables of the models
+    :param prefix_length: the number of leading variables fixed in each shard
+    :param shard: the number of the shard to search
+    :param value: the value to search for
+    :param stop_name: the name of the shared memory whose first byte is set
+        once a witness was found in an earlier shard
+    :return: the position of the first such model in the shard, or None if
+        there is none or the search was stopped
+    """
+    # each block fixes some more of the leading variables
+    block_prefix_length = max(0, len(variables) - prefix_length -
+                                 _SEARCH_BLOCK_VARIABLES)
+    free_variables = variables[prefix_length + block_prefix_length:]
+    stop = SharedMemory(stop_name)
+    try:
+        for block in range(1 << block_prefix_length):
+            if stop.buf[0]:
+                return None
+            vector = truth_vector(
+                _shard_formula(formula, variables,
+                               prefix_length + block_prefix_length,
+                               (shard << block_prefix_length) + block),
+                free_variables)
+            if not value:
+                vector ^= (1 << (1 << len(free_variables))) - 1
+            if vector != 0:
+                # the lowest set bit
+                return (block << len(free_variables)) + \
+                       (vector & -vector).bit_length() - 1
+        return None
+    finally:
+        stop.close()
+
+def _model(variables: Sequence[str], index: int) -> Model:
+    """
+    Builds a model by its position in the order of `all_models`.
+
+    :param variables: the variables of the model
+    :param index: the position of the model
+    :return: the model
+    """
+    n = len(variables)
+    return {variable: index >> (n - 1 - i) & 1 == 1
+            for i, variable in enumerate(variables)}
+
+def sharded_truth_vector(formula: Formula,
+                         variables: Optional[Sequence[str]] = None,
+                         workers: Optional[int] = None) -> int:
+    """Calculates the truth vector of `~propositions.semantics.truth_vector`
+    in worker processes, each evaluating the models that share values of the
+    first variables and writing its part of the vector directly into memory
+    shared with all of them.
+
+    Parameters:
+        formula: formula to calculate the truth values of.
+        variables: variables over which to calculate the truth values, a
+            superset of the variables of the formula, or ``None`` to use the
+            variables of the formula in alphabetical order.
+        workers: number of worker processes, by default the number of
+            processors.
+
+    Returns:
+        The truth vector of the given formula over the given variables.
+    """
+    if variables is None:
+        variables = sorted(formula.variables())
+    assert formula.variables().issubset(variables)
+    variables = list(variables)
+    if workers is None:
+        workers = cpu_count() or 1
+    prefix_length = _shard_prefix_length(len(variables), workers)
+    if prefix_length == 0:
+        return truth_vector(formula, variables)
+    size = (1 << len(variables)) // 8
+    bitset = SharedMemory(create=True, size=size)
+    try:
+        with ProcessPoolExecutor(workers, _CONTEXT) as executor:
+            for future in [executor.submit(_evaluate_shard, formula,
+                                           variables, prefix_length, shard,
+                                           bitset.name)
+                           for shard in range(1 << prefix_length)]:
+                future.result()
+        return int.from_bytes(bitset.buf[:size], 'little')
+    finally:
+        bitset.close()
+        bitset.unlink()
+
+def sharded_model_search(formula: Formula, value: bool = True,
+                         variables: Optional[Sequence[str]] = None,
+                         workers: Optional[int] = None) -> Optional[Model]:
+    """Searches for the first model, in the order of
+    `~propositions.semantics.all_models`, in which the given formula has the
+    given value, in worker processes that each search the models sharing
+    values of the first variables. Once a model is found, the shards of later
+    models are cancelled, and those already running stop at the next block
+    of at most 2\ :sup:`12` models.
+
+    Parameters:
+        formula: formula to evaluate.
+        value: value to search for.
+        variables: variables of the models, a superset of the variables of the
+            formula, or ``None`` to use the variables of the formula in
+            alphabetical order.
+        workers: number of worker processes, by default the number of
+            processors.
+
+    Returns:
+        The first model over the given variables in which the given formula
+        has the given value, or ``None`` if there is none.
+    """
+    if variables is None:
+        variables = sorted(formula.variables())
+    assert formula.variables().issubset(variables)
+    variables = list(variables)
+    if workers is None:
+        workers = cpu_count() or 1
+    prefix_length = _shard_prefix_length(len(variables), workers)
+    stop = SharedMemory(create=True, size=1)
+    stop.buf[0] = 0
+    try:
+        with ProcessPoolExecutor(workers, _CONTEXT) as executor:
+            futures = [executor.submit(_search_shard, formula, variables,
+                                       prefix_length, shard, value, stop.name)
+                       for shard in range(1 << prefix_length)]
+            # collect the shards in order, so that the first model is found
+            # regardless of which shard finishes first
+            for shard, future in enumerate(futures):
+                index = future.result()
+                if index is not None:
+                    stop.buf[0] = 1
+                    for later in futures[shard + 1:]:
+                        later.cancel()
+                    return _model(variables, (shard << (
+                        len(variables) - prefix_length)) + index)
+        return None
+    finally:
+        stop.close()
+        stop.unlink()
+
+def sharded_counterexample(rule: InferenceRule,
+                           workers: Optional[int] = None) -> Optional[Model]:
+    """Searches for a model in which all assumptions of the given inference
+    rule hold but its conclusion does not, by `sharded_model_search`.
+
+    Parameters:
+        rule: inference rule to check.
+        workers: number of worker processes, by default the number of
+            processors.
+
+    Returns:
+        The first such model over the variables of the given rule, in the order
+        of `~propositions.semantics.all_models`, or ``None`` if the given rule
+        is sound.
+    """
+    counterexample = Formula('~', rule.conclusion)
+    for assumption in reversed(rule.assumptions):
+        counterexample = Formula('&', assumption, counterexample)
+    return sharded_model_search(counterexample, True,
+                                sorted(rule.variables()), workers)
+
+def _prove_shard(tautology: Formula, model: Dict[str, bool],
+                 proof_path: str) -> str:
+    """
+    Proves a tautology in a worker process, and serializes the proof.
+
+    :param tautology: the tautology to prove
+    :param model: the values of the variables fixed in the shard, a prefix of
+        the variables of the tautology
+    :param proof_path: the path of the file to serialize the proof into
+    :return: the given path
+    """
+    save_proof(prove_tautology(tautology, frozendict(model)), proof_path)
+    return proof_path
+
+def sharded_prove_tautology(tautology: Formula, model: Model = frozendict(),
+                            depth: Optional[int] = None,
+                            workers: Optional[int] = None) -> Proof:
+    """Proves the given tautology from the formulae that capture the given
+    model, like `~propositions.tautology.prove_tautology`, proving the cases
+    of the first variables not in the model in worker processes. Each worker
+    serializes its proof by `~propositions.serialization.save_proof`, and the
+    proofs of the cases are combined in a fixed order, so that the returned
+    proof is the one that `~propositions.tautology.prove_tautology` returns,
+    line by line, whatever the number of workers.
+
+    Parameters:
+        tautology: tautology that contains no constants or operators beyond
+            ``'->'`` and ``'~'``, to prove.
+        model: model over a (possibly empty) prefix (with respect to the
+            alphabetical order) of the variables of `tautology`, from whose
+            formulae to prove.
+        depth: number of variables to split on before handing the cases to
+            the workers, by default enough for about four cases per worker.
+            Cases whose value is forced before that depth are proven without
+            splitting further, as `~propositions.tautology.prove_tautology`
+            does.
+        workers: number of worker processes, by default the number of
+            processors.
+
+    Returns:
+        A valid proof of the given tautology from the formulae that capture the
+        given model, in the order returned by
+        `~propositions.tautology.formulae_capturing_model`\ ``(``\ `model`\
+        ``)``, via `~propositions.axiomatic_systems.AXIOMATIC_SYSTEM`.
+    """
+    assert is_tautology(tautology)
+    assert tautology.operators().issubset({'->', '~'})
+    assert is_model(model)
+    variables = sorted(tautology.variables())
+    assert variables[:len(model)] == sorted(model.keys())
+    if workers is None:
+        workers = cpu_count() or 1
+    remaining = len(variables) - len(model)
+    if depth is None:
+        depth = _shard_prefix_length(remaining, workers)
+    depth = min(depth, remaining)
+    if depth == 0 or evaluate_partially(tautology, model):
+        return prove_tautology(tautology, model)
+
+    with TemporaryDirectory() as directory, \
+            ProcessPoolExecutor(workers, _CONTEXT) as executor:
+        futures = []
+
+        def split(model: Dict[str, bool], depth: int) -> Callable[[], Proof]:
+            # submits the cases under the given model, and returns a function
+            # that waits for their proofs and combines them
+            if evaluate_partially(tautology, model):
+                frozen = frozendict(model)
+                return lambda: prove_tautology(tautology, frozen)
+            if depth == 0:
+                future = executor.submit(
+                    _prove_shard, tautology, dict(model),
+                    path.join(directory, str(len(futures)) + '.proof'))
+                futures.append(future)
+                return lambda: load_proof(future.result())
+            variable = variables[len(model)]
+            model[variable] = True
+            affirmation = split(model, depth - 1)
+            model[variable] = False
+            negation = split(model, depth - 1)
+            del model[variable]
+            return lambda: reduce_assumption(affirmation(), negation())
+
+        try:
+            return split(dict(model), depth)()
+        finally:
+            for future in futures:
+                future.cancel()
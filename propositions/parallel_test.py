@@ -0,0 +1,105 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: propositions/parallel_test.py
+
+"""Tests for the propositions.parallel module."""
+
+from multiprocessing.shared_memory import SharedMemory
+
+from logic_utils import frozendict
+
+import propositions.parallel
+from propositions.syntax import *
+from propositions.proofs import *
+from propositions.semantics import *
+from propositions.tautology import formulae_capturing_model, prove_tautology
+from propositions.parallel import *
+
+from propositions.proofs_test import offending_line
+
+def test_sharded_truth_vector(debug=False):
+    for infix, variables in [
+            ['(((p&q)|(r+s))->~(t<->(u|v)))', None],
+            ['(p->q)', None], ['(p->q)', ['p', 'q', 'r', 's', 't', 'u']],
+            ['((x1+x2)-&(x3-|~x4))', ['x4', 'x3', 'x2', 'x1', 'x5', 'x6']]]:
+        formula = Formula.parse(infix)
+        if debug:
+            print('Testing sharded_truth_vector on', infix, 'over', variables)
+        for workers in [1, 2, 3]:
+            assert sharded_truth_vector(formula, variables, workers) == \
+                   truth_vector(formula, variables)
+
+def test_sharded_model_search(debug=False):
+    for infix in ['(((p&q)|(r+s))->~(t<->(u|v)))', '(p&~p)', '(p|~p)',
+                  '((((p&q)&r)&s)&(t&u))']:
+        formula = Formula.parse(infix)
+        variables = sorted(formula.variables())
+        if debug:
+            print('Testing sharded_model_search on', infix)
+        for value in [True, False]:
+            expected = None
+            for model in all_models(variables):
+                if evaluate(formula, model) == value:
+                    expected = model
+                    break
+            assert sharded_model_search(formula, value, workers=2) == expected
+            block_variables = propositions.parallel._SEARCH_BLOCK_VARIABLES
+            try:
+                # several blocks in each shard
+                propositions.parallel._SEARCH_BLOCK_VARIABLES = 1
+                assert sharded_model_search(formula, value, workers=2) == \
+                       expected
+            finally:
+                propositions.parallel._SEARCH_BLOCK_VARIABLES = block_variables
+
+    if debug:
+        print('Testing that a stopped shard search stops')
+    formula = Formula.parse('(p|~p)')
+    stop = SharedMemory(create=True, size=1)
+    try:
+        stop.buf[0] = 1
+        assert propositions.parallel._search_shard(
+            formula, ['p'], 0, 0, True, stop.name) is None
+        stop.buf[0] = 0
+        assert propositions.parallel._search_shard(
+            formula, ['p'], 0, 0, True, stop.name) == 0
+    finally:
+        stop.close()
+        stop.unlink()
+
+    if debug:
+        print('Testing sharded_counterexample')
+    rule = InferenceRule([Formula.parse('(p->q)'), Formula.parse('(r|s)')],
+                         Formula.parse('(q->p)'))
+    assert sharded_counterexample(rule, 2) == \
+           {'p': False, 'q': True, 'r': False, 's': True}
+    rule = InferenceRule([Formula.parse('(p->q)'), Formula.parse('p')],
+                         Formula.parse('q'))
+    assert sharded_counterexample(rule, 2) is None
+
+def test_sharded_prove_tautology(debug=False):
+    for infix, model in [['((p->(q->r))->((p->q)->(p->r)))', {}],
+                         ['(~(p->q)->(q->r))', {}],
+                         ['((p->(q->r))->((p->q)->(p->r)))', {'p': True}],
+                         ['(p->p)', {}]]:
+        tautology = Formula.parse(infix)
+        serial = prove_tautology(tautology, frozendict(model))
+        expected = str(serial)
+        for depth, workers in [[None, 2], [1, 2], [2, 3], [5, 1]]:
+            if debug:
+                print('Testing sharded_prove_tautology on', infix, 'in model',
+                      model, 'to depth', depth, 'with', workers, 'workers')
+            proof = sharded_prove_tautology(tautology, frozendict(model),
+                                            depth, workers)
+            assert proof.statement == \
+                   InferenceRule(formulae_capturing_model(model), tautology)
+            assert proof.rules == serial.rules
+            assert proof.is_valid(), offending_line(proof)
+            # the same proof as the serial one, line by line
+            assert str(proof) == expected
+
+def test_parallel(debug=False):
+    test_sharded_truth_vector(debug)
+    test_sharded_model_search(debug)
+    test_sharded_prove_tautology(debug)
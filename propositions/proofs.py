@@ -63,13 +63,13 @@ class InferenceRule:
 
         Returns:
             ``True`` if the given object is not an `InferenceRule` object or
-            does not does not equal the current inference rule, ``False``
+            does not equal the current inference rule, ``False``
             otherwise.
         """
         return not self == other
 
     def __hash__(self) -> int:
-        return hash(str(self))
+        return hash((self.assumptions, self.conclusion))
 
     def __repr__(self) -> str:
         """Computes a string representation of the current inference rule.
@@ -175,41 +175,31 @@ class InferenceRule:
             in fact not a specialization of `general`.
         """
         # Task 4.5b
-        # we will recursively go down the general formula, and replace variables with a corresponding
-        # formula in the specialization. if at any point the roots aren't identical we can return none
-        # if the recursion succeeds we'll be left with maps which we will have to merge, if they ever return none
-        # we're done.
-
-        # base case
-        if is_variable(general.root):
-            return {str(general.root): specialization}
-
-        # make sure the constants are the same, if so return an empty dict
-        if is_constant(general.root):
-            if specialization.root == general.root:
-                return {}
-            else:
-                return None
-
-        # Unary case:
-        if is_unary(general.root):
-            # make sure the roots are the same
-            if specialization.root == general.root:
-                return InferenceRule.formula_specialization_map(general.first, specialization.first)
-            else:
-                return None
-
-        # Binary case:
-        if is_binary(general.root):
-            # make sure the roots are the same
-            if specialization.root == general.root:
-                # get the children maps and return their merger
-                # merge_specialization makes sure we wont have variables mapped to different formulas.
-                dict1_temp = InferenceRule.formula_specialization_map(general.first, specialization.first)
-                dict2_temp = InferenceRule.formula_specialization_map(general.second, specialization.second)
-                return InferenceRule.merge_specialization_maps(dict1_temp, dict2_temp)
-            else:
+        # we go down both formulae together with an explicit stack, and map variables of the general
+        # formula to the corresponding formula in the specialization. if at any point the roots aren't
+        # identical, or a variable would be mapped to two different formulae, we can return none
+        specialization_map = {}
+        visited = set()
+        stack = [(general, specialization)]
+        while stack:
+            pair = stack.pop()
+            if pair in visited:
+                continue
+            visited.add(pair)
+            general_node, specialization_node = pair
+            if is_variable(general_node.root):
+                mapped = specialization_map.setdefault(general_node.root,
+                                                       specialization_node)
+                if mapped != specialization_node:
+                    return None
+            elif specialization_node.root != general_node.root:
                 return None
+            elif is_unary(general_node.root):
+                stack.append((general_node.first, specialization_node.first))
+            elif is_binary(general_node.root):
+                stack.append((general_node.second, specialization_node.second))
+                stack.append((general_node.first, specialization_node.first))
+        return specialization_map
 
     def specialization_map(self, specialization: InferenceRule) -> \
             Union[SpecializationMap, None]:
@@ -266,7 +256,7 @@ class Proof:
             the proof.
         lines (`~typing.Tuple`\\[`Line`]): the lines of the proof.
     """
-    statment: InferenceRule
+    statement: InferenceRule
     rules: FrozenSet[InferenceRule]
     lines: Tuple[Proof.Line, ...]
 
@@ -366,7 +356,8 @@ class Proof:
             A string representation of the current proof.
         """
         r = 'Proof for ' + str(self.statement) + ' via inference rules:\n'
-        for rule in self.rules:
+        # sorted, since the order of a set depends on the hashes of its items
+        for rule in sorted(self.rules, key=str):
             r += '  ' + str(rule) + '\n'
         r += "Lines:\n"
         for i in range(len(self.lines)):
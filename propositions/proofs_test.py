@@ -5,6 +5,9 @@
 
 """Tests for the propositions.proofs module."""
 
+import copy
+import pickle
+
 from logic_utils import frozendict
 
 from propositions.syntax import *
@@ -843,6 +846,52 @@ def test_inline_proof(debug=False):
                {lemma2_proof.statement})
     assert inlined_proof.is_valid(), offending_line(inlined_proof)
 
+# Tests for extensions beyond the course tasks
+
+def test_deep_specialization_map(debug=False):
+    n = 50000
+    general = Formula('p')
+    specialization = Formula.parse('(x|y)')
+    for i in range(n):
+        general = Formula('&', general, Formula('q'))
+        specialization = Formula('&', specialization, Formula('~', Formula('z')))
+    if debug:
+        print('Testing specialization map of formulas of depth', n)
+    assert InferenceRule.formula_specialization_map(general, specialization) == \
+           {'p': Formula.parse('(x|y)'), 'q': Formula.parse('~z')}
+    specialization = Formula('&', specialization.first, Formula('w'))
+    assert InferenceRule.formula_specialization_map(general, specialization) is None
+
+def test_pickling(debug=False):
+    p = Formula('p')
+    rule = InferenceRule([p], Formula.parse('(p|q)'))
+    proof = Proof(rule, {rule},
+                  [Proof.Line(p), Proof.Line(Formula.parse('(p|q)'), rule, [0])])
+    for name, copier in [('pickle', lambda obj: pickle.loads(pickle.dumps(obj))),
+                         ('deepcopy', copy.deepcopy), ('copy', copy.copy)]:
+        if debug:
+            print('Testing', name, 'of an inference rule, a proof and a line')
+        copied = copier(rule)
+        assert type(copied) is InferenceRule
+        assert copied == rule and copied.assumptions == rule.assumptions
+        copied = copier(proof)
+        assert type(copied) is Proof
+        assert copied.statement == proof.statement
+        assert copied.rules == proof.rules
+        assert str(copied) == str(proof)
+        assert copied.is_valid()
+        line = proof.lines[1]
+        copied = copier(line)
+        assert type(copied) is Proof.Line
+        assert copied.formula == line.formula and copied.rule == line.rule and \
+               copied.assumptions == line.assumptions
+        # the copies are as immutable as the originals
+        try:
+            copied.formula = p
+            assert False, 'Assignment to a frozen field succeeded'
+        except Exception as e:
+            assert str(e) == \
+                   "Cannot assign to field 'formula' of immutable class 'Line'"
 
 def test_ex4(debug=False):
     test_variables(debug)
@@ -859,6 +908,11 @@ def test_ex5(debug=False):
     test_inline_proof_once(debug)
     test_inline_proof(debug)
 
+def test_proofs_extensions(debug=False):
+    test_deep_specialization_map(debug)
+    test_pickling(debug)
+
 def test_all(debug=False):
     test_ex4(debug)
     test_ex5(debug)
+    test_proofs_extensions(debug)
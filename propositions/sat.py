@@ -0,0 +1,395 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: propositions/sat.py
+
+"""A conflict-driven clause-learning (CDCL) satisfiability solver for
+propositional formulas."""
+
+from __future__ import annotations
+from heapq import heapify, heappop, heappush
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from propositions.syntax import *
+
+class Solver:
+    """A CDCL satisfiability solver over clauses of integer literals, in the
+    DIMACS convention: variables are numbered from ``1``, the literal ``v``
+    stands for the variable `v` and ``-v`` for its negation.
+
+    The solver watches two literals of each clause for unit propagation, learns
+    a first-unique-implication-point clause from each conflict and backjumps
+    over the decisions that did not take part in it, picks decision variables
+    by decaying conflict activity (VSIDS) with saved phases, and restarts on
+    the Luby sequence.
+    """
+
+    def __init__(self) -> None:
+        """Initializes a solver without variables or clauses."""
+        # Internally, the literal v is coded as 2v and -v as 2v+1, so that
+        # negating a literal flips its lowest bit.
+        self._variable_count = 0
+        self._clauses = []
+        self._watches = [[], []]
+        # per literal code: 1 if true, -1 if false, 0 if unassigned
+        self._assignment = [0, 0]
+        # per variable
+        self._levels = [0]
+        self._reasons = [None]
+        self._activity = [0.0]
+        self._phases = [False]
+        self._trail = []
+        self._trail_limits = []
+        self._propagated = 0
+        self._heap = []
+        self._bump = 1.0
+        self._inconsistent = False
+        self._model = None
+
+    def new_variable(self) -> int:
+        """Adds a variable.
+
+        Returns:
+            The number of the added variable.
+        """
+        self._variable_count += 1
+        self._watches.extend(([], []))
+        self._assignment.extend((0, 0))
+        self._levels.append(0)
+        self._reasons.append(None)
+        self._activity.append(0.0)
+        self._phases.append(False)
+        heappush(self._heap, (0.0, self._variable_count))
+        return self._variable_count
+
+    def add_clause(self, literals: Iterable[int]) -> None:
+        """Adds a clause, the disjunction of the given literals.
+
+        Parameters:
+            literals: literals over variables added to the solver.
+        """
+        self._backtrack(0)
+        clause = []
+        for literal in literals:
+            assert literal != 0 and abs(literal) <= self._variable_count
+            code = 2 * literal if literal > 0 else -2 * literal + 1
+            if code ^ 1 in clause or self._assignment[code] == 1:
+                return
+            if code not in clause and self._assignment[code] == 0:
+                clause.append(code)
+        if len(clause) == 0:
+            self._inconsistent = True
+        elif len(clause) == 1:
+            self._enqueue(clause[0], None)
+            if self._propagate() is not None:
+                self._inconsistent = True
+        else:
+            self._watch(clause)
+
+    def solve(self) -> bool:
+        """Decides whether the clauses added so far can all be satisfied.
+
+        Returns:
+            ``True`` if there is an assignment to the variables that satisfies
+            all of the clauses, ``False`` otherwise.
+        """
+        self._model = None
+        if self._inconsistent:
+            return False
+        restart = 1
+        while True:
+            result = self._search(64 * _luby(restart))
+            if result is not None:
+                break
+            restart += 1
+        if result:
+            self._model = [self._assignment[2 * variable] == 1
+                           for variable in range(self._variable_count + 1)]
+        else:
+            self._inconsistent = True
+        self._backtrack(0)
+        return result
+
+    def value(self, variable: int) -> bool:
+        """Returns the value of the given variable in the satisfying assignment
+        found by the last call to `solve`, which must have returned ``True``.
+        """
+        assert self._model is not None
+        return self._model[variable]
+
+    def _watch(self, clause: List[int]) -> None:
+        self._clauses.append(clause)
+        self._watches[clause[0]].append(clause)
+        self._watches[clause[1]].append(clause)
+
+    def _enqueue(self, code: int, reason: Optional[List[int]]) -> None:
+        variable = code >> 1
+        self._assignment[code] = 1
+        self._assignment[code ^ 1] = -1
+        self._levels[variable] = len(self._trail_limits)
+        self._reasons[variable] = reason
+        self._trail.append(code)
+
+    def _propagate(self) -> Optional[List[int]]:
+        """Assigns all literals implied by unit clauses.
+
+        :return: a clause all of whose literals are false, if any
+        """
+        assignment = self._assignment
+        watches = self._watches
+        trail = self._trail
+        while self._propagated < len(trail):
+            false_code = trail[self._propagated] ^ 1
+            self._propagated += 1
+            watching = watches[false_code]
+            kept = 0
+            index = 0
+            while index < len(watching):
+                clause = watching[index]
+                index += 1
+                # keep the false watched literal second
+                if clause[0] == false_code:
+                    clause[0], clause[1] = clause[1], false_code
+                first = clause[0]
+                if assignment[first] == 1:
+                    watching[kept] = clause
+                    kept += 1
+                    continue
+                for position in range(2, len(clause)):
+                    code = clause[position]
+                    if assignment[code] != -1:
+                        clause[1], clause[position] = code, false_code
+                        watches[code].append(clause)
+                        break
+                else:
+                    watching[kept] = clause
+                    kept += 1
+                    if assignment[first] == -1:
+                        while index < len(watching):
+                            watching[kept] = watching[index]
+                            kept += 1
+                            index += 1
+                        del watching[kept:]
+                        self._propagated = len(trail)
+                        return clause
+                    self._enqueue(first, clause)
+            del watching[kept:]
+        return None
+
+    def _analyze(self, conflict: List[int]) -> Tuple[List[int], int]:
+        """Learns the first-unique-implication-point clause of a conflict.
+
+        :param conflict: a clause all of whose literals are false
+        :return: the learnt clause, whose first literal is the one to assert,
+            and the decision level to backjump to
+        """
+        levels = self._levels
+        trail = self._trail
+        level = len(self._trail_limits)
+        seen = set()
+        learnt = [0]
+        pending = 0
+        clause = conflict
+        index = len(trail) - 1
+        code = None
+        while True:
+            for other in (clause if code is None else clause[1:]):
+                variable = other >> 1
+                if variable not in seen and levels[variable] > 0:
+                    seen.add(variable)
+                    self._bump_activity(variable)
+                    if levels[variable] == level:
+                        pending += 1
+                    else:
+                        learnt.append(other)
+            while trail[index] >> 1 not in seen:
+                index -= 1
+            code = trail[index]
+            index -= 1
+            clause = self._reasons[code >> 1]
+            seen.discard(code >> 1)
+            pending -= 1
+            if pending == 0:
+                break
+        learnt[0] = code ^ 1
+        if len(learnt) == 1:
+            return learnt, 0
+        # watch a literal of the highest remaining level second
+        highest = max(range(1, len(learnt)),
+                      key=lambda position: levels[learnt[position] >> 1])
+        learnt[1], learnt[highest] = learnt[highest], learnt[1]
+        return learnt, levels[learnt[1] >> 1]
+
+    def _bump_activity(self, variable: int) -> None:
+        activity = self._activity
+        activity[variable] += self._bump
+        if activity[variable] > 1e100:
+            for other in range(1, self._variable_count + 1):
+                activity[other] *= 1e-100
+            self._bump *= 1e-100
+            self._heap = [(-activity[other], other)
+                          for other in range(1, self._variable_count + 1)
+                          if self._assignment[2 * other] == 0]
+            heapify(self._heap)
+        elif self._assignment[2 * variable] == 0:
+            heappush(self._heap, (-activity[variable], variable))
+
+    def _backtrack(self, level: int) -> None:
+        if len(self._trail_limits) <= level:
+            return
+        assignment = self._assignment
+        activity = self._activity
+        start = self._trail_limits[level]
+        for code in reversed(self._trail[start:]):
+            variable = code >> 1
+            self._phases[variable] = code & 1 == 0
+            assignment[code] = assignment[code ^ 1] = 0
+            self._reasons[variable] = None
+            heappush(self._heap, (-activity[variable], variable))
+        del self._trail[start:]
+        del self._trail_limits[level:]
+        self._propagated = start
+
+    def _decide(self) -> Optional[int]:
+        """Picks an unassigned variable of highest activity.
+
+        :return: the literal code of the variable in its saved phase, or None
+            if all variables are assigned
+        """
+        heap = self._heap
+        while heap:
+            variable = heappop(heap)[1]
+            if self._assignment[2 * variable] == 0:
+                return 2 * variable + (0 if self._phases[variable] else 1)
+        return None
+
+    def _search(self, conflict_limit: int) -> Optional[bool]:
+        """Searches for a satisfying assignment until the given number of
+        conflicts.
+
+        :return: True if one was found, False if there is none, or None if the
+            search should restart
+        """
+        conflicts = 0
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                if len(self._trail_limits) == 0:
+                    return False
+                conflicts += 1
+                learnt, level = self._analyze(conflict)
+                self._backtrack(level)
+                if len(learnt) == 1:
+                    self._enqueue(learnt[0], None)
+                else:
+                    self._watch(learnt)
+                    self._enqueue(learnt[0], learnt)
+                self._bump /= 0.95
+            elif conflicts >= conflict_limit:
+                self._backtrack(0)
+                return None
+            else:
+                code = self._decide()
+                if code is None:
+                    return True
+                self._trail_limits.append(len(self._trail))
+                self._enqueue(code, None)
+
+def _luby(index: int) -> int:
+    """
+    Computes an element of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, ...
+
+    :param index: the position of the element, starting from 1
+    :return: the requested element
+    """
+    while True:
+        # the sequence is made of blocks of 2^k-1 elements ending with 2^(k-1),
+        # each block repeating the previous block twice before its last element
+        k = 1
+        while (1 << k) - 1 < index:
+            k += 1
+        if index == (1 << k) - 1:
+            return 1 << (k - 1)
+        index -= (1 << (k - 1)) - 1
+
+def add_formula_clauses(solver: Solver, formula: Formula,
+                        literals: Dict[Formula, int]) -> int:
+    """Adds to the given solver clauses that define a literal equivalent to the
+    given formula, with one new variable per distinct binary subformula.
+
+    Parameters:
+        solver: solver to add clauses to.
+        formula: formula to encode.
+        literals: mapping from formulas already encoded in the given solver,
+            including variables, to their literals, to which the literals of
+            the given formula and its subformulas are added.
+
+    Returns:
+        A literal that is true in an assignment satisfying the added clauses
+        if and only if the given formula is true in it.
+    """
+    stack = [formula]
+    while stack:
+        node = stack[-1]
+        if node in literals:
+            stack.pop()
+            continue
+        root = node.root
+        if is_variable(root):
+            literals[node] = solver.new_variable()
+        elif is_constant(root):
+            true = literals.get(Formula('T'))
+            if true is None:
+                true = literals[Formula('T')] = solver.new_variable()
+                solver.add_clause([true])
+                literals[Formula('F')] = -true
+            literals[node] = true if root == 'T' else -true
+        elif is_unary(root):
+            if node.first not in literals:
+                stack.append(node.first)
+                continue
+            literals[node] = -literals[node.first]
+        else:
+            if node.first not in literals or node.second not in literals:
+                stack.extend((node.second, node.first))
+                continue
+            first, second = literals[node.first], literals[node.second]
+            if root == '->':
+                root, first = '|', -first
+            gate = solver.new_variable()
+            if root in ('&', '-&'):
+                solver.add_clause([-gate, first])
+                solver.add_clause([-gate, second])
+                solver.add_clause([gate, -first, -second])
+            elif root in ('|', '-|'):
+                solver.add_clause([gate, -first])
+                solver.add_clause([gate, -second])
+                solver.add_clause([-gate, first, second])
+            else:
+                assert root in ('+', '<->')
+                solver.add_clause([-gate, first, second])
+                solver.add_clause([-gate, -first, -second])
+                solver.add_clause([gate, -first, second])
+                solver.add_clause([gate, first, -second])
+            literals[node] = -gate if root in ('-&', '-|', '<->') else gate
+        stack.pop()
+    return literals[formula]
+
+def satisfying_model(formulas: Iterable[Formula]) -> Optional[Dict[str, bool]]:
+    """Searches for a model in which all of the given formulas hold.
+
+    Parameters:
+        formulas: formulas to satisfy.
+
+    Returns:
+        A model over the variables of the given formulas in which all of them
+        hold, if there is one, otherwise ``None``.
+    """
+    solver = Solver()
+    literals = {}
+    for formula in formulas:
+        solver.add_clause([add_formula_clauses(solver, formula, literals)])
+    if not solver.solve():
+        return None
+    return {node.root: solver.value(literal)
+            for node, literal in literals.items() if is_variable(node.root)}
@@ -0,0 +1,75 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: propositions/sat_test.py
+
+"""Tests for the propositions.sat module."""
+
+from propositions.syntax import *
+from propositions.semantics import all_models, evaluate
+from propositions.sat import *
+
+def test_satisfying_model(debug=False):
+    for infixes, satisfiable in [
+            [['p'], True], [['(p&~p)'], False], [['T'], True], [['F'], False],
+            [['(p->q)', 'p', '~q'], False], [['(p+q)', '(q<->r)', 'r'], True],
+            [['(p-&q)', '(p-|~q)'], True], [['~(p-&q)', '(p-|~q)'], False],
+            [['((p|q)|r)', '~(p&q)', '~(q&r)', '~(p&r)', '~(T->(p|r))'],
+             True],
+            [['((x1+x2)+(x3+x4))', '((x1+x2)<->(x3+x4))'], False]]:
+        formulas = [Formula.parse(infix) for infix in infixes]
+        if debug:
+            print('Testing satisfiability of', infixes)
+        model = satisfying_model(formulas)
+        assert (model is not None) == satisfiable
+        variables = set().union(*[formula.variables()
+                                  for formula in formulas])
+        assert satisfiable == any(
+            all(evaluate(formula, model) for formula in formulas)
+            for model in all_models(sorted(variables)))
+        if model is not None:
+            assert model.keys() == variables
+            assert all(evaluate(formula, model) for formula in formulas)
+
+def test_solver(debug=False):
+    n = 6
+    if debug:
+        print('Testing that', n + 1, 'pigeons do not fit in', n, 'holes')
+    solver = Solver()
+    in_hole = [[solver.new_variable() for hole in range(n)]
+               for pigeon in range(n + 1)]
+    for pigeon in range(n + 1):
+        solver.add_clause(in_hole[pigeon])
+    for hole in range(n):
+        for pigeon in range(n + 1):
+            for other in range(pigeon + 1, n + 1):
+                solver.add_clause([-in_hole[pigeon][hole],
+                                   -in_hole[other][hole]])
+    assert not solver.solve()
+    if debug:
+        print('Testing that', n, 'pigeons fit in', n, 'holes')
+    solver = Solver()
+    in_hole = [[solver.new_variable() for hole in range(n)]
+               for pigeon in range(n)]
+    clauses = [in_hole[pigeon] for pigeon in range(n)] + \
+              [[-in_hole[pigeon][hole], -in_hole[other][hole]]
+               for hole in range(n) for pigeon in range(n)
+               for other in range(pigeon + 1, n)]
+    for clause in clauses:
+        solver.add_clause(clause)
+    assert solver.solve()
+    assert all(any(solver.value(abs(literal)) == (literal > 0)
+                   for literal in clause) for clause in clauses)
+    if debug:
+        print('Testing a chain of 200 implications')
+    chain = [Formula('x0')] + \
+            [Formula('->', Formula('x' + str(i)), Formula('x' + str(i + 1)))
+             for i in range(199)]
+    model = satisfying_model(chain + [Formula('~', Formula('x199'))])
+    assert model is None
+    model = satisfying_model(chain)
+    assert all(model['x' + str(i)] for i in range(200))
+
+def test_sat(debug=False):
+    test_satisfying_model(debug)
+    test_solver(debug)
@@ -5,16 +5,45 @@
 
 """Semantic analysis of propositional-logic constructs."""
 
-from typing import AbstractSet, Iterable, Iterator, List, Mapping
+import sys
+from typing import IO, AbstractSet, Any, Callable, Dict, Iterable, Iterator, \
+                   List, Mapping, Optional, Sequence, Tuple, Union
+
+from logic_utils import LRUCache
 
 from propositions.syntax import *
 from propositions.proofs import *
+from propositions.sat import satisfying_model
+from propositions.bdd import BDD
 from itertools import product as iter_product
 from tabulate import tabulate
 from collections import defaultdict, OrderedDict
 
 Model = Mapping[str, bool]
 
+#: The truth function of each binary operator.
+BINARY_OPERATIONS = {
+    '&': lambda p, q: p and q,
+    '|': lambda p, q: p or q,
+    # p->q is the same as (~p|q) logically speaking
+    '->': lambda p, q: not p or q,
+    # checks for one truth and on false exclusively
+    '+': lambda p, q: p != q,
+    '<->': lambda p, q: p == q,
+    '-&': lambda p, q: not (p and q),
+    '-|': lambda p, q: not (p or q)}
+
+# The truth function of each binary operator on truth vectors, given the
+# vector that is True in every model
+_BITWISE_OPERATIONS = {
+    '&': lambda p, q, full: p & q,
+    '|': lambda p, q, full: p | q,
+    '->': lambda p, q, full: (full ^ p) | q,
+    '+': lambda p, q, full: p ^ q,
+    '<->': lambda p, q, full: full ^ p ^ q,
+    '-&': lambda p, q, full: full ^ (p & q),
+    '-|': lambda p, q, full: full ^ (p | q)}
+
 def is_model(model: Model) -> bool:
     """Checks if the given dictionary a model over some set of variables.
 
@@ -57,68 +86,262 @@ def evaluate(formula: Formula, model: Model) -> bool:
     assert is_model(model)
     assert formula.variables().issubset(variables(model))
 
-    # evaluating the truth value of a formula can be done recursively, base cases:
-    cur_token = formula.root
-    # Constants
-    if is_constant(cur_token):
-        return True if cur_token == 'T' else False
-
-    # Variables
-    if is_variable(formula.root):
-        return model.get(cur_token)
-
-    # Unary
-    if is_unary(cur_token):
-        return not (evaluate(formula.first, model))
-
-    # Binary
-    if is_binary(cur_token):
-        if cur_token == '&':
-            return evaluate(formula.first, model) and evaluate(formula.second, model)
-        elif cur_token == '|':
-            return evaluate(formula.first, model) or evaluate(formula.second, model)
-        elif cur_token == '->':
-            # p->q is the same as (~p|q) logically speaking
-            return not evaluate(formula.first, model) or evaluate(formula.second, model)
-        elif cur_token == '+':  # checks for one truth and on false exclusively
-            return (evaluate(formula.first, model) and not evaluate(formula.second, model)) or\
-                   (not evaluate(formula.first, model) and evaluate(formula.second, model))
-        elif cur_token == '-&':  # negate 'and'
-            return not (evaluate(formula.first, model) and evaluate(formula.second, model))
-        elif cur_token == '-|':  # negate 'or'
-            return not (evaluate(formula.first, model) or evaluate(formula.second, model))
-        elif cur_token == '<->':
-            return (evaluate(formula.first, model) and evaluate(formula.second, model)) or \
-                   (not evaluate(formula.first, model) and not evaluate(formula.second, model))
-
-
-
-def all_models(variables: List[str]) -> Iterable[Model]:
+    # evaluate bottom-up with an explicit stack, each shared subformula once
+    values = {}
+    stack = [formula]
+    while stack:
+        node = stack[-1]
+        if node in values:
+            stack.pop()
+            continue
+        cur_token = node.root
+        if is_constant(cur_token):
+            values[node] = cur_token == 'T'
+        elif is_variable(cur_token):
+            values[node] = model[cur_token]
+        elif is_unary(cur_token):
+            if node.first not in values:
+                stack.append(node.first)
+                continue
+            values[node] = not values[node.first]
+        else:
+            if node.first not in values or node.second not in values:
+                stack.extend((node.second, node.first))
+                continue
+            values[node] = BINARY_OPERATIONS[cur_token](values[node.first],
+                                                        values[node.second])
+        stack.pop()
+    return values[formula]
+
+#: The truth function of each binary operator in the three-valued logic of
+#: `evaluate_partially`, where ``None`` stands for an unknown value.
+PARTIAL_BINARY_OPERATIONS = {
+    '&': lambda p, q: False if p is False or q is False
+                      else None if p is None or q is None else True,
+    '|': lambda p, q: True if p is True or q is True
+                      else None if p is None or q is None else False,
+    '->': lambda p, q: True if p is False or q is True
+                       else None if p is None or q is None else False,
+    '+': lambda p, q: None if p is None or q is None else p != q,
+    '<->': lambda p, q: None if p is None or q is None else p == q,
+    '-&': lambda p, q: True if p is False or q is False
+                       else None if p is None or q is None else False,
+    '-|': lambda p, q: False if p is True or q is True
+                       else None if p is None or q is None else True
+}
+
+def evaluate_partially(formula: Formula, partial_model: Model) -> \
+        Optional[bool]:
+    """Calculates the truth value of the given formula in the given partial
+    model, in which the variables without a value are unknown, by the
+    three-valued logic in which an operator has a known value only if its
+    known operands force it, whatever the values of its unknown operands.
+
+    Parameters:
+        formula: formula to calculate the truth value of.
+        partial_model: model over some of the variables of the formula.
+
+    Returns:
+        The truth value of the given formula, or ``None`` if the partial model
+        does not force it.
+
+    Examples:
+        >>> evaluate_partially(Formula.parse('(p->(q->p))'), {'p': True})
+        True
+        >>> evaluate_partially(Formula.parse('(q->q)'), {}) is None
+        True
+    """
+    assert is_model(partial_model)
+    values = {}
+    stack = [formula]
+    while stack:
+        node = stack[-1]
+        if node in values:
+            stack.pop()
+            continue
+        cur_token = node.root
+        if is_constant(cur_token):
+            values[node] = cur_token == 'T'
+        elif is_variable(cur_token):
+            values[node] = partial_model.get(cur_token)
+        elif is_unary(cur_token):
+            if node.first not in values:
+                stack.append(node.first)
+                continue
+            value = values[node.first]
+            values[node] = None if value is None else not value
+        else:
+            if node.first not in values or node.second not in values:
+                stack.extend((node.second, node.first))
+                continue
+            values[node] = PARTIAL_BINARY_OPERATIONS[cur_token](
+                values[node.first], values[node.second])
+        stack.pop()
+    return values[formula]
+
+# The Python expression computing each binary operator from its operands
+_PYTHON_OPERATIONS = {
+    '&': '{} and {}',
+    '|': '{} or {}',
+    '->': 'not {} or {}',
+    '+': '{} != {}',
+    '<->': '{} == {}',
+    '-&': 'not ({} and {})',
+    '-|': 'not ({} or {})'}
+
+class CompiledFormula:
+    """A formula compiled into Python functions that calculate its truth value,
+    one assignment statement per distinct subformula.
+
+    Attributes:
+        variables (`~typing.Tuple`\\[`str`]): the variables of the formula,
+            in alphabetical order.
+    """
+    variables: Tuple[str, ...]
+
+    def __init__(self, formula: Formula) -> None:
+        """Compiles the given formula.
+
+        Parameters:
+            formula: formula to compile.
+        """
+        self.variables = tuple(sorted(formula.variables()))
+        # one line per distinct subformula, operands before the formulas
+        # using them, with {} standing for how a variable is read
+        self._lines = []
+        self._leaves = {}
+        names = {}
+        stack = [formula]
+        while stack:
+            node = stack[-1]
+            if node in names:
+                stack.pop()
+                continue
+            name = 'v' + str(len(names))
+            if is_constant(node.root):
+                expression = str(node.root == 'T')
+            elif is_variable(node.root):
+                self._leaves[len(self._lines)] = node.root
+                expression = '{}'
+            elif is_unary(node.root):
+                if node.first not in names:
+                    stack.append(node.first)
+                    continue
+                expression = 'not ' + names[node.first]
+            else:
+                if node.first not in names or node.second not in names:
+                    stack.extend((node.second, node.first))
+                    continue
+                expression = _PYTHON_OPERATIONS[node.root].format(
+                    names[node.first], names[node.second])
+            names[node] = name
+            self._lines.append('    ' + name + ' = ' + expression + '\n')
+            stack.pop()
+        self._result = names[formula]
+        self._by_name = None
+        self._by_position = None
+
+    def _compile(self, read: Mapping[str, str]) -> Callable[[Any], bool]:
+        """Compiles the lines of the current formula into a function of a
+        single argument ``m``.
+
+        :param read: the expression reading the value of each variable from m
+        :return: the compiled function
+        """
+        lines = self._lines.copy()
+        for index, variable in self._leaves.items():
+            lines[index] = lines[index].replace('{}', read[variable])
+        source = 'def evaluate(m):\n' + ''.join(lines) + \
+                 '    return ' + self._result + '\n'
+        namespace = {}
+        exec(compile(source, '<compiled formula>', 'exec'), namespace)
+        return namespace['evaluate']
+
+    def __call__(self, model: Union[Model, Sequence[bool]]) -> bool:
+        """Calculates the truth value of the compiled formula.
+
+        Parameters:
+            model: either a model over (possibly a superset of) the variables
+                of the formula, or a tuple of the truth values of the variables
+                of the formula, in the order of `variables`.
+
+        Returns:
+            The truth value of the compiled formula in the given model.
+        """
+        if isinstance(model, tuple):
+            if self._by_position is None:
+                self._by_position = self._compile(
+                    {variable: 'm[' + str(i) + ']'
+                     for i, variable in enumerate(self.variables)})
+            return self._by_position(model)
+        if self._by_name is None:
+            self._by_name = self._compile(
+                {variable: 'm[' + repr(variable) + ']'
+                 for variable in self.variables})
+        return self._by_name(model)
+
+#: The compiled formulas returned by `compile_formula`, most recently used
+#: ones kept.
+compiled_formulas: LRUCache = LRUCache(1024)
+
+def compile_formula(formula: Formula) -> CompiledFormula:
+    """Compiles the given formula into a callable that calculates its truth
+    value, reusing a previous compilation of the same formula if there is one.
+
+    Parameters:
+        formula: formula to compile.
+
+    Returns:
+        A callable that takes a model or a tuple of truth values of the
+        variables of the given formula in alphabetical order, and returns the
+        truth value of the given formula in it.
+
+    Examples:
+        >>> implication = compile_formula(Formula.parse('(p->q)'))
+        >>> implication({'p': True, 'q': False}), implication((False, False))
+        (False, True)
+    """
+    return compiled_formulas.get(formula, lambda: CompiledFormula(formula))
+
+def all_models(variables: List[str], reuse_model: bool = False) -> \
+        Iterator[Model]:
     """Calculates all possible models over the given variables.
 
     Parameters:
         variables: list of variables over which to calculate the models.
+        reuse_model: whether to yield the same dictionary over and over,
+            updated in place to each model in turn, rather than a new
+            dictionary per model. This saves time for callers that do not keep
+            or modify the models they are given.
 
     Returns:
-        An iterable over all possible models over the given variables. The order
-        of the models is lexicographic according to the order of the given
-        variables, where False precedes True.
+        An iterator over all possible models over the given variables, which
+        calculates each model only when it is requested. The order of the
+        models is lexicographic according to the order of the given variables,
+        where False precedes True.
 
     Examples:
         >>> list(all_models(['p', 'q']))
         [{'p': False, 'q': False}, {'p': False, 'q': True}, {'p': True, 'q': False}, {'p': True, 'q': True}]
     """
+    variables = list(variables)
     for v in variables:
         assert is_variable(v)
-    if len(variables) == 0:
-        return []  # return an empty list if the variables are empty.
-    values = [False, True]
-    ret_list = [{k: v for k, v in zip(variables, tup)} for tup in list(iter_product(values, repeat=len(variables)))]
-
-    return ret_list
-
-
-def truth_values(formula: Formula, models: Iterable[Model]) -> Iterable[bool]:
+    model = dict.fromkeys(variables, False)
+    while True:
+        yield model if reuse_model else dict(model)
+        # advance to the next model by binary counting, where the last
+        # variable is the least significant digit
+        i = len(variables) - 1
+        while i >= 0 and model[variables[i]]:
+            model[variables[i]] = False
+            i -= 1
+        if i < 0:
+            return
+        model[variables[i]] = True
+
+
+def truth_values(formula: Formula, models: Iterable[Model]) -> Iterator[bool]:
     """Calculates the truth value of the given formula in each of the given
     model.
 
@@ -127,15 +350,184 @@ def truth_values(formula: Formula, models: Iterable[Model]) -> Iterable[bool]:
         model: iterable over models to calculate the truth value in.
 
     Returns:
-        An iterable over the respective truth values of the given formula in
-        each of the given models, in the order of the given models.
+        An iterator over the respective truth values of the given formula in
+        each of the given models, in the order of the given models, which
+        calculates each truth value only when it is requested.
+    """
+    compiled = compile_formula(formula)
+    for model in models:
+        assert is_model(model)
+        assert formula.variables().issubset(variables(model))
+        yield compiled(model)
+
+
+
+def truth_vector(formula: Formula,
+                 variables: Optional[Sequence[str]] = None) -> int:
+    """Calculates the truth values of the given formula in all models over the
+    given variables at once, with each subformula evaluated a single time as a
+    vector of bits, one per model.
+
+    Parameters:
+        formula: formula to calculate the truth values of.
+        variables: variables over which to calculate the truth values, a
+            superset of the variables of the formula, or ``None`` to use the
+            variables of the formula in alphabetical order.
+
+    Returns:
+        An integer whose `k`\ th least significant bit is ``1`` if the given
+        formula is true in the `k`\ th model of
+        `all_models`\ ``(``\ `variables`\ ``)``, and ``0`` otherwise.
+
+    Examples:
+        >>> bin(truth_vector(Formula.parse('(p->q)'), ['p', 'q']))
+        '0b1011'
+    """
+    if variables is None:
+        variables = sorted(formula.variables())
+    assert formula.variables().issubset(variables)
+    n = len(variables)
+    full = (1 << (1 << n)) - 1
+    return _evaluate_vector(formula, {
+        Formula(variable): _variable_vector(i, n)
+        for i, variable in enumerate(variables)}, full)
+
+# The largest number of variables over which satisfiability is decided by
+# evaluating the full truth vector rather than by the SAT solver
+_TRUTH_VECTOR_VARIABLES = 16
+
+def _variable_vector(index: int, count: int) -> int:
     """
-    if not any(models):  # if model is empty, formula must consist of constants only.
-        return [evaluate(formula, dict())]
-    ret_list = [evaluate(formula, model) for model in models]
-    return ret_list
+    Calculates the truth vector of a variable
 
+    :param index: the position of the variable among the variables of the models
+    :param count: the number of variables of the models
+    :return: the truth vector of the variable over all models over the variables
+    """
+    # True in blocks of 2^(count-1-index) consecutive models, alternating
+    # with blocks where it is False
+    block_size = 1 << (count - 1 - index)
+    size = 1 << count
+    vector = ((1 << block_size) - 1) << block_size
+    width = 2 * block_size
+    while width < size:
+        vector |= vector << width
+        width *= 2
+    return vector
+
+def _evaluate_vector(formula: Formula, values: Dict[Formula, int],
+                     full: int) -> int:
+    """
+    Calculates the truth vector of a formula bottom-up, each shared subformula
+    once
+
+    :param formula: the formula to evaluate
+    :param values: the truth vectors of the variables of the formula, which is
+        filled with the truth vectors of its subformulas
+    :param full: the truth vector that is True in every model
+    :return: the truth vector of the formula
+    """
+    stack = [formula]
+    while stack:
+        node = stack[-1]
+        if node in values:
+            stack.pop()
+            continue
+        cur_token = node.root
+        if is_constant(cur_token):
+            values[node] = full if cur_token == 'T' else 0
+        elif is_unary(cur_token):
+            if node.first not in values:
+                stack.append(node.first)
+                continue
+            values[node] = full ^ values[node.first]
+        else:
+            if node.first not in values or node.second not in values:
+                stack.extend((node.second, node.first))
+                continue
+            values[node] = _BITWISE_OPERATIONS[cur_token](
+                values[node.first], values[node.second], full)
+        stack.pop()
+    return values[formula]
+
+# The number of variables that vary within each chunk of rows written by
+# write_truth_table, which bounds its memory use
+_TRUTH_TABLE_CHUNK_VARIABLES = 12
+
+def write_truth_table(formula: Formula, stream: IO,
+                      variables: Optional[Sequence[str]] = None,
+                      format: str = 'markdown') -> None:
+    """Writes the truth table of the given formula to the given stream, row by
+    row, in chunks of a bounded number of rows each evaluated at once.
 
+    Parameters:
+        formula: formula to write the truth table of.
+        stream: stream to write to, a binary stream for the ``'bitmap'``
+            format and a text stream otherwise.
+        variables: variables of the variable-name columns, a superset of the
+            variables of the formula, or ``None`` to use the variables of the
+            formula in alphabetical order.
+        format: ``'markdown'`` for the table of `print_truth_table`,
+            ``'csv'`` for comma-separated values with a header row and ``T``
+            and ``F`` cells, or ``'bitmap'`` for the truth values alone, one
+            bit per row, where row `k` is bit `k` ``% 8`` of byte `k` ``// 8``
+            and unused bits of the last byte are zero.
+
+    Examples:
+        >>> write_truth_table(Formula.parse('(p->q)'), sys.stdout,
+        ...                   format='csv')
+        p,q,(p->q)
+        F,F,T
+        F,T,T
+        T,F,F
+        T,T,T
+    """
+    assert format in ('markdown', 'csv', 'bitmap')
+    if variables is None:
+        variables = sorted(formula.variables())
+    assert formula.variables().issubset(variables)
+    variables = list(variables)
+    str_formula = str(formula)
+    # the rows of a chunk share the values of the leading variables, and the
+    # rows of every chunk are in the same order of the values of the others;
+    # chunks of at least eight rows fill whole bytes of a bitmap
+    prefix_length = max(0, len(variables) -
+                           max(_TRUTH_TABLE_CHUNK_VARIABLES, 3))
+    prefix, suffix = variables[:prefix_length], variables[prefix_length:]
+    if format == 'markdown':
+        header = '|' + ''.join(' ' + name + ' |'
+                               for name in variables + [str_formula])
+        separator = '|' + ''.join('-' * (len(name) + 2) + '|'
+                                  for name in variables + [str_formula])
+        stream.write(header + '\n' + separator + '\n')
+        def cells(names: Sequence[str], model: Model) -> str:
+            return ''.join('| ' + ('T' if model[name] else 'F') +
+                           ' ' * len(name) for name in names)
+        true_end = '| T' + ' ' * len(str_formula) + '|\n'
+        false_end = '| F' + ' ' * len(str_formula) + '|\n'
+    elif format == 'csv':
+        # formulas contain no commas, quotes or line breaks to escape
+        stream.write(','.join(variables + [str_formula]) + '\n')
+        def cells(names: Sequence[str], model: Model) -> str:
+            return ''.join(('T' if model[name] else 'F') + ','
+                           for name in names)
+        true_end, false_end = 'T\n', 'F\n'
+    if format != 'bitmap':
+        suffix_cells = [cells(suffix, model)
+                        for model in all_models(suffix, reuse_model=True)]
+    bitmap_size = ((1 << len(suffix)) + 7) // 8
+    for model in all_models(prefix, reuse_model=True):
+        vector = truth_vector(formula.substitute_variables(
+            {name: Formula('T' if value else 'F')
+             for name, value in model.items()}), suffix)
+        if format == 'bitmap':
+            stream.write(vector.to_bytes(bitmap_size, 'little'))
+            continue
+        prefix_cells = cells(prefix, model)
+        stream.write(''.join(
+            prefix_cells + row_cells +
+            (true_end if vector >> index & 1 else false_end)
+            for index, row_cells in enumerate(suffix_cells)))
 
 def print_truth_table(formula: Formula) -> None:
     """Prints the truth table of the given formula, with variable-name columns
@@ -153,52 +545,7 @@ def print_truth_table(formula: Formula) -> None:
         | T | F   | T        |
         | T | T   | F        |
     """
-    to_print = '|'
-    str_formula = str(formula)
-    # print columns names first
-    variables_truth = sorted(list(formula.variables()))
-    for var in variables_truth:
-        to_print += ' ' + var + ' |'
-    to_print += ' ' + str_formula + ' |'
-    to_print += '\n'
-    to_print += '|'
-    for var in variables_truth:
-        to_print += '-'*(len(var) + 2) + '|'
-    to_print += '-'*(len(str_formula) + 2) + '|'
-    to_print += '\n'
-
-    # printing truth values
-    variables_table = all_models(sorted(formula.variables()))
-    merged_table = merge_dicts(variables_table)
-    key_list = merged_table.keys()
-    t_values = list(truth_values(formula, variables_table))
-    i = 0
-    while(i < len(t_values)):
-        for key in key_list:
-            to_print += '| ' + merged_table[key][i] + ' ' * (len(key))
-        if t_values[i]:
-            cur_t_value = 'T'
-        else:
-            cur_t_value = 'F'
-        to_print += '| ' + cur_t_value + ' ' * (len(str_formula)) + '|' + '\n'
-        i += 1
-    print(to_print, end='')
-
-
-def merge_dicts(dictionaries):
-    """
-    helper function to merge dictionaries, also changes the bools to 'T' or 'F'
-    :param dictionaries: array of dictionaries
-    :return: merged dictionary with all bool values changed to 'T' or 'F' strings
-    """
-    dd = defaultdict(list)
-    for d in dictionaries:
-        for key, value in d.items():
-            if value:
-                dd[key].append('T')
-            else:
-                dd[key].append('F')
-    return dd
+    write_truth_table(formula, sys.stdout)
 
 def is_tautology(formula: Formula) -> bool:
     """Checks if the given formula is a tautology.
@@ -209,12 +556,7 @@ def is_tautology(formula: Formula) -> bool:
     Returns:
         ``True`` if the given formula is a tautology, ``False`` otherwise.
     """
-
-    truth_vals = truth_values(formula, all_models(list(formula.variables())))
-    for t_val in truth_vals:
-        if not t_val:
-            return False
-    return True
+    return not is_satisfiable(Formula('~', formula))
 
 def is_contradiction(formula: Formula) -> bool:
     """Checks if the given formula is a contradiction.
@@ -225,12 +567,7 @@ def is_contradiction(formula: Formula) -> bool:
     Returns:
         ``True`` if the given formula is a contradiction, ``False`` otherwise.
     """
-
-    truth_vals = truth_values(formula, all_models(list(formula.variables())))
-    for t_val in truth_vals:
-        if t_val:
-            return False
-    return True
+    return not is_satisfiable(formula)
 
 def is_satisfiable(formula: Formula) -> bool:
     """Checks if the given formula is satisfiable.
@@ -241,11 +578,37 @@ def is_satisfiable(formula: Formula) -> bool:
     Returns:
         ``True`` if the given formula is satisfiable, ``False`` otherwise.
     """
-    truth_vals = truth_values(formula, all_models(list(formula.variables())))
-    for t_val in truth_vals:
-        if t_val:
-            return True
-    return False
+    if len(formula.variables()) <= _TRUTH_VECTOR_VARIABLES:
+        return truth_vector(formula) != 0
+    return satisfying_model([formula]) is not None
+
+def count_models(formula: Formula,
+                 projection: Optional[Iterable[str]] = None) -> int:
+    """Counts the models in which the given formula is true.
+
+    Parameters:
+        formula: formula to count the models of.
+        projection: variables to count the models over, by default the
+            variables of the given formula.
+
+    Returns:
+        The number of models over the variables of the given formula in which
+        it is true, or, if a projection is given, the number of models over
+        the variables of the projection that extend to a model of the given
+        formula.
+    """
+    variables = formula.variables()
+    if projection is None and len(variables) <= _TRUTH_VECTOR_VARIABLES:
+        return bin(truth_vector(formula)).count('1')
+    # count the paths of the decision diagram of the formula, after
+    # quantifying away the variables outside of the projection
+    function = BDD().from_formula(formula)
+    if projection is None:
+        return function.count_models(variables)
+    projection = set(projection)
+    for variable in projection:
+        assert is_variable(variable)
+    return function.exists(variables - projection).count_models(projection)
 
 def synthesize_for_model(model: Model) -> Formula:
     """Synthesizes a propositional formula in the form of a single clause that
@@ -302,7 +665,8 @@ def synthesize(variables: List[str], values: Iterable[bool]) -> Formula:
     """
     assert len(variables) > 0
     models = all_models(variables)
-    assert len(models) == len(values)
+    values = list(values)
+    assert len(values) == 2 ** len(variables)
 
     flag = True
     if True not in values:
@@ -335,6 +699,313 @@ def create_contradiction_dnf(variables: List[str]) -> Formula:
             ret_val = Formula('|', Formula('&', Formula(var), Formula('~', Formula(var))), ret_val)
     return ret_val
 
+# The largest number of variables for which synthesize_minimal finds a cover
+# with the fewest terms; above it, it improves a cover heuristically
+_EXACT_SYNTHESIS_VARIABLES = 6
+
+# A cube is a conjunction of literals, as a pair of bit masks over the
+# positions of the variables in the index of a model in the order of
+# all_models: the positions of the variables that appear in it, and the
+# values that these variables have in it.
+_Cube = Tuple[int, int]
+
+def _cube_vector(cube: _Cube, vectors: List[int], full: int) -> int:
+    """
+    Calculates the truth vector of a cube
+
+    :param cube: the cube
+    :param vectors: the truth vector of the variable of each position
+    :param full: the truth vector that is True in every model
+    :return: the truth vector of the cube
+    """
+    mask, bits = cube
+    vector = full
+    for position, variable_vector in enumerate(vectors):
+        if mask >> position & 1:
+            vector &= variable_vector if bits >> position & 1 \
+                      else full ^ variable_vector
+    return vector
+
+def _prime_implicants(on: int, n: int) -> List[_Cube]:
+    """
+    Finds all prime implicants of a function by Quine-McCluskey merging
+
+    :param on: the truth vector of the function
+    :param n: the number of variables of the function
+    :return: the cubes that imply the function and that imply it no longer
+        when any literal is removed
+    """
+    all_positions = (1 << n) - 1
+    cubes = {(all_positions, index) for index in range(1 << n)
+             if on >> index & 1}
+    primes = []
+    while cubes:
+        merged = set()
+        used = set()
+        by_mask = defaultdict(set)
+        for mask, bits in cubes:
+            by_mask[mask].add(bits)
+        for mask, bits_set in by_mask.items():
+            for bits in bits_set:
+                position = mask
+                while position:
+                    low = position & -position
+                    position ^= low
+                    if bits & low == 0 and bits | low in bits_set:
+                        merged.add((mask ^ low, bits))
+                        used.add((mask, bits))
+                        used.add((mask, bits | low))
+        primes.extend(cubes - used)
+        cubes = merged
+    return primes
+
+def _exact_cover(primes: List[_Cube], on: int, vectors: List[int], full: int,
+                 bound: List[_Cube]) -> List[_Cube]:
+    """
+    Finds a cover with the fewest cubes, and then the fewest literals, by
+    branch and bound
+
+    :param primes: the prime implicants of a function
+    :param on: the truth vector of the function
+    :param vectors: the truth vector of the variable of each position
+    :param full: the truth vector that is True in every model
+    :param bound: a cover of the function by some of the given primes, to
+        improve on
+    :return: prime implicants whose disjunction is the function
+    """
+    prime_vectors = [_cube_vector(prime, vectors, full) for prime in primes]
+    literal_counts = [bin(prime[0]).count('1') for prime in primes]
+    covering = {}
+    remaining = on
+    while remaining:
+        low = remaining & -remaining
+        remaining ^= low
+        covering[low] = [number for number, vector in enumerate(prime_vectors)
+                         if vector & low]
+    best = [bound, (len(bound), sum(bin(cube[0]).count('1')
+                                    for cube in bound))]
+
+    def search(uncovered: int, chosen: List[int], literals: int) -> None:
+        if uncovered == 0:
+            if (len(chosen), literals) < best[1]:
+                best[0] = [primes[number] for number in chosen]
+                best[1] = (len(chosen), literals)
+            return
+        models = []
+        remaining = uncovered
+        while remaining:
+            low = remaining & -remaining
+            remaining ^= low
+            models.append(covering[low])
+        models.sort(key=len)
+        # models no two of which share a covering prime each need a prime of
+        # their own
+        used = set()
+        cubes_bound, literals_bound = len(chosen), literals
+        for candidates in models:
+            if used.isdisjoint(candidates):
+                used.update(candidates)
+                cubes_bound += 1
+                literals_bound += min(literal_counts[number]
+                                      for number in candidates)
+        if (cubes_bound, literals_bound) >= best[1]:
+            return
+        # branch on the model with the fewest covering primes
+        for number in models[0]:
+            chosen.append(number)
+            search(uncovered & ~prime_vectors[number], chosen,
+                   literals + literal_counts[number])
+            chosen.pop()
+    search(on, [], 0)
+    return best[0]
+
+def _expand(cube: _Cube, off: int, n: int, vectors: List[int], full: int,
+            positions: Sequence[int]) -> _Cube:
+    """
+    Removes literals from a cube as long as it does not intersect a set of
+    models
+
+    :param cube: the cube to expand
+    :param off: the truth vector of the models to avoid
+    :param n: the number of variables
+    :param vectors: the truth vector of the variable of each position
+    :param full: the truth vector that is True in every model
+    :param positions: the order in which to try removing literals
+    :return: a prime cube containing the given one
+    """
+    mask, bits = cube
+    for position in positions:
+        if mask >> position & 1:
+            candidate = (mask ^ (1 << position), bits & ~(1 << position))
+            if _cube_vector(candidate, vectors, full) & off == 0:
+                mask, bits = candidate
+    return mask, bits
+
+def _heuristic_cover(on: int, n: int, vectors: List[int],
+                     full: int) -> List[_Cube]:
+    """
+    Finds a small cover in the manner of Espresso, by expanding the models of
+    a function into prime cubes, removing redundant cubes, and repeatedly
+    reducing the cubes and expanding them differently while this helps
+
+    :param on: the truth vector of the function
+    :param n: the number of variables of the function
+    :param vectors: the truth vector of the variable of each position
+    :param full: the truth vector that is True in every model
+    :return: prime implicants whose disjunction is the function
+    """
+    off = full ^ on
+    all_positions = (1 << n) - 1
+
+    def expand(cubes: List[_Cube], positions: Sequence[int]) -> List[_Cube]:
+        # expand the larger cubes first, dropping cubes covered by earlier ones
+        expanded = []
+        covered = 0
+        for cube in sorted(cubes, key=lambda cube: bin(cube[0]).count('1')):
+            vector = _cube_vector(cube, vectors, full)
+            if vector & ~covered == 0:
+                continue
+            cube = _expand(cube, off, n, vectors, full, positions)
+            expanded.append(cube)
+            covered |= _cube_vector(cube, vectors, full)
+        # expand the models left uncovered
+        uncovered = on & ~covered
+        while uncovered:
+            index = (uncovered & -uncovered).bit_length() - 1
+            cube = _expand((all_positions, index), off, n, vectors, full,
+                           positions)
+            expanded.append(cube)
+            uncovered &= ~_cube_vector(cube, vectors, full)
+        return expanded
+
+    def irredundant(cubes: List[_Cube]) -> List[_Cube]:
+        # drop the cubes with the most literals first
+        cubes = sorted(cubes, key=lambda cube: -bin(cube[0]).count('1'))
+        cube_vectors = [_cube_vector(cube, vectors, full) for cube in cubes]
+        kept = list(range(len(cubes)))
+        for number in range(len(cubes)):
+            others = 0
+            for other in kept:
+                if other != number:
+                    others |= cube_vectors[other]
+            if cube_vectors[number] & ~others == 0:
+                kept.remove(number)
+        return [cubes[number] for number in kept]
+
+    def reduce(cubes: List[_Cube]) -> List[_Cube]:
+        # shrink each cube to the smallest one containing the models that no
+        # other cube covers
+        reduced = []
+        cube_vectors = [_cube_vector(cube, vectors, full) for cube in cubes]
+        for number, cube in enumerate(cubes):
+            others = 0
+            for other, vector in enumerate(cube_vectors):
+                if other != number:
+                    others |= vector
+            unique = cube_vectors[number] & ~others
+            if unique == 0:
+                continue
+            mask, bits = cube
+            # the literals on which all uniquely covered models agree
+            for position in range(n):
+                if mask >> position & 1 == 0:
+                    vector = vectors[position]
+                    if unique & vector == 0 or unique & ~vector == 0:
+                        mask |= 1 << position
+                        if unique & vector:
+                            bits |= 1 << position
+            reduced.append((mask, bits))
+            cube_vectors[number] = _cube_vector((mask, bits), vectors, full)
+        return reduced
+
+    def cost(cubes: List[_Cube]) -> Tuple[int, int]:
+        return len(cubes), sum(bin(cube[0]).count('1') for cube in cubes)
+
+    forward = list(range(n))
+    backward = forward[::-1]
+    cover = irredundant(expand([], forward))
+    for attempt in range(2 * n):
+        positions = backward if attempt % 2 == 0 else forward
+        candidate = irredundant(expand(reduce(cover), positions))
+        if cost(candidate) >= cost(cover):
+            break
+        cover = candidate
+    return cover
+
+def _balanced(formulas: List[Formula], operator: str) -> Formula:
+    """
+    Combines formulas with a binary operator into a tree of logarithmic depth
+
+    :param formulas: the formulas to combine, at least one
+    :param operator: the binary operator to combine them with
+    :return: the combined formula
+    """
+    while len(formulas) > 1:
+        formulas = [Formula(operator, formulas[i], formulas[i + 1])
+                    if i + 1 < len(formulas) else formulas[i]
+                    for i in range(0, len(formulas), 2)]
+    return formulas[0]
+
+def synthesize_minimal(variables: List[str], values: Iterable[bool]) -> \
+        Formula:
+    """Synthesizes a small propositional formula in DNF over the given
+    variables, from the given specification of which value the formula should
+    have on each possible model over these variables.
+
+    Over at most six variables, the disjunction has the fewest possible terms,
+    and among those the fewest literals. Over more variables it is found
+    heuristically, and has no term or literal that can be removed. Both the
+    disjunction and each of its terms are balanced trees.
+
+    Parameters:
+        variables: the set of variables for the synthesize formula.
+        values: iterable over truth values for the synthesized formula in every
+            possible model over the given variables, in the order returned by
+            `all_models`\ ``(``\ `~synthesize_minimal.variables`\ ``)``.
+
+    Returns:
+        The synthesized formula, which is ``'T'`` or ``'F'`` if the given
+        values are all true or all false.
+
+    Examples:
+        >>> synthesize_minimal(['p', 'q', 'r'],
+        ...                    [False, False, True, True, True, True, True, True])
+        (p|q)
+    """
+    n = len(variables)
+    on = 0
+    count = 0
+    for index, value in enumerate(values):
+        if value:
+            on |= 1 << index
+        count += 1
+    assert count == 2 ** n
+    full = (1 << (1 << n)) - 1
+    if on == 0:
+        return Formula('F')
+    if on == full:
+        return Formula('T')
+    # the variable of bit position p of the index of a model is the p-th from
+    # the end
+    vectors = [_variable_vector(n - 1 - position, n)
+               for position in range(n)]
+    cover = _heuristic_cover(on, n, vectors, full)
+    if n <= _EXACT_SYNTHESIS_VARIABLES:
+        cover = _exact_cover(_prime_implicants(on, n), on, vectors, full,
+                             cover)
+    terms = []
+    # the terms with the fewest literals first, then by the first variable
+    for mask, bits in sorted(cover, key=lambda cube: (
+            bin(cube[0]).count('1'), -cube[0], -cube[1])):
+        literals = []
+        for i, variable in enumerate(variables):
+            position = n - 1 - i
+            if mask >> position & 1:
+                literals.append(Formula(variable) if bits >> position & 1
+                                else Formula('~', Formula(variable)))
+        terms.append(_balanced(literals, '&'))
+    return _balanced(terms, '|')
+
 # Tasks for Chapter 4
 
 def evaluate_inference(rule: InferenceRule, model: Model) -> bool:
@@ -349,14 +1020,13 @@ def evaluate_inference(rule: InferenceRule, model: Model) -> bool:
         otherwise.
     """
     assert is_model(model)
+    assert rule.variables().issubset(variables(model))
     # Task 4.2
-    if [evaluate(assumption, model) for assumption in rule.assumptions] == [True for i in range(len(rule.assumptions))]:
-        if not evaluate(rule.conclusion, model):
-            return False
-        else:
-            return True
-    else:
-        return True
+    # the rule holds unless all assumptions hold and the conclusion does not
+    if all(compile_formula(assumption)(model)
+           for assumption in rule.assumptions):
+        return compile_formula(rule.conclusion)(model)
+    return True
 
 def is_sound_inference(rule: InferenceRule) -> bool:
     """Checks if the given inference rule is sound, i.e., whether its
@@ -369,7 +1039,12 @@ def is_sound_inference(rule: InferenceRule) -> bool:
         ``True`` if the given inference rule is sound, ``False`` otherwise.
     """
     # Task 4.3
-    models = all_models(rule.variables())
+    variables = rule.variables()
+    if len(variables) > _TRUTH_VECTOR_VARIABLES:
+        # sound unless the assumptions and the negated conclusion can all hold
+        return satisfying_model(list(rule.assumptions) +
+                                [Formula('~', rule.conclusion)]) is None
+    models = all_models(variables, reuse_model=True)
     for model in models:
         if not evaluate_inference(rule, model):
             return False
@@ -5,6 +5,8 @@
 
 """Tests for the propositions.semantics module."""
 
+import random
+
 from logic_utils import frozendict
 
 from propositions.syntax import *
@@ -409,6 +411,247 @@ def test_is_tautology_all_operators(debug=False):
             print('Testing whether', formula, 'is a tautology')
         assert is_tautology(formula) == tautology
 
+# Tests for extensions beyond the course tasks
+
+def test_evaluate_deep_formula(debug=False):
+    n = 50000
+    formula = Formula('p')
+    for i in range(n):
+        formula = Formula('~', Formula('+', formula, Formula('q' + str(i % 3))))
+    if debug:
+        print('Testing evaluation of a formula of depth', 2 * n)
+    for model in all_models(['p', 'q0', 'q1', 'q2']):
+        expected = model['p']
+        for i in range(n):
+            expected = not (expected != model['q' + str(i % 3)])
+        assert evaluate(formula, model) == expected
+
+def test_truth_vector(debug=False):
+    for infix, variables in [('T', []), ('F', ['p']), ('~p', None),
+                             ('((p+q)<->~(q-&r))', None),
+                             ('((p-|q)->(r|~(s&p)))', ['s', 'r', 'q', 'p']),
+                             ('(x1|~x1)', ['x1', 'y'])]:
+        formula = Formula.parse(infix)
+        if debug:
+            print('Testing the truth vector of', formula, 'over', variables)
+        vector = truth_vector(formula, variables)
+        models = list(all_models(sorted(formula.variables())
+                                 if variables is None else variables))
+        for k, model in enumerate(models):
+            assert (vector >> k) & 1 == evaluate(formula, model)
+        assert vector >> len(models) == 0
+    n = 20
+    parity = Formula('x0')
+    for i in range(1, n):
+        parity = Formula('+', parity, Formula('x' + str(i)))
+    if debug:
+        print('Testing tautology checks over', n, 'variables')
+    assert is_tautology(Formula('|', parity, Formula('~', parity)))
+    assert is_contradiction(Formula('&', parity, Formula('~', parity)))
+    assert is_satisfiable(parity) and not is_tautology(parity)
+    assert bin(truth_vector(parity)).count('1') == 2 ** (n - 1)
+
+def test_lazy_models(debug=False):
+    variables = ['x' + str(i) for i in range(60)]
+    if debug:
+        print('Testing that models over', len(variables),
+              'variables are generated lazily')
+    models = all_models(variables)
+    assert next(models) == dict.fromkeys(variables, False)
+    assert next(models) == {**dict.fromkeys(variables, False), 'x59': True}
+    assert list(all_models([])) == [{}]
+    models = list(all_models(['p', 'q', 'r'], reuse_model=True))
+    assert len(models) == 8 and all(model is models[0] for model in models)
+    assert list(all_models(['p', 'q', 'r'])) == \
+           [dict(zip(['p', 'q', 'r'], values))
+            for values in [(False, False, False), (False, False, True),
+                           (False, True, False), (False, True, True),
+                           (True, False, False), (True, False, True),
+                           (True, True, False), (True, True, True)]]
+    if debug:
+        print('Testing truth values over a generator of models')
+    formula = Formula.parse('(p->q)')
+    assert list(truth_values(formula, (model for model in
+                                       all_models(['p', 'q'])))) == \
+           [True, True, False, True]
+    assert list(truth_values(Formula('T'), all_models([]))) == [True]
+    assert next(truth_values(formula, all_models(variables + ['p', 'q'])))
+    if debug:
+        print('Testing early exit over', len(variables), 'variables')
+    big = Formula(variables[0])
+    for variable in variables[1:]:
+        big = Formula('|', big, Formula(variable))
+    assert is_satisfiable(big)
+    assert not is_tautology(big)
+    assert not is_contradiction(big)
+    assert not is_sound_inference(InferenceRule([], big))
+    assert is_sound_inference(InferenceRule([Formula('x59')],
+                                            Formula.parse('(x0|x59)')))
+
+def test_compile_formula(debug=False):
+    for infix in ['T', '~F', 'x12', '((p+q)<->~(q-&r))',
+                  '((p-|q)->(r|~(s&p)))', '(((p&q)|(p&q))->~(p&q))']:
+        formula = Formula.parse(infix)
+        if debug:
+            print('Testing the compiled evaluation of', formula)
+        compiled = compile_formula(formula)
+        assert compile_formula(formula) is compiled
+        assert compiled.variables == tuple(sorted(formula.variables()))
+        for model in all_models(compiled.variables):
+            expected = evaluate(formula, model)
+            assert compiled(model) == expected
+            assert compiled({**model, 'z9': True}) == expected
+            assert compiled(tuple(model.values())) == expected
+    n = 50000
+    formula = Formula('p')
+    for i in range(n):
+        formula = Formula('~', Formula('&', formula, Formula('q')))
+    if debug:
+        print('Testing the compiled evaluation of a formula of depth', 2 * n)
+    assert list(truth_values(formula, all_models(['p', 'q']))) == \
+           [True, False, True, True]
+    if debug:
+        print('Testing evaluation of inferences with compiled formulas')
+    rule = InferenceRule([Formula.parse('(p->q)'), Formula.parse('p')],
+                         Formula.parse('q'))
+    assert all(evaluate_inference(rule, model)
+               for model in all_models(['p', 'q']))
+    rule = InferenceRule([Formula.parse('(p->q)')], Formula.parse('p'))
+    assert not evaluate_inference(rule, {'p': False, 'q': False})
+
+def test_count_models(debug=False):
+    for infix in ['p', '~p', 'T', 'F', '(p|q)', '(p+(q+r))', '((p->q)&(r<->s))',
+                  '~((p&(q->F))-|(r+T))']:
+        formula = Formula.parse(infix)
+        variables = sorted(formula.variables())
+        if debug:
+            print('Testing count_models on', infix)
+        assert count_models(formula) == \
+               sum(truth_values(formula, all_models(variables)))
+        for projection in [[], ['p'], ['q', 'r'], ['p', 'z']]:
+            projected = {tuple(model.get(variable) for variable in projection)
+                         for model in all_models(variables)
+                         if evaluate(formula, model)}
+            expected = len(projected) * 2 ** len(
+                [variable for variable in projection
+                 if variable not in formula.variables()])
+            assert count_models(formula, projection) == expected
+
+    if debug:
+        print('Testing count_models on a formula over 60 variables')
+    formula = Formula('T')
+    for i in range(30):
+        formula = Formula('&', formula, Formula('|', Formula('x' + str(i)),
+                                                Formula('y' + str(i))))
+    assert count_models(formula) == 3 ** 30
+    assert count_models(formula, ['x' + str(i) for i in range(30)]) == 2 ** 30
+    assert count_models(formula, ['x0', 'y0']) == 3
+    assert count_models(Formula('&', formula, Formula('~', formula))) == 0
+
+def test_synthesize_minimal(debug=False):
+    for variables, values, expected in [
+            [['p'], [False, True], 'p'], [['p'], [True, False], '~p'],
+            [['p', 'q'], [False, False, False, False], 'F'],
+            [['p', 'q'], [True, True, True, True], 'T'],
+            [['p', 'q', 'r'], [False, False, True, True, True, True, True, True],
+             '(p|q)'],
+            [['p', 'q', 'r'], [False, True, False, True, False, True, True, True],
+             '(r|(p&q))'],
+            [['p', 'q', 'r', 's'],
+             [value for model in all_models(['p', 'q', 'r', 's'])
+              for value in [model['p'] and (model['q'] or model['s'])]],
+             '((p&q)|(p&s))']]:
+        if debug:
+            print('Testing synthesize_minimal for variables', variables,
+                  'and model-values', values)
+        formula = synthesize_minimal(variables, values)
+        assert str(formula) == expected, formula
+        assert list(truth_values(formula, all_models(variables))) == values
+
+    if debug:
+        print('Testing synthesize_minimal on random functions')
+    generator = random.Random(0)
+    for n in [3, 5, 6, 7, 9]:
+        variables = ['x' + str(i) for i in range(n)]
+        for trial in range(5):
+            values = [generator.random() < 0.6 for model in range(2 ** n)]
+            formula = synthesize_minimal(variables, values)
+            assert list(truth_values(formula, all_models(variables))) == values
+            assert formula.size() <= synthesize(variables, values).size()
+            # balanced terms of at most n literals, of which there are at
+            # most 2^(n-1)
+            assert formula.depth() <= 2 * n + 1
+
+    if debug:
+        print('Testing synthesize_minimal on a function of 12 variables')
+    variables = ['x' + str(i) for i in range(12)]
+    values = [model['x0'] != model['x11'] or model['x5']
+              for model in all_models(variables)]
+    assert str(synthesize_minimal(variables, values)) == \
+           '((x5|(x0&~x11))|(~x0&x11))'
+
+def test_write_truth_table(debug=False):
+    from io import BytesIO, StringIO
+
+    formula = Formula.parse('(p->q)')
+    if debug:
+        print('Testing write_truth_table formats of', formula)
+    output = StringIO()
+    write_truth_table(formula, output)
+    assert output.getvalue() == '| p | q | (p->q) |\n|---|---|--------|\n' \
+                                '| F | F | T      |\n| F | T | T      |\n' \
+                                '| T | F | F      |\n| T | T | T      |\n'
+    output = StringIO()
+    write_truth_table(formula, output, ['q', 'p', 'r'], 'csv')
+    assert output.getvalue() == 'q,p,r,(p->q)\nF,F,F,T\nF,F,T,T\nF,T,F,F\n' \
+                                'F,T,T,F\nT,F,F,T\nT,F,T,T\nT,T,F,T\n' \
+                                'T,T,T,T\n'
+    output = BytesIO()
+    write_truth_table(formula, output, format='bitmap')
+    assert output.getvalue() == bytes([0b1011])
+
+    if debug:
+        print('Testing write_truth_table over 14 variables')
+    formula = Formula('x0')
+    for i in range(1, 14):
+        formula = Formula('+' if i % 2 else '|', formula,
+                          Formula('x' + str(i)))
+    variables = sorted(formula.variables())
+    output = BytesIO()
+    write_truth_table(formula, output, format='bitmap')
+    assert output.getvalue() == \
+           truth_vector(formula).to_bytes(2 ** 14 // 8, 'little')
+    output = StringIO()
+    write_truth_table(formula, output, format='csv')
+    lines = output.getvalue().splitlines()
+    assert len(lines) == 2 ** 14 + 1
+    for index in [0, 1, 4095, 4096, 9999, 2 ** 14 - 1]:
+        model = list(all_models(variables))[index]
+        assert lines[index + 1] == ','.join(
+            ['T' if model[variable] else 'F' for variable in variables] +
+            ['T' if evaluate(formula, model) else 'F'])
+
+def test_evaluate_partially(debug=False):
+    for infix, partial_model, value in [
+            ['p', {}, None], ['p', {'p': True}, True], ['~p', {'p': True}, False],
+            ['T', {}, True], ['(p&q)', {'p': False}, False],
+            ['(p&q)', {'p': True}, None], ['(p|q)', {'q': True}, True],
+            ['(p->q)', {'p': False}, True], ['(p->q)', {'q': True}, True],
+            ['(p->q)', {'p': True}, None], ['(p+q)', {'p': True}, None],
+            ['(p<->q)', {'p': True, 'q': True}, True],
+            ['(p-&q)', {'q': False}, True], ['(p-|q)', {'p': True}, False],
+            ['(q->q)', {}, None], ['(p->(q->p))', {'p': True}, True],
+            ['(p->(q->p))', {'p': False}, True],
+            ['~((p|r)&(q->~s))', {'r': True, 's': False}, False]]:
+        formula = Formula.parse(infix)
+        if debug:
+            print('Testing evaluate_partially on', infix, 'in', partial_model)
+        assert evaluate_partially(formula, partial_model) is value
+        if value is not None:
+            variables = sorted(formula.variables() - partial_model.keys())
+            for model in all_models(variables):
+                assert evaluate(formula, dict(model, **partial_model)) == value
+
 def test_ex2(debug=False):
     test_evaluate(debug)
     test_all_models(debug)
@@ -428,8 +671,19 @@ def test_ex3(debug=False):
 def test_ex4(debug=False):
     test_evaluate_inference(debug)
     test_is_sound_inference(debug)
+
+def test_semantics_extensions(debug=False):
+    test_evaluate_deep_formula(debug)
+    test_truth_vector(debug)
+    test_lazy_models(debug)
+    test_compile_formula(debug)
+    test_count_models(debug)
+    test_synthesize_minimal(debug)
+    test_write_truth_table(debug)
+    test_evaluate_partially(debug)
     
 def test_all(debug=False):
     test_ex2(debug)
     test_ex3(debug)
     test_ex4(debug)
+    test_semantics_extensions(debug)
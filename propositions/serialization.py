@@ -0,0 +1,520 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: propositions/serialization.py
+
+"""Compact binary serialization of propositional formulas and proofs.
+
+A serialized file consists of numbered sections of records. Section 0 holds
+the distinct strings of the file, section 1 holds the distinct nodes of all of
+its formulas, each stored once with its children before it, and the other
+sections hold records that refer to strings and nodes by number. Every record
+is a sequence of unsigned 32-bit integers, and each section ends with an index
+of the offsets of its records, so that a file can be memory-mapped and any of
+its records read on demand without reading the records before it."""
+
+from __future__ import annotations
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Sequence as SequenceABC
+from typing import Any, Callable, FrozenSet, Iterable, List, Sequence, Tuple, \
+                   Union
+from weakref import WeakValueDictionary
+
+from propositions.syntax import *
+from propositions.proofs import *
+
+#: The number of the section holding the strings of a serialized file.
+STRINGS = 0
+#: The number of the section holding the formula nodes of a serialized file.
+NODES = 1
+
+_MAGIC = b'LOGB'
+_VERSION = 1
+# magic, version, reserved, kind of file, number of sections
+_HEADER = struct.Struct('<4sHH8sI')
+# number of records, offset of the index of the section
+_SECTION = struct.Struct('<QQ')
+_LENGTH = struct.Struct('<I')
+_OFFSET = struct.Struct('<Q')
+
+class TableWriter:
+    """Collects the records of a serialized file and writes them out.
+
+    Strings and nodes added to the writer are numbered in the order in which
+    they are first added, and adding them again returns the same number.
+    """
+
+    def __init__(self, kind: bytes, section_count: int) -> None:
+        """Initializes an empty writer.
+
+        Parameters:
+            kind: eight bytes identifying the kind of the file.
+            section_count: number of sections of the file, including the
+                strings and nodes sections.
+        """
+        assert len(kind) == 8 and section_count >= 2
+        self.kind = kind
+        self._string_numbers = {}
+        self._node_numbers = {}
+        self._data = [array('I') for _ in range(section_count)]
+        self._starts = [array('Q') for _ in range(section_count)]
+        self._string_data = bytearray()
+
+    def string(self, s: str) -> int:
+        """Adds the given string to the strings section, if not added yet.
+
+        Parameters:
+            s: string to add.
+
+        Returns:
+            The number of the given string in the strings section.
+        """
+        number = self._string_numbers.get(s)
+        if number is None:
+            number = self._string_numbers[s] = len(self._string_numbers)
+            encoded = s.encode()
+            self._starts[STRINGS].append(len(self._string_data))
+            self._string_data += _LENGTH.pack(len(encoded))
+            self._string_data += encoded
+        return number
+
+    def add(self, section: int, record: Iterable[int]) -> int:
+        """Appends the given record to the given section.
+
+        Parameters:
+            section: number of the section to append to, other than the
+                strings section.
+            record: the integers to append as a record.
+
+        Returns:
+            The number of the appended record in the given section.
+        """
+        assert section != STRINGS
+        data = self._data[section]
+        starts = self._starts[section]
+        starts.append(len(data))
+        data.append(0)
+        data.extend(record)
+        data[starts[-1]] = len(data) - starts[-1] - 1
+        return len(starts) - 1
+
+    def add_node(self, node: Any, children: Callable[[Any], Sequence[Any]],
+                 record: Callable[[Any, List[int]], Iterable[int]]) -> int:
+        """Adds the given node and all of its descendants that were not added
+        yet to the nodes section, children before their parents.
+
+        Parameters:
+            node: node to add.
+            children: function returning the children of a node.
+            record: function returning the record of a node, given the node
+                and the numbers of its children.
+
+        Returns:
+            The number of the given node in the nodes section.
+        """
+        numbers = self._node_numbers
+        number = numbers.get(node)
+        if number is not None:
+            return number
+        stack = [node]
+        while stack:
+            current = stack[-1]
+            if current in numbers:
+                stack.pop()
+                continue
+            current_children = children(current)
+            missing = [child for child in current_children
+                       if child not in numbers]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            numbers[current] = self.add(
+                NODES, record(current, [numbers[child]
+                                        for child in current_children]))
+        return numbers[node]
+
+    def write(self, path: str) -> None:
+        """Writes all records added so far into a file.
+
+        Parameters:
+            path: path of the file to write.
+        """
+        section_count = len(self._data)
+        offset = _HEADER.size + section_count * _SECTION.size
+        directory = []
+        contents = []
+        for section in range(section_count):
+            if section == STRINGS:
+                data = self._string_data
+                starts = self._starts[section]
+                size = len(data)
+            else:
+                data = self._data[section]
+                # offsets of records in bytes rather than in integers
+                starts = array('Q', (4 * start
+                                     for start in self._starts[section]))
+                size = 4 * len(data)
+            index = array('Q', (offset + start for start in starts))
+            if sys.byteorder != 'little':
+                if section != STRINGS:
+                    data = array('I', data)
+                    data.byteswap()
+                index.byteswap()
+            directory.append(_SECTION.pack(len(starts), offset + size))
+            contents.extend((data, index))
+            offset += size + 8 * len(starts)
+        with open(path, 'wb') as file:
+            file.write(_HEADER.pack(_MAGIC, _VERSION, 0, self.kind,
+                                    section_count))
+            for entry in directory:
+                file.write(entry)
+            for content in contents:
+                file.write(content)
+
+class TableFile:
+    """A serialized file, memory-mapped so that its records are read only when
+    requested.
+
+    Nodes read from the file are remembered for as long as they are in use
+    elsewhere, so that reading them again does not rebuild them.
+    """
+
+    def __init__(self, path: str, kind: bytes) -> None:
+        """Opens the given file.
+
+        Parameters:
+            path: path of the file to open.
+            kind: eight bytes identifying the expected kind of the file.
+
+        Raises:
+            ValueError: If the given file is not a serialized file of the given
+                kind.
+        """
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, file_kind, section_count = \
+                _HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            self._map.close()
+            raise ValueError(path + ' is not a serialized file') from None
+        if magic != _MAGIC or version != _VERSION or file_kind != kind:
+            self._map.close()
+            raise ValueError(path + ' is not a serialized file of kind ' +
+                             repr(kind))
+        self._sections = [
+            _SECTION.unpack_from(self._map,
+                                 _HEADER.size + section * _SECTION.size)
+            for section in range(section_count)]
+        self._strings = {}
+        self._nodes = WeakValueDictionary()
+
+    def count(self, section: int) -> int:
+        """Returns the number of records in the given section."""
+        return self._sections[section][0]
+
+    def _start(self, section: int, number: int) -> int:
+        count, index = self._sections[section]
+        if not 0 <= number < count:
+            raise IndexError('No record ' + str(number) + ' in section ' +
+                             str(section))
+        return _OFFSET.unpack_from(self._map, index + 8 * number)[0]
+
+    def record(self, section: int, number: int) -> Tuple[int, ...]:
+        """Reads a record of the given section, other than the strings section.
+
+        Parameters:
+            section: number of the section to read from.
+            number: number of the record to read.
+
+        Returns:
+            The integers of the requested record.
+        """
+        start = self._start(section, number)
+        length = _LENGTH.unpack_from(self._map, start)[0]
+        return struct.unpack_from('<%dI' % length, self._map, start + 4)
+
+    def string(self, number: int) -> str:
+        """Reads a string from the strings section.
+
+        Parameters:
+            number: number of the string to read.
+
+        Returns:
+            The requested string.
+        """
+        s = self._strings.get(number)
+        if s is None:
+            start = self._start(STRINGS, number)
+            length = _LENGTH.unpack_from(self._map, start)[0]
+            s = self._strings[number] = \
+                self._map[start + 4:start + 4 + length].decode()
+        return s
+
+    def node(self, number: int,
+             children: Callable[[Tuple[int, ...]], Sequence[int]],
+             build: Callable[[Tuple[int, ...], List[Any]], Any]) -> Any:
+        """Reads a node from the nodes section, along with those of its
+        descendants that are not in use already, children before their parents.
+
+        Parameters:
+            number: number of the node to read.
+            children: function returning the numbers of the children of a node
+                given its record.
+            build: function building a node given its record and its built
+                children.
+
+        Returns:
+            The requested node.
+        """
+        node = self._nodes.get(number)
+        if node is not None:
+            return node
+        built = {}
+        stack = [number]
+        while stack:
+            current = stack[-1]
+            if current in built:
+                stack.pop()
+                continue
+            node = self._nodes.get(current)
+            if node is None:
+                record = self.record(NODES, current)
+                child_numbers = children(record)
+                missing = []
+                for child in child_numbers:
+                    if child not in built:
+                        child_node = self._nodes.get(child)
+                        if child_node is None:
+                            missing.append(child)
+                        else:
+                            built[child] = child_node
+                if missing:
+                    stack.extend(missing)
+                    continue
+                node = build(record, [built[child] for child in child_numbers])
+                self._nodes[current] = node
+            built[current] = node
+            stack.pop()
+        return built[number]
+
+    def close(self) -> None:
+        """Closes the memory map of the file."""
+        self._map.close()
+
+    def __enter__(self) -> TableFile:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+_FORMULAS_KIND = b'PROPFRML'
+_PROOF_KIND = b'PROPPROF'
+# Sections following the strings and nodes sections
+_ROOTS, _RULES, _LINES = 2, 3, 4
+
+def _children(formula: Formula) -> Tuple[Formula, ...]:
+    """Returns the operands of the given formula.
+
+    Parameters:
+        formula: formula to return the operands of.
+
+    Returns:
+        The operands of the given formula, in order.
+    """
+    if is_binary(formula.root):
+        return formula.first, formula.second
+    if is_unary(formula.root):
+        return formula.first,
+    return ()
+
+def _add_formula(writer: TableWriter, formula: Formula) -> int:
+    """Adds the given formula and its subformulas to the given writer.
+
+    Parameters:
+        writer: writer to add to.
+        formula: formula to add.
+
+    Returns:
+        The number of the given formula in the nodes section.
+    """
+    return writer.add_node(formula, _children,
+                           lambda formula, operands:
+                           [writer.string(formula.root)] + operands)
+
+def _read_formula(file: TableFile, number: int) -> Formula:
+    """Reads a formula from the given file.
+
+    Parameters:
+        file: file to read from.
+        number: number of the formula in the nodes section.
+
+    Returns:
+        The requested formula.
+    """
+    return file.node(number, lambda record: record[1:],
+                     lambda record, operands:
+                     Formula(file.string(record[0]), *operands))
+
+def save_formulas(formulas: Iterable[Formula], path: str) -> None:
+    """Serializes the given formulas into a file, storing each distinct
+    subformula once.
+
+    Parameters:
+        formulas: formulas to serialize.
+        path: path of the file to write.
+    """
+    writer = TableWriter(_FORMULAS_KIND, 3)
+    writer.add(_ROOTS, [_add_formula(writer, formula)
+                        for formula in formulas])
+    writer.write(path)
+
+def load_formulas(path: str) -> List[Formula]:
+    """Deserializes formulas from a file written by `save_formulas`.
+
+    Parameters:
+        path: path of the file to read.
+
+    Returns:
+        The serialized formulas, in order.
+    """
+    with TableFile(path, _FORMULAS_KIND) as file:
+        return [_read_formula(file, number)
+                for number in file.record(_ROOTS, 0)]
+
+def save_proof(proof: Proof, path: str) -> None:
+    """Serializes the given proof into a file, storing each distinct
+    subformula and inference rule once.
+
+    Parameters:
+        proof: proof to serialize.
+        path: path of the file to write.
+    """
+    writer = TableWriter(_PROOF_KIND, 5)
+    rule_numbers = {}
+    def add_rule(rule: InferenceRule) -> int:
+        number = rule_numbers.get(rule)
+        if number is None:
+            number = rule_numbers[rule] = writer.add(
+                _RULES, [_add_formula(writer, rule.conclusion)] +
+                        [_add_formula(writer, assumption)
+                         for assumption in rule.assumptions])
+        return number
+    writer.add(_ROOTS, [add_rule(proof.statement)] +
+                       [add_rule(rule) for rule in proof.rules])
+    for line in proof.lines:
+        if line.is_assumption():
+            writer.add(_LINES, (_add_formula(writer, line.formula), 0))
+        else:
+            writer.add(_LINES, (_add_formula(writer, line.formula),
+                                add_rule(line.rule) + 1, *line.assumptions))
+    writer.write(path)
+
+class LazyProof:
+    """A proof serialized by `save_proof`, whose lines are read from the
+    memory-mapped file only when accessed.
+
+    Attributes:
+        statement (`~propositions.proofs.InferenceRule`): the statement of the
+            proof.
+        rules (`~typing.FrozenSet`\\[`~propositions.proofs.InferenceRule`]): the
+            allowed rules of the proof.
+        lines (`~typing.Sequence`\\[`~propositions.proofs.Proof.Line`]): the
+            lines of the proof, each read when accessed.
+    """
+    statement: InferenceRule
+    rules: FrozenSet[InferenceRule]
+    lines: Sequence[Proof.Line]
+
+    def __init__(self, path: str) -> None:
+        """Opens a proof serialized by `save_proof`.
+
+        Parameters:
+            path: path of the file to read.
+
+        Raises:
+            ValueError: If the given file is not a serialized proof.
+        """
+        self._file = file = TableFile(path, _PROOF_KIND)
+        self._rules = [
+            InferenceRule([_read_formula(file, assumption)
+                           for assumption in record[1:]],
+                          _read_formula(file, record[0]))
+            for record in (file.record(_RULES, number)
+                           for number in range(file.count(_RULES)))]
+        roots = file.record(_ROOTS, 0)
+        self.statement = self._rules[roots[0]]
+        self.rules = frozenset(self._rules[number] for number in roots[1:])
+        self.lines = _LazyLines(self)
+
+    def _line(self, number: int) -> Proof.Line:
+        record = self._file.record(_LINES, number)
+        formula = _read_formula(self._file, record[0])
+        if record[1] == 0:
+            return Proof.Line(formula)
+        return Proof.Line(formula, self._rules[record[1] - 1], record[2:])
+
+    def proof(self) -> Proof:
+        """Reads all lines of the current proof.
+
+        Returns:
+            The current proof as a `~propositions.proofs.Proof`.
+        """
+        return Proof(self.statement, self.rules, self.lines)
+
+    def close(self) -> None:
+        """Closes the file of the current proof. Lines can no longer be read
+        afterwards."""
+        self._file.close()
+
+    def __enter__(self) -> LazyProof:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+class _LazyLines(SequenceABC):
+    """The lines of a `LazyProof`, each read when accessed."""
+
+    def __init__(self, proof: LazyProof) -> None:
+        self._proof = proof
+        self._count = proof._file.count(_LINES)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: Union[int, slice]) -> \
+            Union[Proof.Line, List[Proof.Line]]:
+        if isinstance(index, slice):
+            return [self._proof._line(number)
+                    for number in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        return self._proof._line(index)
+
+def open_proof(path: str) -> LazyProof:
+    """Opens a proof serialized by `save_proof` without reading its lines.
+
+    Parameters:
+        path: path of the file to read.
+
+    Returns:
+        The serialized proof, whose lines are read when accessed.
+    """
+    return LazyProof(path)
+
+def load_proof(path: str) -> Proof:
+    """Deserializes a proof serialized by `save_proof`.
+
+    Parameters:
+        path: path of the file to read.
+
+    Returns:
+        The serialized proof.
+    """
+    with open_proof(path) as proof:
+        return proof.proof()
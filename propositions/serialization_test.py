@@ -0,0 +1,76 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: propositions/serialization_test.py
+
+"""Tests for the propositions.serialization module."""
+
+import os
+from tempfile import TemporaryDirectory
+
+from propositions.syntax import *
+from propositions.proofs import *
+from propositions.tautology import prove_tautology
+from propositions.serialization import *
+
+def test_save_formulas(debug=False):
+    n = 50000
+    deep = Formula('p')
+    for i in range(n):
+        deep = Formula('~', Formula('->', deep, Formula('q' + str(i % 10))))
+    shared = Formula('p')
+    for i in range(40):
+        shared = Formula('&', shared, shared)
+    formulas = [Formula.parse('((p->q)<->~(p-&T))'), Formula('F'), deep,
+                deep.first, shared]
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'formulas')
+        if debug:
+            print('Testing serialization of formulas of depth up to', 2 * n)
+        save_formulas(formulas, path)
+        assert load_formulas(path) == formulas
+        if debug:
+            print('Testing serialization of a formula with 2^40 leaves')
+        save_formulas([shared], path)
+        assert load_formulas(path) == [shared]
+        assert os.path.getsize(path) < 2000
+        save_formulas([], path)
+        assert load_formulas(path) == []
+        try:
+            load_proof(path)
+            assert False, 'Loading formulas as a proof did not fail'
+        except ValueError:
+            pass
+
+def test_save_proof(debug=False):
+    proof = prove_tautology(Formula.parse('((p->q)->((q->r)->(p->r)))'))
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'proof')
+        if debug:
+            print('Testing serialization of a proof with', len(proof.lines),
+                  'lines')
+        save_proof(proof, path)
+        assert os.path.getsize(path) < len(str(proof)) / 2
+        loaded = load_proof(path)
+        assert loaded.statement == proof.statement
+        assert loaded.rules == proof.rules
+        assert len(loaded.lines) == len(proof.lines)
+        for line, loaded_line in zip(proof.lines, loaded.lines):
+            assert loaded_line.formula is line.formula
+            assert loaded_line.rule == line.rule
+            assert loaded_line.assumptions == line.assumptions
+        assert loaded.is_valid()
+        if debug:
+            print('Testing lazy loading of the proof')
+        with open_proof(path) as lazy:
+            assert lazy.statement == proof.statement
+            assert len(lazy.lines) == len(proof.lines)
+            assert lazy.lines[-1].formula is proof.lines[-1].formula
+            assert [line.formula for line in lazy.lines[3:6]] == \
+                   [line.formula for line in proof.lines[3:6]]
+            assert lazy.lines[0].is_assumption() == \
+                   proof.lines[0].is_assumption()
+
+def test_serialization(debug=False):
+    test_save_formulas(debug)
+    test_save_proof(debug)
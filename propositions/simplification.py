@@ -0,0 +1,209 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: propositions/simplification.py
+
+"""Simplification of propositional formulas, and their restriction to partial
+models."""
+
+from typing import Dict, Mapping
+
+from logic_utils import LRUCache
+
+from propositions.syntax import *
+
+_TRUE = Formula('T')
+_FALSE = Formula('F')
+
+def _negate(formula: Formula) -> Formula:
+    """
+    Negates a simplified formula, keeping it simplified.
+
+    :param formula: the formula to negate
+    :return: the simplified negation of the formula
+    """
+    if formula is _TRUE:
+        return _FALSE
+    if formula is _FALSE:
+        return _TRUE
+    if formula.root == '~':
+        return formula.first
+    return Formula('~', formula)
+
+def _are_complementary(first: Formula, second: Formula) -> bool:
+    return (first.root == '~' and first.first is second) or \
+           (second.root == '~' and second.first is first)
+
+def _conjoin(first: Formula, second: Formula) -> Formula:
+    """
+    Conjoins two simplified formulas, keeping the conjunction simplified.
+
+    :param first: the first conjunct
+    :param second: the second conjunct
+    :return: a simplified formula equivalent to the conjunction
+    """
+    if first is _FALSE or second is _FALSE or \
+            _are_complementary(first, second):
+        return _FALSE
+    if first is _TRUE or first is second:
+        return second
+    if second is _TRUE:
+        return first
+    # absorption: (p&(p|q)) is p
+    if second.root == '|' and (second.first is first or
+                               second.second is first):
+        return first
+    if first.root == '|' and (first.first is second or
+                              first.second is second):
+        return second
+    return Formula('&', first, second)
+
+def _disjoin(first: Formula, second: Formula) -> Formula:
+    """
+    Disjoins two simplified formulas, keeping the disjunction simplified.
+
+    :param first: the first disjunct
+    :param second: the second disjunct
+    :return: a simplified formula equivalent to the disjunction
+    """
+    if first is _TRUE or second is _TRUE or \
+            _are_complementary(first, second):
+        return _TRUE
+    if first is _FALSE or first is second:
+        return second
+    if second is _FALSE:
+        return first
+    # absorption: (p|(p&q)) is p
+    if second.root == '&' and (second.first is first or
+                               second.second is first):
+        return first
+    if first.root == '&' and (first.first is second or
+                              first.second is second):
+        return second
+    return Formula('|', first, second)
+
+def _equate(first: Formula, second: Formula) -> Formula:
+    """
+    Equates two simplified formulas, keeping the equivalence simplified.
+
+    :param first: the first side
+    :param second: the second side
+    :return: a simplified formula equivalent to the equivalence of the sides
+    """
+    if first is second:
+        return _TRUE
+    if _are_complementary(first, second):
+        return _FALSE
+    if first is _TRUE:
+        return second
+    if second is _TRUE:
+        return first
+    if first is _FALSE:
+        return _negate(second)
+    if second is _FALSE:
+        return _negate(first)
+    return Formula('<->', first, second)
+
+def _combine(root: str, first: Formula, second: Formula) -> Formula:
+    """
+    Combines two simplified formulas with a binary operator, keeping the
+    combination simplified.
+
+    :param root: the binary operator
+    :param first: the first operand
+    :param second: the second operand
+    :return: a simplified formula equivalent to the combination
+    """
+    if root == '&':
+        return _conjoin(first, second)
+    if root == '|':
+        return _disjoin(first, second)
+    if root == '->':
+        if first is _TRUE or second is _TRUE or first is _FALSE or \
+                second is _FALSE or first is second or \
+                _are_complementary(first, second):
+            return _disjoin(_negate(first), second)
+        return Formula('->', first, second)
+    if root == '<->':
+        return _equate(first, second)
+    if root == '+':
+        if first is second or _are_complementary(first, second) or \
+                first.root in ('T', 'F') or second.root in ('T', 'F'):
+            return _negate(_equate(first, second))
+        return Formula('+', first, second)
+    conjoined = _conjoin(first, second) if root == '-&' \
+                else _disjoin(first, second)
+    if conjoined is first or conjoined is second or \
+            conjoined.root in ('T', 'F'):
+        return _negate(conjoined)
+    return Formula(root, first, second)
+
+def restrict(formula: Formula, partial_model: Mapping[str, bool]) -> Formula:
+    """Specializes the given formula to the given partial model, by replacing
+    each of its variables with the value of the variable in the model, if it
+    has one, and simplifying the result as `simplify` does.
+
+    Parameters:
+        formula: formula to specialize.
+        partial_model: values of some variables, not necessarily all variables
+            of the given formula.
+
+    Returns:
+        A simplified formula over the variables of the given formula that are
+        not in the given model, that has the same value as the given formula
+        in every model that agrees with the given partial model.
+
+    Examples:
+        >>> restrict(Formula.parse('((p&q)|(~p&r))'), {'p': True})
+        q
+    """
+    simplified: Dict[Formula, Formula] = {}
+    stack = [formula]
+    while stack:
+        node = stack[-1]
+        if node in simplified:
+            stack.pop()
+            continue
+        root = node.root
+        if is_variable(root):
+            value = partial_model.get(root)
+            simplified[node] = node if value is None \
+                               else _TRUE if value else _FALSE
+        elif is_constant(root):
+            simplified[node] = node
+        elif is_unary(root):
+            if node.first not in simplified:
+                stack.append(node.first)
+                continue
+            simplified[node] = _negate(simplified[node.first])
+        else:
+            if node.first not in simplified or node.second not in simplified:
+                stack.extend((node.second, node.first))
+                continue
+            simplified[node] = _combine(root, simplified[node.first],
+                                        simplified[node.second])
+        stack.pop()
+    return simplified[formula]
+
+# A cache of the results of simplify, keyed by the simplified formula
+simplified_formulas: LRUCache = LRUCache(1024)
+
+def simplify(formula: Formula) -> Formula:
+    """Simplifies the given formula bottom-up, rewriting each distinct
+    subformula once. Constants are propagated through all operators, double
+    negations are removed, and operands that are equal, complementary (one the
+    negation of the other), or absorbed (as `p` absorbs ``(p|q)`` in a
+    conjunction, and ``(p&q)`` in a disjunction) are combined.
+
+    Parameters:
+        formula: formula to simplify.
+
+    Returns:
+        A formula equivalent to the given formula, no larger than it, that
+        either is a constant or contains none.
+
+    Examples:
+        >>> simplify(Formula.parse('((p|F)&~~(p|q))'))
+        p
+    """
+    return simplified_formulas.get(formula, lambda: restrict(formula, {}))
@@ -0,0 +1,68 @@
+# (c) This file is part of the course
+# Mathematical Logic through Programming
+# by Gonczarowski and Nisan.
+# File name: propositions/simplification_test.py
+
+"""Tests for the propositions.simplification module."""
+
+from propositions.syntax import *
+from propositions.semantics import *
+from propositions.simplification import *
+
+def test_simplify(debug=False):
+    for infix, expected in [
+            ['p', 'p'], ['~~p', 'p'], ['~~~T', 'F'], ['(p&T)', 'p'],
+            ['(F&p)', 'F'], ['(p|F)', 'p'], ['(T|p)', 'T'], ['(p&p)', 'p'],
+            ['(p|p)', 'p'], ['(p&~p)', 'F'], ['(~p|p)', 'T'],
+            ['(p&(p|q))', 'p'], ['((q&p)|p)', 'p'], ['(F->p)', 'T'],
+            ['(p->T)', 'T'], ['(T->p)', 'p'], ['(p->F)', '~p'], ['(p->p)', 'T'],
+            ['(~p->p)', 'p'], ['(p->q)', '(p->q)'], ['(p+F)', 'p'],
+            ['(p+T)', '~p'], ['(p+p)', 'F'], ['(p+~p)', 'T'], ['(p<->T)', 'p'],
+            ['(p<->F)', '~p'], ['(p<->p)', 'T'], ['(~p<->p)', 'F'],
+            ['(p-&T)', '~p'], ['(p-&F)', 'T'], ['(p-&p)', '~p'],
+            ['(p-|F)', '~p'], ['(p-|T)', 'F'], ['(p-|~p)', 'F'],
+            ['(p-&(p|q))', '~p'], ['(p-&q)', '(p-&q)'],
+            ['((p|F)&~~(p|q))', 'p'], ['~((q->T)&~(r+r))', 'F'],
+            ['(((p&T)+(q|F))<->~(F-|(p+q)))', 'T']]:
+        formula = Formula.parse(infix)
+        if debug:
+            print('Testing simplify on', infix)
+        simplified = simplify(formula)
+        assert str(simplified) == expected, simplified
+        assert simplified.size() <= formula.size()
+        variables = sorted(formula.variables())
+        assert list(truth_values(formula, all_models(variables))) == \
+               list(truth_values(simplified, all_models(variables)))
+
+    if debug:
+        print('Testing simplify on a deep shared formula')
+    formula = Formula('p')
+    for i in range(10000):
+        formula = Formula('&', Formula('|', formula, Formula('F')),
+                          Formula('~', Formula('~', formula)))
+    assert simplify(formula) is Formula('p')
+
+def test_restrict(debug=False):
+    for infix, partial_model, expected in [
+            ['((p&q)|(~p&r))', {'p': True}, 'q'],
+            ['((p&q)|(~p&r))', {'p': False}, 'r'],
+            ['((p&q)|(~p&r))', {'q': True, 'r': True}, 'T'],
+            ['((p&q)|(~p&r))', {'s': True}, '((p&q)|(~p&r))'],
+            ['((p->q)+(r<->p))', {'p': True}, '(q+r)'],
+            ['((p->q)+(r<->p))', {'p': False, 'r': False}, 'F'],
+            ['(p-&(q-|r))', {'q': False}, '(p-&~r)']]:
+        formula = Formula.parse(infix)
+        if debug:
+            print('Testing restrict on', infix, 'and', partial_model)
+        restricted = restrict(formula, partial_model)
+        assert str(restricted) == expected, restricted
+        variables = sorted(formula.variables() | partial_model.keys())
+        for model in all_models(variables):
+            if all(model[variable] == value
+                   for variable, value in partial_model.items()):
+                assert evaluate(formula, model) == \
+                       evaluate(restricted, model)
+
+def test_simplification(debug=False):
+    test_simplify(debug)
+    test_restrict(debug)
@@ -8,11 +8,12 @@
 """Syntactic handling of propositional formulae."""
 
 from __future__ import annotations
-from typing import Mapping, Optional, Set, Tuple, Union
+from typing import Callable, FrozenSet, Mapping, Optional, Set, Tuple, Union
 import re
 from collections import OrderedDict
+from weakref import WeakValueDictionary
 
-from logic_utils import frozen
+from logic_utils import frozen, parse_cache
 
 ###################### Macros #########################
 
@@ -68,60 +69,52 @@ def is_binary(s: str) -> bool:
     # return s in {'&', '|',  '->', '+', '<->', '-&', '-|'}
 
 
-def get_variable(s: str) -> Tuple[Union[Formula, None], str]:
+#: Matches the (possibly empty) digits that follow the first letter of an
+#: atomic proposition.
+_VARIABLE_SUFFIX = re.compile(r'\d*')
+
+def _parse_error(message: str, position: int) -> Tuple[None, str]:
     """
-    Helper function for parse, Checks a string and gets the variable from it
-    :param s: current string
-    :return: tuple of formula of the string and the suffix of the rest without the variable
+    Helper function for parse_prefix, builds the result of a failed parse
+    :param message: human-readable description of the failure
+    :param position: index in the parsed string at which parsing failed
+    :return: tuple of None and the error message, including the position
     """
-    # check and see if there is a number after the variable name
-    cur_token = s[0]
-    i = 1
-    cur_variable_num = ''
-    while(i < len(s)):
-        if s[i].isdigit():
-            cur_variable_num += s[i]
-            i += 1
-        else:
-            break
+    return None, message + ' (at position ' + str(position) + ')'
 
-    # either adds the number to the token, or if it didnt exist, adds an empty string
-    cur_token += cur_variable_num
-    return Formula(cur_token), s[len(cur_token):]
-
-def get_binary_formula(s: str) -> Tuple[Union[Formula, None], str]:
+def _with_operands(formula: Formula, first: Optional[Formula],
+                   second: Optional[Formula]) -> Formula:
+    """
+    Helper function for rebuilding formulas, replaces the operands of a formula
+    :param formula: the formula whose root to keep
+    :param first: the new first operand, if the root is an operator
+    :param second: the new second operand, if the root is a binary operator
+    :return: the formula with the same root and the given operands
     """
-    Helper function for parse, Checks a string that begins with '(' and returns a the binary formula prefix
-    derived from s.
-    :param s: the current string
-    :return: tuple of a binary formula and the remaining suffix
+    if is_unary(formula.root):
+        return Formula(formula.root, first)
+    if is_binary(formula.root):
+        return Formula(formula.root, first, second)
+    return formula
+
+def _shared_union(first: FrozenSet[str], second: FrozenSet[str]) -> \
+        FrozenSet[str]:
     """
-    cur_formula, cur_suffix = Formula.parse_prefix(s[1:])
-    if len(cur_suffix) >= 2:  # after a binary operator there must be at least two characters in the suffix
-        if is_binary(cur_suffix[0]):  # &, |, + cases
-            right_formula, right_suffix = Formula.parse_prefix(cur_suffix[1:])
-            # check for ')'
-            if right_suffix == '' or right_suffix[0] != ')':
-                return None, PARSE_ERR_MISSING_BRACKET
-
-            return Formula(cur_suffix[0], cur_formula, right_formula), right_suffix[1:]
-        elif is_binary(cur_suffix[0:2]):  # ->, -&, -| case
-            right_formula, right_suffix = Formula.parse_prefix(cur_suffix[2:])
-            # check for ')'
-            if right_suffix == '' or right_suffix[0] != ')':
-                return None, PARSE_ERR_MISSING_BRACKET
-            return Formula(cur_suffix[0:2], cur_formula, right_formula), right_suffix[1:]
-
-        elif len(cur_suffix) >= 3:
-            if is_binary(cur_suffix[0:3]):  # the <-> case
-                right_formula, right_suffix = Formula.parse_prefix(cur_suffix[3:])
-                # check for ')'
-                if right_suffix == '' or right_suffix[0] != ')':
-                    return None, PARSE_ERR_MISSING_BRACKET
-                return Formula(cur_suffix[0:3], cur_formula, right_formula), right_suffix[1:]
-
-
-    return None, PARSE_ERR_ILLEGAL_CHAR
+    Helper function for the formula metadata, unites two sets while reusing
+    one of them if it already contains the other, so that subformulas share
+    their operator sets whenever possible
+    :param first: the first set
+    :param second: the second set
+    :return: the union of the two sets
+    """
+    if second <= first:
+        return first
+    if first <= second:
+        return second
+    return first | second
+
+#: Table of all live formulas, keyed by their root and root operands.
+_formula_table: WeakValueDictionary = WeakValueDictionary()
 
 @frozen
 class Formula:
@@ -139,9 +132,23 @@ class Formula:
     first: Optional[Formula]
     second: Optional[Formula]
 
-    def __init__(self, root: str, first: Optional[Formula] = None,
-                 second: Optional[Formula] = None) -> None:
-        """Initializes a `Formula` from its root and root operands.
+    _hash: int
+    # Lazily computed metadata, filled in at most once per (shared) node
+    _str: Optional[str]
+    _variables: Optional[FrozenSet[str]]
+    _operators: Optional[FrozenSet[str]]
+    _size: Optional[int]
+    _depth: Optional[int]
+
+    def __new__(cls, root: str, first: Optional[Formula] = None,
+                second: Optional[Formula] = None) -> Formula:
+        """Returns the unique `Formula` with the given root and root operands,
+        creating it if no equal formula currently exists.
+
+        Formulas are hash-consed: structurally equal formulas are the very same
+        object, so equality is an identity check and shared subformulas are
+        stored only once. Consequently, all fields are populated here rather
+        than in ``__init__``.
 
         Parameters:
             root: the root for the formula tree.
@@ -149,17 +156,47 @@ class Formula:
                 binary operator.
             second: the second operand to the root, if the root is a binary
                 operator.
+
+        Returns:
+            The formula with the given root and root operands.
         """
+        key = (root, first, second)
+        formula = _formula_table.get(key)
+        if formula is not None:
+            return formula
+        formula = super().__new__(cls)
         if is_variable(root) or is_constant(root):
             assert first is None and second is None
-            self.root = root
+            object.__setattr__(formula, 'root', root)
+            structural_hash = hash(root)
         elif is_unary(root):
             assert type(first) is Formula and second is None
-            self.root, self.first = root, first
+            object.__setattr__(formula, 'root', root)
+            object.__setattr__(formula, 'first', first)
+            structural_hash = hash((root, first._hash))
         else:
             assert is_binary(root) and type(first) is Formula and \
                    type(second) is Formula
-            self.root, self.first, self.second = root, first, second
+            object.__setattr__(formula, 'root', root)
+            object.__setattr__(formula, 'first', first)
+            object.__setattr__(formula, 'second', second)
+            structural_hash = hash((root, first._hash, second._hash))
+        object.__setattr__(formula, '_hash', structural_hash)
+        for name in ('_str', '_variables', '_operators', '_size', '_depth'):
+            object.__setattr__(formula, name, None)
+        # Another thread may have interned an equal formula in the meantime
+        return _formula_table.setdefault(key, formula)
+
+    def __reduce__(self) -> Tuple[Callable[[str], Formula], Tuple[str]]:
+        """Reduces the current formula to its polish notation representation,
+        so that pickling and copying do not recurse into the formula, and
+        unpickled and copied formulas are interned as well.
+
+        Returns:
+            `parse_polish` and the polish notation representation of the
+            current formula.
+        """
+        return Formula.parse_polish, (self.polish(),)
 
     def __eq__(self, other: object) -> bool:
         """Compares the current formula with the given one.
@@ -171,7 +208,8 @@ class Formula:
             ``True`` if the given object is a `Formula` object that equals the
             current formula, ``False`` otherwise.
         """
-        return isinstance(other, Formula) and str(self) == str(other)
+        # Formulas are interned, so equal formulas are the same object
+        return self is other
 
     def __ne__(self, other: object) -> bool:
         """Compares the current formula with the given one.
@@ -186,90 +224,147 @@ class Formula:
         return not self == other
 
     def __hash__(self) -> int:
-        return hash(str(self))
+        return self._hash
 
     def __repr__(self) -> str:
         """Computes the string representation of the current formula.
 
+        The string is cached on the current formula only, and not on each of
+        its subformulas, since the strings of all subformulas of a deep formula
+        together are quadratically longer than its own string. A subformula
+        whose string is requested later is walked again, down to the
+        subformulas whose strings are already cached.
 
         Returns:
             The standard string representation of the current formula.
         """
-        # check recursively
-        # base case:
-        ret = ''
-        if is_constant(self.root) or is_variable(self.root):
-            ret += self.root
-            return ret
-        elif is_unary(self.root):
-            if self.first is not None:  # make sure no mistakes were made in init
-                ret += self.root
-                ret += self.first.__repr__()  # recursively call repr on the statement
-                return ret
-        elif is_binary(self.root):
-            if self.first is not None and self.second is not None:  # make sure no mistakes were made in init
-                ret += '('
-                ret += self.first.__repr__()
-                ret += self.root
-                ret += self.second.__repr__()
-                ret += ')'
-                return ret
-
-
-
-
-    def variables(self) -> Set[str]:
+        if self._str is None:
+            # Collect the string pieces with an explicit stack (pushed in
+            # reverse order), reusing strings already cached on subformulas.
+            pieces = []
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                if type(node) is str:
+                    pieces.append(node)
+                elif node._str is not None:
+                    pieces.append(node._str)
+                elif is_unary(node.root):
+                    pieces.append(node.root)
+                    stack.append(node.first)
+                elif is_binary(node.root):
+                    pieces.append('(')
+                    stack.extend((')', node.second, node.root, node.first))
+                else:
+                    pieces.append(node.root)
+            object.__setattr__(self, '_str', ''.join(pieces))
+        return self._str
+
+    def _compute_metadata(self) -> None:
+        """Computes and caches the operators, size and depth of the current
+        formula and of all of its subformulas that do not have them cached
+        yet."""
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            if node._size is not None:
+                stack.pop()
+                continue
+            root = node.root
+            if is_variable(root):
+                metadata = frozenset(), 1, 0
+            elif is_constant(root):
+                metadata = frozenset((root,)), 1, 0
+            elif is_unary(root):
+                first = node.first
+                if first._size is None:
+                    stack.append(first)
+                    continue
+                metadata = _shared_union(first._operators, frozenset((root,))), \
+                           first._size + 1, first._depth + 1
+            else:
+                first, second = node.first, node.second
+                if first._size is None or second._size is None:
+                    stack.extend((first, second))
+                    continue
+                metadata = \
+                    _shared_union(_shared_union(first._operators,
+                                                second._operators),
+                                  frozenset((root,))), \
+                    first._size + second._size + 1, \
+                    max(first._depth, second._depth) + 1
+            stack.pop()
+            for name, value in zip(('_operators', '_size', '_depth'),
+                                   metadata):
+                object.__setattr__(node, name, value)
+
+    def variables(self) -> FrozenSet[str]:
         """Finds all atomic propositions (variables) in the current formula.
 
+        The set is cached on the current formula only, and not on each of its
+        subformulas, since the sets of all subformulas of a long chain of
+        distinct variables together take quadratic space. A subformula whose
+        set is requested later is walked again, down to the subformulas whose
+        sets are already cached.
+
         Returns:
             A set of all atomic propositions used in the current formula.
         """
-        # defined recursively
-        ret = set()
-        # base cases
-        if is_constant(self.root):
-            return set()
-        if is_variable(self.root):
-            ret.update([self.root])
-            return ret
-        else:
-            if is_unary(self.root):
-                ret.update(self.first.variables())
-                return ret
-            if is_binary(self.root):
-                ret.update(self.first.variables())
-                ret.update(self.second.variables())
-                return ret
+        if self._variables is None:
+            # Visit each shared subformula once, reusing variable sets already
+            # cached on subformulas.
+            variables = set()
+            visited = set()
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                if node in visited:
+                    continue
+                visited.add(node)
+                if node._variables is not None:
+                    variables.update(node._variables)
+                elif is_variable(node.root):
+                    variables.add(node.root)
+                elif is_unary(node.root):
+                    stack.append(node.first)
+                elif is_binary(node.root):
+                    stack.extend((node.first, node.second))
+            object.__setattr__(self, '_variables', frozenset(variables))
+        return self._variables
+
+    def operators(self) -> FrozenSet[str]:
+        """Finds all operators in the current formula.
 
+        Returns:
+            A set of all operators (including ``'T'`` and ``'F'``) used in the
+            current formula.
+        """
+        if self._operators is None:
+            self._compute_metadata()
+        return self._operators
 
+    def size(self) -> int:
+        """Counts the nodes of the current formula tree.
 
+        Returns:
+            The number of constants, atomic propositions and operators in the
+            current formula, counting repeated subformulas once per occurrence.
+        """
+        if self._size is None:
+            self._compute_metadata()
+        return self._size
 
-    def operators(self) -> Set[str]:
-        """Finds all operators in the current formula.
+    def depth(self) -> int:
+        """Computes the depth of the current formula tree.
 
         Returns:
-            A set of all operators (including ``'T'`` and ``'F'``) used in the
-            current formula.
+            The number of operators on the longest path from the root of the
+            current formula to a constant or atomic proposition.
         """
-        # defined recursively
-        ret = set()
-        # base cases
-        if is_constant(self.root):
-            ret.update([self.root])
-            return ret
-        if is_variable(self.root):
-            return ret
-        else:
-            if is_unary(self.root):
-                ret.update(self.root)
-                ret.update(self.first.operators())
-                return ret
-            if is_binary(self.root):
-                ret.add(self.root)
-                ret.update(self.first.operators())
-                ret.update(self.second.operators())
-                return ret
-        
+        if self._depth is None:
+            self._compute_metadata()
+        return self._depth
+
     @staticmethod
     def parse_prefix(s: str) -> Tuple[Union[Formula, None], str]:
         """Parses a prefix of the given string into a formula.
@@ -284,38 +379,63 @@ class Formula:
             (and not just a part of it, such as ``'x1'``). If no prefix of the
             given string is a valid standard string representation of a formula
             then returned pair should be of ``None`` and an error message, where
-            the error message is a string with some human-readable content.
+            the error message is a string with some human-readable content,
+            including the index in the string at which parsing failed.
         """
-        # get first letter, decide next move accordingly. done recursively
-        # if string is empty return empty formula and string
+        # Single left-to-right pass over s with an index cursor. Operators
+        # whose operands are still being parsed wait on an explicit stack:
+        # '~' for a negation, or a [first operand, operator] pair for a
+        # binary formula whose '(' was consumed.
         if s == '':
             return None, PARSE_ERR_MESSAGE_EMPTY_STR
-        cur_token = s[0]
-        # base cases:
-        # 1. variable reached
-        if 'p' <= cur_token <= 'z':
-            return get_variable(s)
-        # 2. T or F reached
-        elif is_constant(cur_token):
-            return Formula(cur_token), s[len(cur_token):]
-        # (, ), binary operators and unary operators all require a recursive call.
-        # unary call:
-        elif is_unary(cur_token):
-            cur_formula, cur_suffix = Formula.parse_prefix(s[1:])
-            if cur_formula is None:
-                return None, PARSE_ERR_ILLEGAL_CHAR
+        length = len(s)
+        pending = []
+        position = 0
+        while True:
+            # Parse the next operand, pushing negations and opened brackets
+            while position < length and (s[position] == '~' or
+                                         s[position] == '('):
+                pending.append('~' if s[position] == '~' else [None, None])
+                position += 1
+            if position == length:
+                return _parse_error(PARSE_ERR_ILLEGAL_CHAR, position)
+            cur_token = s[position]
+            if 'p' <= cur_token <= 'z':
+                end = _VARIABLE_SUFFIX.match(s, position + 1).end()
+                formula = Formula(s[position:end])
+                position = end
+            elif is_constant(cur_token):
+                formula = Formula(cur_token)
+                position += 1
             else:
-                return Formula(cur_token, cur_formula), s[len(str(cur_formula)) + len(cur_token):]
-        # binary call: will start with '(' and with two legal formulae and a binary operator in the middle
-        # ends with ')'
-        elif cur_token == '(':
-            return get_binary_formula(s)
-        # reaching here means cur is illegal:
-        return None, PARSE_ERR_ILLEGAL_CHAR
-
-
-
-
+                return _parse_error(PARSE_ERR_ILLEGAL_CHAR, position)
+            # Complete every pending operator whose operands are now parsed
+            while pending:
+                top = pending[-1]
+                if top == '~':
+                    pending.pop()
+                    formula = Formula('~', formula)
+                elif top[0] is None:
+                    # formula is the first operand, a binary operator follows
+                    for operator_length in (1, 2, 3):
+                        operator = s[position:position + operator_length]
+                        if is_binary(operator):
+                            break
+                    else:
+                        return _parse_error(PARSE_ERR_ILLEGAL_CHAR, position)
+                    top[0], top[1] = formula, operator
+                    position += operator_length
+                    break
+                else:
+                    # formula is the second operand, a ')' must follow
+                    if position == length or s[position] != ')':
+                        return _parse_error(PARSE_ERR_MISSING_BRACKET,
+                                            position)
+                    pending.pop()
+                    formula = Formula(top[1], top[0], formula)
+                    position += 1
+            else:
+                return formula, s[position:]
 
     @staticmethod
     def is_formula(s: str) -> bool:
@@ -330,8 +450,8 @@ class Formula:
         """
         # We remember from the Lemma: Prefix-Free Property of Formulae. if the formula is a legal formula,
         # the only prefix that is a legal formula is the formula itself (the formula is its own substring)
-
-        return str(Formula.parse_prefix(s)[0]) == s
+        formula, suffix = Formula.parse_prefix(s)
+        return formula is not None and suffix == ''
         
     @staticmethod
     def parse(s: str) -> Formula:
@@ -343,8 +463,11 @@ class Formula:
         Returns:
             A formula whose standard string representation is the given string.
         """
-        assert Formula.is_formula(s)
-        return Formula.parse_prefix(s)[0]
+        def parse_uncached() -> Formula:
+            formula, suffix = Formula.parse_prefix(s)
+            assert formula is not None and suffix == '', suffix
+            return formula
+        return parse_cache.get((Formula, s), parse_uncached)
 
 # Optional tasks for Chapter 1
 
@@ -355,6 +478,17 @@ class Formula:
             The polish notation representation of the current formula.
         """
         # Optional Task 1.7
+        roots = []
+        stack = [self]
+        while stack:
+            formula = stack.pop()
+            roots.append(formula.root)
+            if is_binary(formula.root):
+                stack.append(formula.second)
+                stack.append(formula.first)
+            elif is_unary(formula.root):
+                stack.append(formula.first)
+        return ''.join(roots)
 
     @staticmethod
     def parse_polish(s: str) -> Formula:
@@ -367,6 +501,55 @@ class Formula:
             A formula whose polish notation representation is the given string.
         """
         # Optional Task 1.8
+        # Single left-to-right pass over s. Operators whose operands are
+        # still being parsed wait on an explicit stack: '~' for a negation,
+        # or an [operator, first operand] pair for a binary formula.
+        length = len(s)
+        pending = []
+        position = 0
+        while True:
+            assert position < length, 'Missing operand at position ' + \
+                                      str(position)
+            cur_token = s[position]
+            if 'p' <= cur_token <= 'z':
+                end = _VARIABLE_SUFFIX.match(s, position + 1).end()
+                formula = Formula(s[position:end])
+                position = end
+            elif is_constant(cur_token):
+                formula = Formula(cur_token)
+                position += 1
+            elif is_unary(cur_token):
+                pending.append(cur_token)
+                position += 1
+                continue
+            else:
+                for operator_length in (1, 2, 3):
+                    operator = s[position:position + operator_length]
+                    if is_binary(operator):
+                        break
+                else:
+                    assert False, 'Illegal character at position ' + \
+                                  str(position)
+                pending.append([operator, None])
+                position += operator_length
+                continue
+            # Complete every pending operator whose operands are now parsed
+            while pending:
+                top = pending[-1]
+                if top == '~':
+                    pending.pop()
+                    formula = Formula('~', formula)
+                elif top[1] is None:
+                    # formula is the first operand, the second one follows
+                    top[1] = formula
+                    break
+                else:
+                    pending.pop()
+                    formula = Formula(top[0], top[1], formula)
+            else:
+                assert position == length, 'Unexpected character at ' \
+                                           'position ' + str(position)
+                return formula
 
 # Tasks for Chapter 3
 
@@ -392,30 +575,14 @@ class Formula:
             return self
         for variable in substitution_map:
             assert is_variable(variable)
-        ret_string = str(self)
 
-        rep = dict((re.escape(k), str(v)) for k, v in (substitution_map.items()))
-
-        # take out "tricky" variables that don't exist from the rep dictionary.
-        for var in substitution_map:
-            if var not in self.variables():
-                rep.pop(var)
-
-        if not rep:  # check if the dictionary is empty
-            return self
+        def substitute(node: Formula, first: Optional[Formula],
+                       second: Optional[Formula]) -> Formula:
+            if is_variable(node.root):
+                return substitution_map.get(node.root, node)
+            return _with_operands(node, first, second)
 
-        # the reason I sort the keys is to avoid a bug with substrings.
-        # for example if we replace {v2: p, v22: r} if the dictionary is not an ordered dict
-        # the substring may be replaced first in the v22 occurrence.
-
-        # this code replaces strings using the created regex in one pass, replacements are done in the order
-        # of the keys. substrings shouldnt affect this.
-
-        # Fix made in targil 4, added boundaries to keys, which won't allow any substring confusion
-        with_boundaries = map(lambda x: "\\b" + x + "\\b", rep.keys())
-        pattern = re.compile("|".join(sorted(with_boundaries, key=len, reverse=True)))
-        ret_string = pattern.sub(lambda m: rep[re.escape(m.group(0))], ret_string)
-        return Formula.parse(ret_string)
+        return self._rebuild(substitute)
 
     def substitute_operators(
             self, substitution_map: Mapping[str, Formula]) -> Formula:
@@ -441,39 +608,54 @@ class Formula:
             assert is_binary(operator) or is_unary(operator) or \
                    is_constant(operator)
             assert substitution_map[operator].variables().issubset({'p', 'q'})
-        # return recursively changing the operators
-        cur_operator = self.root
-
-        # base case: root is empty
-        if is_variable(cur_operator):
-            return Formula(cur_operator)
-
-        # if its a constant
-        if is_constant(cur_operator):
-            if cur_operator in substitution_map:
-                return substitution_map[cur_operator]
-            else:
-                return Formula(cur_operator)
-
-        # if it is a unary operator:
-        if is_unary(cur_operator):
-            replace_child = self.first.substitute_operators(substitution_map)
-            ret_formula = Formula(cur_operator, replace_child)
-            if cur_operator in substitution_map:
-                return substitution_map[cur_operator].substitute_variables({'p': ret_formula.first})
-            else:
-                return ret_formula
-
-        if is_binary(cur_operator):
-            left_child = self.first.substitute_operators(substitution_map)
-            right_child = self.second.substitute_operators(substitution_map)
-            ret_formula = Formula(cur_operator, left_child, right_child)
-            if cur_operator in substitution_map:
-                return substitution_map[cur_operator].substitute_variables({'p': ret_formula.first, 'q': ret_formula.second})
-            else:
-                return ret_formula
-
-
 
+        def substitute(node: Formula, first: Optional[Formula],
+                       second: Optional[Formula]) -> Formula:
+            if node.root not in substitution_map:
+                return _with_operands(node, first, second)
+            if is_constant(node.root):
+                return substitution_map[node.root]
+            if is_unary(node.root):
+                return substitution_map[node.root].substitute_variables(
+                    {'p': first})
+            return substitution_map[node.root].substitute_variables(
+                {'p': first, 'q': second})
+
+        return self._rebuild(substitute)
+
+    def _rebuild(self, rebuild_node: Callable[[Formula, Optional[Formula],
+                                                Optional[Formula]],
+                                               Formula]) -> Formula:
+        """Rebuilds the current formula bottom-up, visiting each shared
+        subformula once and without recursion.
 
+        Parameters:
+            rebuild_node: function from a subformula and its already rebuilt
+                operands (or ``None`` for missing operands) to the rebuilt
+                subformula.
 
+        Returns:
+            The rebuilt current formula.
+        """
+        rebuilt = {}
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            if node in rebuilt:
+                stack.pop()
+                continue
+            if is_unary(node.root):
+                if node.first not in rebuilt:
+                    stack.append(node.first)
+                    continue
+                rebuilt[node] = rebuild_node(node, rebuilt[node.first], None)
+            elif is_binary(node.root):
+                if node.first not in rebuilt or node.second not in rebuilt:
+                    stack.extend((node.second, node.first))
+                    continue
+                rebuilt[node] = rebuild_node(node, rebuilt[node.first],
+                                             rebuilt[node.second])
+            else:
+                rebuilt[node] = rebuild_node(node, None, None)
+            stack.pop()
+        return rebuilt[self]
@@ -5,7 +5,7 @@
 
 """Tests for the propositions.syntax module."""
 
-from logic_utils import frozendict
+from logic_utils import frozendict, parse_cache
 
 from propositions.syntax import *
 
@@ -311,7 +311,204 @@ def test_substitute_operators(debug=False):
         d = {k:Formula.parse(d[k]) for k in d}
         a = str(f.substitute_operators(frozendict(d)))
         assert a == r, "Incorrect answer:"+a             
-               
+
+# Tests for extensions beyond the course tasks
+
+def test_hash_consing(debug=False):
+    for s in ['x', 'T', '~p', '(p->q)', '((x+y)<->~(x-&T))']:
+        if debug:
+            print('Testing that equal formulas are interned for', s)
+        f1 = Formula.parse(s)
+        f2 = Formula.parse(s)
+        assert f1 is f2
+        assert hash(f1) == hash(f2)
+    if debug:
+        print('Testing sharing of subformulas')
+    f = Formula('&', Formula('~', Formula('p')), Formula('~', Formula('p')))
+    assert f.first is f.second
+    assert Formula('|', Formula('p'), Formula('q')) != \
+           Formula('|', Formula('q'), Formula('p'))
+    assert Formula('p') != 'p'
+    if debug:
+        print('Testing that copies and unpickled formulas are interned')
+    import copy, pickle
+    f = Formula.parse('((p->q)|~r)')
+    assert copy.deepcopy(f) is f
+    assert pickle.loads(pickle.dumps(f)) is f
+
+def test_metadata(debug=False):
+    for s, size, depth in [('x', 1, 0), ('T', 1, 0), ('~~F', 3, 2),
+                           ('(p|p)', 3, 1), ('((p->q)->(~q->~p))', 9, 3),
+                           ('((x+y)<->~(x-&T))', 8, 3)]:
+        if debug:
+            print('Testing size and depth of', s)
+        f = Formula.parse(s)
+        assert f.size() == size
+        assert f.depth() == depth
+        if debug:
+            print('Testing that metadata of', s, 'is computed once')
+        assert f.variables() is f.variables()
+        assert f.operators() is f.operators()
+        assert str(f) is str(f)
+    if debug:
+        print('Testing metadata of a deep formula')
+    f, expected = Formula('p'), 'p'
+    for i in range(5000):
+        f = Formula('->', Formula('q' + str(i % 7)), f)
+        expected = '(q' + str(i % 7) + '->' + expected + ')'
+    assert f.size() == 10001
+    assert f.depth() == 5000
+    assert f.variables() == {'p'} | {'q' + str(i) for i in range(7)}
+    assert f.operators() == {'->'}
+    assert str(f) == expected
+
+def test_immutability(debug=False):
+    from propositions.proofs import InferenceRule, Proof
+    f = Formula.parse('(p->~q)')
+    rule = InferenceRule([f], Formula('p'))
+    line = Proof.Line(f, rule, [])
+    for obj, field in [(f, 'root'), (f, 'second'), (Formula('p'), 'first'),
+                       (rule, 'conclusion'), (line, 'assumptions')]:
+        if debug:
+            print('Testing that field', field, 'of', obj, 'cannot be assigned')
+        try:
+            setattr(obj, field, None)
+            assert False, 'Assignment to a frozen field succeeded'
+        except Exception as e:
+            assert str(e) == "Cannot assign to field '" + field + \
+                   "' of immutable class '" + type(obj).__name__ + "'"
+        try:
+            delattr(obj, field)
+            assert False, 'Deletion of a frozen field succeeded'
+        except Exception as e:
+            assert str(e) == "Cannot delete field '" + field + \
+                   "' of immutable class '" + type(obj).__name__ + "'"
+        assert not hasattr(obj, '__dict__')
+    if debug:
+        print('Testing concurrent construction of frozen objects')
+    from concurrent.futures import ThreadPoolExecutor
+    def build(i):
+        return InferenceRule([Formula('x' + str(i))], f)
+    with ThreadPoolExecutor(4) as executor:
+        rules = list(executor.map(build, range(200)))
+    for i, rule in enumerate(rules):
+        assert type(rule) is InferenceRule
+        assert str(rule.assumptions[0]) == 'x' + str(i)
+
+def test_parse_error_positions(debug=False):
+    for s, position in [('a', 0), ('~', 1), ('(x&y', 4), ('(x&&y)', 3),
+                        ('(p|x13))', None), ('((p->q)->(~q->~p)->T)', 17),
+                        ('(T)', 2), ('(x|y|z)', 4)]:
+        if debug:
+            print('Testing the error position reported when parsing', s)
+        f, error = Formula.parse_prefix(s)
+        if position is None:
+            assert f is not None and error == ')'
+            assert not Formula.is_formula(s)
+        else:
+            assert f is None
+            assert error.endswith('(at position ' + str(position) + ')'), error
+    if debug:
+        print('Testing parsing of a long formula')
+    n = 20000
+    s = '~' * n + '(' * n + 'p' + ''.join('->q' + str(i) + ')' for i in range(n))
+    f = Formula.parse(s)
+    assert f.size() == 3 * n + 1
+    assert len(f.variables()) == n + 1
+    assert str(f) == s
+
+def test_deep_formulas(debug=False):
+    n = 50000
+    formula = Formula('p')
+    for i in range(n):
+        formula = Formula('~', Formula('->', formula, Formula('q' + str(i % 10))))
+    if debug:
+        print('Testing substitution in a formula of depth', 2 * n)
+    substituted = formula.substitute_variables({'p': Formula.parse('(r|s)')})
+    assert substituted.variables() == \
+           {'r', 's'}.union('q' + str(i) for i in range(10))
+    assert substituted.depth() == 2 * n + 1
+    substituted = formula.substitute_operators(
+        {'->': Formula.parse('(~p|q)')})
+    assert substituted.operators() == {'~', '|'}
+    assert substituted.depth() == 3 * n
+    assert substituted.substitute_operators({}) is substituted
+
+def test_parse_cache(debug=False):
+    from concurrent.futures import ThreadPoolExecutor
+    capacity = parse_cache.capacity
+    try:
+        parse_cache.clear()
+        if debug:
+            print('Testing hits and misses of the parse cache')
+        f = Formula.parse('(p&~q)')
+        assert Formula.parse('(p&~q)') is f
+        info = parse_cache.info()
+        assert (info.hits, info.misses, info.size) == (1, 1, 1), info
+        try:
+            Formula.parse('(p&')
+            failed = False
+        except AssertionError:
+            failed = True
+        assert failed and parse_cache.info().size == 1
+        if debug:
+            print('Testing eviction from the parse cache')
+        parse_cache.capacity = 2
+        parse_cache.clear()
+        for s in ['p', 'q', 'p', '(p&~q)', 'q']:
+            Formula.parse(s)
+        info = parse_cache.info()
+        assert (info.hits, info.misses, info.size) == (1, 4, 2), info
+        parse_cache.capacity = 0
+        Formula.parse('p')
+        assert parse_cache.info().size == 0
+        if debug:
+            print('Testing concurrent use of the parse cache')
+        parse_cache.clear()
+        parse_cache.capacity = 8
+        strings = ['(x' + str(i % 16) + '|~y)' for i in range(2000)]
+        with ThreadPoolExecutor(8) as executor:
+            formulas = list(executor.map(Formula.parse, strings))
+        assert [str(f) for f in formulas] == strings
+        info = parse_cache.info()
+        assert info.hits + info.misses == len(strings) and info.size == 8, info
+    finally:
+        parse_cache.clear()
+        parse_cache.capacity = capacity
+
+def test_polish_round_trip(debug=False):
+    import copy
+    import pickle
+    for infix, polish in [('(x12<->~T)', '<->x12~T'),
+                          ('((p-&q)-|(r->s))', '-|-&pq->rs'),
+                          ('~(p1+(q-|F))', '~+p1-|qF')]:
+        if debug:
+            print('Testing polish round trip of', infix)
+        f = Formula.parse(infix)
+        assert f.polish() == polish
+        assert Formula.parse_polish(polish) is f
+    for polish in ['', '&p', 'p q', '&pq~', '-pq', 'A']:
+        if debug:
+            print('Testing that polish parsing of', repr(polish), 'fails')
+        try:
+            Formula.parse_polish(polish)
+            failed = False
+        except AssertionError:
+            failed = True
+        assert failed
+    n = 50000
+    f = Formula('p')
+    for i in range(n):
+        f = Formula('~', Formula('->', Formula('q' + str(i)), f))
+    if debug:
+        print('Testing polish round trip and pickling of a formula of depth',
+              2 * n)
+    polish = f.polish()
+    assert len(polish) == len(str(f)) - 2 * n
+    assert Formula.parse_polish(polish) is f
+    assert pickle.loads(pickle.dumps(f)) is f
+    assert copy.deepcopy(f) is f
+
 def test_ex1(debug=False):
     test_repr(debug)
     test_variables(debug)
@@ -335,7 +532,17 @@ def test_ex3(debug=False):
     test_substitute_variables(debug)
     test_substitute_operators(debug)
 
+def test_extensions(debug=False):
+    test_hash_consing(debug)
+    test_metadata(debug)
+    test_immutability(debug)
+    test_parse_error_positions(debug)
+    test_deep_formulas(debug)
+    test_parse_cache(debug)
+    test_polish_round_trip(debug)
+
 def test_all(debug=False):
     test_ex1(debug)
     test_ex1_opt(debug)
-    test_ex3(debug) 
+    test_ex3(debug)
+    test_extensions(debug) 
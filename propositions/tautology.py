@@ -5,9 +5,11 @@
 
 """The Tautology Theorem and its implications."""
 
-from typing import List, Union
+from collections import defaultdict
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, \
+                   Union
 
-from logic_utils import frozendict
+from logic_utils import LRUCache, frozendict
 
 from propositions.syntax import *
 from propositions.proofs import *
@@ -62,11 +64,77 @@ def prove_in_model(formula: Formula, model:Model) -> Proof:
     formulae_captured = formulae_capturing_model(model)
     return recursive_prove_in_model(formula, formulae_captured, model)
 
-def recursive_prove_in_model(formula, formulae_captured, model):
+# The proofs built by recursive_prove_in_model are cached by the formula and
+# the part of the model over its variables. The proof of a formula in a model
+# only uses the assumptions capturing that part of the model, so it is reused
+# in every other model that agrees with it, under the assumptions of that
+# model. Since the proofs may be large, each call of prove_in_model,
+# prove_tautology or prove_tautology_by_heuristic uses a cache of its own, of
+# at most this many proofs, which is dropped when the call returns.
+_SUBPROOF_CACHE_CAPACITY = 4096
+
+# A cache of the values of the formulae proven by recursive_prove_in_model,
+# keyed the same way. Its values are truth values, so it is shared by all
+# calls, and can be emptied by evaluation_cache.clear().
+evaluation_cache: LRUCache = LRUCache(16384)
+
+def _model_projection(formula: Formula, model: Model) -> FrozenSet:
     """
-    a helping function which we can recursively call to prove the formula
+    Restricts a model to the variables of a formula
+
+    :param formula: the formula
+    :param model: the model, possibly partial
+    :return: the values in the model of the variables of the formula
+    """
+    return frozenset((variable, model[variable])
+                     for variable in formula.variables() if variable in model)
+
+def _evaluate_cached(formula: Formula, model: Model) -> Optional[bool]:
+    """
+    Evaluates a formula in a possibly partial model, as evaluate_partially
+    does, through evaluation_cache
+
+    :param formula: the formula
+    :param model: the model
+    :return: the value of the formula, or None if the model does not force it
+    """
+    return evaluation_cache.get((formula, _model_projection(formula, model)),
+                                lambda: evaluate_partially(formula, model))
+
+def recursive_prove_in_model(formula, formulae_captured, model,
+                             subproofs=None):
+    """
+    a helping function which we can recursively call to prove the formula,
+    reusing the proofs of the same formula in models that agree on its
+    variables
     :param formula: the given formula
     :param formula_capture: the formulas that capture the model
+    :param model: the model, possibly partial as long as it forces the value of
+        the formula in the three-valued logic of evaluate_partially
+    :param subproofs: the LRUCache of the proofs built so far, or None to use
+        a new one for this call only
+    :return:
+    """
+    if subproofs is None:
+        subproofs = LRUCache(_SUBPROOF_CACHE_CAPACITY)
+    proof = subproofs.get(
+        (formula, _model_projection(formula, model)),
+        lambda: _prove_in_model_uncached(formula, formulae_captured, model,
+                                         subproofs))
+    statement = InferenceRule(formulae_captured, proof.statement.conclusion)
+    if proof.statement == statement:
+        return proof
+    return Proof(statement, proof.rules, proof.lines)
+
+def _prove_in_model_uncached(formula, formulae_captured, model, subproofs):
+    """
+    proves the formula or its negation by its root, without looking up the
+    proof of the formula itself in the cache
+    :param formula: the given formula
+    :param formula_capture: the formulas that capture the model
+    :param model: the model, possibly partial as long as it forces the value of
+        the formula in the three-valued logic of evaluate_partially
+    :param subproofs: the LRUCache of the proofs of the subformulas
     :return:
     """
 
@@ -80,27 +148,27 @@ def recursive_prove_in_model(formula, formulae_captured, model):
                                        lines=[Proof.Line(Formula('~',formula))])
 
     elif is_unary(formula.root):  # ~ case
-        if evaluate(formula, model):
-            return recursive_prove_in_model(formula.first, formulae_captured, model)
+        if _evaluate_cached(formula, model):
+            return recursive_prove_in_model(formula.first, formulae_captured, model, subproofs)
         else:  # prove the negation
-            negation_proof = recursive_prove_in_model(formula.first, formulae_captured, model)
+            negation_proof = recursive_prove_in_model(formula.first, formulae_captured, model, subproofs)
             return prove_corollary(negation_proof, Formula('~', formula), NN)
 
     elif is_binary(formula.root):  # -> case
-        if evaluate(formula, model):
+        if _evaluate_cached(formula, model):
             # either first is false or second is true
-            if evaluate(formula.first, model) is False:
+            if _evaluate_cached(formula.first, model) is False:
                 # We can prove ~first recursively
-                prove_not_first = recursive_prove_in_model(Formula('~', formula.first), formulae_captured, model)
+                prove_not_first = recursive_prove_in_model(Formula('~', formula.first), formulae_captured, model, subproofs)
                 return prove_corollary(prove_not_first, formula, I2)
             else:
                 # second must be true, so we prove it
-                prove_second = recursive_prove_in_model(formula.second, formulae_captured, model)
+                prove_second = recursive_prove_in_model(formula.second, formulae_captured, model, subproofs)
                 return prove_corollary(prove_second, formula, I1)
         else:  # formula is false meaning we need to prove ~formula
             # prove first and not second, combine to prove ~formula
-            prove_first = recursive_prove_in_model(formula.first, formulae_captured, model)
-            prove_not_second = recursive_prove_in_model(formula.second, formulae_captured, model)
+            prove_first = recursive_prove_in_model(formula.first, formulae_captured, model, subproofs)
+            prove_not_second = recursive_prove_in_model(formula.second, formulae_captured, model, subproofs)
             return combine_proofs(prove_first, prove_not_second, Formula('~', formula), NI)
 
 
@@ -152,7 +220,10 @@ def reduce_assumption(proof_from_affirmation: Proof,
 
 def prove_tautology(tautology: Formula, model: Model = frozendict()) -> Proof:
     """Proves the given tautology from the formulae that capture the given
-    model.
+    model. The proof splits into cases on the values of the remaining variables
+    in alphabetical order, but stops splitting as soon as the values fixed so
+    far force the value of the tautology, so it may split on fewer variables
+    than the tautology has.
 
     Parameters:
         tautology: tautology that contains no constants or operators beyond
@@ -180,33 +251,209 @@ def prove_tautology(tautology: Formula, model: Model = frozendict()) -> Proof:
         unfrozen_model = {key: val for key, val in model.items()}
     else:
         unfrozen_model = {}
-    formulae_captured = formulae_capturing_model(model)
-    return recursive_tautology(tautology, unfrozen_model, formulae_captured, len(formulae_captured))
+    return recursive_tautology(tautology, unfrozen_model,
+                               LRUCache(_SUBPROOF_CACHE_CAPACITY))
 
-def recursive_tautology(tautology, model, formulae_captured, cur_index):
+def recursive_tautology(tautology, model, subproofs):
     """
-    helper function to recursively call the prove_tautology func
-    :param model: the given model
-    :param formulae_captured:  the formulae captured by the model
-    :return: proof of the tautology
+    helper function to recursively call the prove_tautology func. it splits on
+    the first variable (alphabetically) not in the model, and stops as soon as
+    the partial model forces the value of the tautology
+    :param tautology: the given tautology
+    :param model: the given model, over a prefix of the variables of the
+        tautology, restored before returning
+    :param subproofs: the LRUCache of the proofs built by
+        recursive_prove_in_model during the current proof
+    :return: proof of the tautology from the formulae captured by the model
     """
-    if set(tautology.variables()) == set(model.keys()):  # proof can be built over the model
-        return prove_in_model(tautology, model)
+    if evaluate_partially(tautology, model):
+        # the model forces the value of the tautology, whatever the values of
+        # the remaining variables, so the proof can be built over the model
+        return recursive_prove_in_model(
+            tautology, formulae_capturing_model(model), model, subproofs)
     else:
         vars = sorted([var for var in tautology.variables()])
         # to remove assumptions, we'll use reduce assumptions.
         # every time we find a variable not in the model we'll prove the affirmation and negation to remove it
 
-        model[vars[cur_index]] = True
-        affirmation = recursive_tautology(tautology, model, formulae_captured, cur_index+1)
+        variable = vars[len(model)]
+        model[variable] = True
+        affirmation = recursive_tautology(tautology, model, subproofs)
 
-        model[vars[cur_index]] = False
-        negation = recursive_tautology(tautology, model, formulae_captured, cur_index+1)
+        model[variable] = False
+        negation = recursive_tautology(tautology, model, subproofs)
 
-        model.pop(vars[cur_index])  # remove the variable from the model
+        model.pop(variable)  # remove the variable from the model
         return reduce_assumption(affirmation, negation)
 
 
+def _variable_occurrences(formula: Formula) -> Dict[str, int]:
+    """
+    Counts the occurrences of each variable in the tree of a formula, each
+    shared subformula once per occurrence
+
+    :param formula: the formula
+    :return: the number of occurrences of each variable of the formula
+    """
+    # order the distinct subformulas so that each follows all of its parents,
+    # then pass down the number of paths from the root to each
+    order = []
+    visited = set()
+    stack = [(formula, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            order.append(node)
+            continue
+        if node in visited:
+            continue
+        visited.add(node)
+        stack.append((node, True))
+        for child in (node.first, node.second) if is_binary(node.root) else \
+                     (node.first,) if is_unary(node.root) else ():
+            if child not in visited:
+                stack.append((child, False))
+    paths = defaultdict(int)
+    paths[formula] = 1
+    occurrences = defaultdict(int)
+    for node in reversed(order):
+        if is_variable(node.root):
+            occurrences[node.root] += paths[node]
+        elif is_unary(node.root):
+            paths[node.first] += paths[node]
+        elif is_binary(node.root):
+            paths[node.first] += paths[node]
+            paths[node.second] += paths[node]
+    return dict(occurrences)
+
+#: The names of the branching heuristics of `prove_tautology_by_heuristic`.
+BRANCHING_HEURISTICS = ('alphabetical', 'frequency', 'dynamic')
+
+def prove_tautology_by_heuristic(
+        tautology: Formula, model: Model = frozendict(),
+        heuristic: Union[str, Sequence[str]] = 'dynamic') -> Proof:
+    """Proves the given tautology from the formulae that capture the given
+    model, like `prove_tautology`, but by splitting on the remaining variables
+    in an order chosen by the given heuristic.
+
+    Parameters:
+        tautology: tautology that contains no constants or operators beyond
+            ``'->'`` and ``'~'``, to prove.
+        model: model over any of the variables of `tautology`, from whose
+            formulae to prove.
+        heuristic: the order of the variables to split on: ``'alphabetical'``
+            for that of `prove_tautology`, ``'frequency'`` for the variables
+            occurring most often in the tautology first, ``'dynamic'`` for
+            the variable whose values force the value of the tautology in most
+            cases, chosen anew in each case and then by frequency, or a list of
+            all variables of the tautology in the order to split on them.
+
+    Returns:
+        A valid proof of the given tautology from the formulae that capture the
+        given model, in the order returned by
+        `formulae_capturing_model`\ ``(``\ `model`\ ``)``, via
+        `~propositions.axiomatic_systems.AXIOMATIC_SYSTEM`. The size of the
+        proof, the number of its lines, depends on the order in which the
+        remaining variables are split on, and can be compared between
+        heuristics by `branching_proof_sizes`.
+
+    Raises:
+        ValueError: If the given heuristic is a string that is not one of
+            `BRANCHING_HEURISTICS`.
+    """
+    assert is_tautology(tautology)
+    assert tautology.operators().issubset({'->', '~'})
+    assert is_model(model)
+    if isinstance(heuristic, str) and heuristic not in BRANCHING_HEURISTICS:
+        raise ValueError('Unknown branching heuristic ' + repr(heuristic) +
+                         ', expected one of ' +
+                         ', '.join(map(repr, BRANCHING_HEURISTICS)) +
+                         ' or a list of variables')
+    variables = tautology.variables()
+    occurrences = _variable_occurrences(tautology)
+    if heuristic == 'alphabetical':
+        order = sorted(variables)
+    elif heuristic in ('frequency', 'dynamic'):
+        order = sorted(variables,
+                       key=lambda variable: (-occurrences[variable], variable))
+    else:
+        order = list(heuristic)
+        assert set(order) == variables
+    order = [variable for variable in order if variable not in model]
+
+    def choose(model: Dict[str, bool]) -> str:
+        remaining = [variable for variable in order if variable not in model]
+        if heuristic != 'dynamic':
+            return remaining[0]
+        # the most forcing variable, the most frequent first among equals
+        def forced(variable: str) -> int:
+            count = 0
+            for value in (True, False):
+                model[variable] = value
+                if evaluate_partially(tautology, model) is not None:
+                    count += 1
+            del model[variable]
+            return count
+        return max(remaining, key=forced)
+
+    return _prove_by_splitting(tautology, dict(model),
+                               list(formulae_capturing_model(model)), choose,
+                               LRUCache(_SUBPROOF_CACHE_CAPACITY))
+
+def _prove_by_splitting(tautology: Formula, model: Dict[str, bool],
+                        assumptions: List[Formula],
+                        choose: Callable[[Dict[str, bool]], str],
+                        subproofs: LRUCache) -> Proof:
+    """
+    Proves a tautology by splitting on variables until the model forces its
+    value
+
+    :param tautology: the tautology to prove
+    :param model: the values of the variables split on so far, including
+        those of the given model, restored before returning
+    :param assumptions: the formulae capturing the model, in the order of the
+        assumptions of the proof
+    :param choose: function choosing the variable to split on next in the
+        given model
+    :param subproofs: the cache of the proofs built by
+        recursive_prove_in_model during the current proof
+    :return: a proof of the tautology from the given assumptions
+    """
+    if evaluate_partially(tautology, model):
+        return recursive_prove_in_model(tautology, assumptions, model,
+                                        subproofs)
+    variable = choose(model)
+    model[variable] = True
+    affirmation = _prove_by_splitting(
+        tautology, model, assumptions + [Formula(variable)], choose,
+        subproofs)
+    model[variable] = False
+    negation = _prove_by_splitting(
+        tautology, model, assumptions + [Formula('~', Formula(variable))],
+        choose, subproofs)
+    del model[variable]
+    return reduce_assumption(affirmation, negation)
+
+def branching_proof_sizes(
+        tautology: Formula,
+        heuristics: Sequence[Union[str, Sequence[str]]] =
+            BRANCHING_HEURISTICS) -> List[int]:
+    """Measures the proofs of the given tautology by each of the given
+    heuristics of `prove_tautology_by_heuristic`.
+
+    Parameters:
+        tautology: tautology that contains no constants or operators beyond
+            ``'->'`` and ``'~'``, to prove.
+        heuristics: heuristics to prove the tautology by.
+
+    Returns:
+        The number of lines of the proof of the given tautology from no
+        assumptions by each of the given heuristics, in order.
+    """
+    return [len(prove_tautology_by_heuristic(tautology,
+                                             heuristic=heuristic).lines)
+            for heuristic in heuristics]
+
 def proof_or_counterexample(formula: Formula) -> Union[Proof, Model]:
     """Either proves the given formula or finds a model in which it does not
     hold.
@@ -222,14 +469,12 @@ def proof_or_counterexample(formula: Formula) -> Union[Proof, Model]:
     """
     assert formula.operators().issubset({'->', '~'})
     # Task 6.3b
-    models = all_models(formula.variables())
-    if is_tautology(formula):
+    counterexample = satisfying_model([Formula('~', formula)])
+    if counterexample is None:
         #  we can prove a tautology over any model
         return prove_tautology(formula)
     else: # formula isn't a tautology hence there is a model over which it does not hold.
-        for model in models:
-            if not evaluate(formula, model):
-                return model
+        return counterexample
 
 
 def encode_as_formula(rule: InferenceRule) -> Formula:
@@ -303,14 +548,9 @@ def model_or_inconsistency(formulae: List[Formula]) -> Union[Model, Proof]:
     for formula in formulae:
         assert formula.operators().issubset({'->', '~'})
     # Task 6.5
-    variable_set = set()
-    for formula in formulae:
-        variable_set = variable_set | formula.variables()
-    models = all_models(list(variable_set))
-    for model in models:
-        truth_table = [evaluate(formula, model) for formula in formulae]
-        if not truth_table.__contains__(False):
-            return model
+    model = satisfying_model(formulae)  # search with the SAT solver rather than over all models
+    if model is not None:
+        return model
     return prove_sound_inference(InferenceRule(formulae, Formula.parse('~(p->p)')))
 
 
@@ -5,7 +5,7 @@
 
 """Tests for the propositions.tautology module."""
 
-from logic_utils import frozendict
+from logic_utils import LRUCache, frozendict
 
 from propositions.syntax import *
 from propositions.semantics import *
@@ -248,6 +248,118 @@ def test_prove_in_model_full(debug=False):
         assert p.rules == AXIOMATIC_SYSTEM_FULL
         assert p.is_valid(), offending_line(p)
            
+# Tests for extensions beyond the course tasks
+
+def test_prove_tautology_short_circuit(debug=False):
+    tautology = Formula('p')
+    for i in range(20, 0, -1):
+        tautology = Formula('->', Formula('q' + str(i)), tautology)
+    tautology = Formula('->', Formula('p'), tautology)
+    if debug:
+        print('Testing prove_tautology on', tautology)
+    proof = prove_tautology(tautology)
+    assert proof.statement == InferenceRule([], tautology)
+    assert proof.is_valid(), offending_line(proof)
+    # a case split on p alone, instead of on all 21 variables
+    assert len(proof.lines) < 200
+
+    for t, m in [['(~(p->q)->(q->r))', {'p': False}],
+                 ['((p->q)->((q->r)->(p->r)))', {'p': False}],
+                 ['((p->q)->((q->r)->(p->r)))', {'p': True, 'q': False}],
+                 ['(~~p->p)', {}]]:
+        tautology = Formula.parse(t)
+        if debug:
+            print('Testing prove_tautology on', tautology, 'in model', m)
+        proof = prove_tautology(tautology, frozendict(m))
+        assert proof.statement == \
+               InferenceRule(formulae_capturing_model(m), tautology)
+        assert proof.is_valid(), offending_line(proof)
+
+def test_prove_tautology_by_heuristic(debug=False):
+    for t in ['(p->p)', '(~(p->q)->(q->r))', '(((p->q)->p)->p)',
+              '((p->q)->((q->r)->(p->r)))', '((r->(q->p))->(r->(q->p)))']:
+        tautology = Formula.parse(t)
+        orders = list(BRANCHING_HEURISTICS) + \
+                 [sorted(tautology.variables(), reverse=True)]
+        for heuristic in orders:
+            if debug:
+                print('Testing prove_tautology_by_heuristic on', tautology,
+                      'with heuristic', heuristic)
+            proof = prove_tautology_by_heuristic(tautology,
+                                                 heuristic=heuristic)
+            assert proof.statement == InferenceRule([], tautology)
+            assert proof.rules == AXIOMATIC_SYSTEM
+            assert proof.is_valid(), offending_line(proof)
+        sizes = branching_proof_sizes(tautology, orders)
+        assert sizes[0] == len(prove_tautology(tautology).lines)
+        assert all(size > 0 for size in sizes)
+
+    tautology = Formula.parse('(~(p->q)->(q->r))')
+    if debug:
+        print('Testing prove_tautology_by_heuristic on', tautology,
+              'in a model not over a prefix of the variables')
+    for heuristic in BRANCHING_HEURISTICS:
+        proof = prove_tautology_by_heuristic(
+            tautology, frozendict({'r': False}), heuristic)
+        assert proof.statement == \
+               InferenceRule([Formula.parse('~r')], tautology)
+        assert proof.is_valid(), offending_line(proof)
+
+    for heuristic in ['bdd', 'Frequency']:
+        if debug:
+            print('Testing prove_tautology_by_heuristic with the unknown '
+                  'heuristic', heuristic)
+        try:
+            prove_tautology_by_heuristic(tautology, heuristic=heuristic)
+            assert False, 'An unknown heuristic was accepted'
+        except ValueError as e:
+            assert repr(heuristic) in str(e)
+    # q occurs most often, and its values force the value of the tautology
+    sizes = branching_proof_sizes(tautology)
+    assert sizes[1] < sizes[0] and sizes[2] < sizes[0]
+
+def test_subproof_cache(debug=False):
+    tautology = Formula.parse('((p->(q->r))->((p->q)->(p->r)))')
+    subproofs = LRUCache(4096)
+    if debug:
+        print('Testing recursive_tautology on', tautology,
+              'with a subproof cache')
+    proof = recursive_tautology(tautology, {}, subproofs)
+    assert proof.is_valid(), offending_line(proof)
+    # some subproof is shared by models that differ on a variable it lacks
+    assert subproofs.info().hits > 0
+    # the same proof as prove_tautology, with a cache of its own
+    assert str(proof) == str(prove_tautology(tautology))
+
+    # a proof cached in one model is reused under the assumptions of another
+    subproofs = LRUCache(4096)
+    formula = Formula.parse('(p->q)')
+    for model in [{'p': True, 'q': False, 'r': False},
+                  {'p': True, 'q': False, 'r': True}]:
+        if debug:
+            print('Testing recursive_prove_in_model on', formula, 'in model',
+                  model)
+        proof = recursive_prove_in_model(
+            formula, formulae_capturing_model(model), model, subproofs)
+        assert proof.statement == \
+               InferenceRule(formulae_capturing_model(model),
+                             Formula('~', formula))
+        assert proof.is_valid(), offending_line(proof)
+    assert subproofs.info().hits > 0
+
+    if debug:
+        print('Testing recursive_tautology on', tautology,
+              'with a small subproof cache')
+    subproofs = LRUCache(8)
+    proof = recursive_tautology(tautology, {}, subproofs)
+    assert proof.is_valid(), offending_line(proof)
+    assert subproofs.info().size <= 8
+
+def test_tautology_extensions(debug=False):
+    test_prove_tautology_short_circuit(debug)
+    test_prove_tautology_by_heuristic(debug)
+    test_subproof_cache(debug)
+
 def test_ex6(debug=False):
     test_formulae_capturing_model(debug)
     test_prove_in_model(debug)
@@ -264,3 +376,4 @@ def test_ex6_opt(debug=False):
 def test_all(debug=False):
     test_ex6(debug)
     test_ex6_opt(debug)
+    test_tautology_extensions(debug)
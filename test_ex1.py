@@ -31,11 +31,15 @@ def test_task7(debug=False):
 def test_task8(debug=False):
     test_parse_polish()
 
+def test_extension_tasks(debug=False):
+    test_extensions(debug)
+
 test_task1(True)
 test_task2(True)
 test_task3(True)
 test_task4(True)
 test_task5(True)
 test_task6(True)
-# test_task7(True) # Optional
-# test_task8(True) # Optional
+test_task7(True) # Optional
+test_task8(True) # Optional
+test_extension_tasks(True)
@@ -6,6 +6,9 @@
 """Tests all Chapter 2 tasks."""
 
 from propositions.semantics_test import *
+from propositions.sat_test import test_sat
+from propositions.bdd_test import test_bdd
+from propositions.parallel_test import test_parallel
 
 def test_task1(debug=False):
     test_evaluate(debug)
@@ -30,6 +33,12 @@ def test_task6(debug=False):
 def test_task7(debug=False):
     test_synthesize(debug)
 
+def test_extension_tasks(debug=False):
+    test_semantics_extensions(debug)
+    test_sat(debug)
+    test_bdd(debug)
+    test_parallel(debug)
+
 test_task1(True)
 test_task2(True)
 test_task3(True)
@@ -37,3 +46,4 @@ test_task4(True)
 test_task5(True)
 test_task6(True)
 test_task7(True)
+test_extension_tasks(True)
@@ -8,6 +8,8 @@
 from propositions.syntax_test import *
 from propositions.semantics_test import *
 from propositions.operators_test import *
+from propositions.normal_forms_test import test_normal_forms
+from propositions.simplification_test import test_simplification
 
 def test_before_tasks(debug=False):
     assert is_binary('+'), 'Change is_binary() before testing Chapter 3 tasks.'
@@ -58,6 +60,10 @@ def test_task6c(debug=False):
 def test_task6d(debug=False):
     test_to_implies_false(debug)
 
+def test_extension_tasks(debug=False):
+    test_normal_forms(debug)
+    test_simplification(debug)
+
 test_before_tasks(True)    
 test_task1(True)
 test_task2(True)
@@ -68,3 +74,4 @@ test_task6a(True)
 test_task6b(True)
 test_task6c(True)
 test_task6d(True)
+test_extension_tasks(True)
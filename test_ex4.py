@@ -38,6 +38,9 @@ def test_task7(debug=False):
 def test_task8(debug=False):
     test_prove_I0(debug)
 
+def test_extension_tasks(debug=False):
+    test_proofs_extensions(debug)
+
 test_task1(True)
 test_task2(True)
 test_task3(True)
@@ -46,3 +49,4 @@ test_task5(True)
 test_task6(True)
 test_task7(True)
 test_task8(True)
+test_extension_tasks(True)
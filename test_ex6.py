@@ -8,6 +8,7 @@
 from propositions.proofs_test import test_is_valid
 from propositions.tautology_test import *
 from propositions.some_proofs_test import *
+from propositions.serialization_test import test_serialization
 
 def pretest_validity(debug=False):
     test_is_valid(debug)
@@ -50,6 +51,10 @@ def test_task9(debug=False):
     test_prove_NA2(debug)
     test_prove_NO(debug)
 
+def test_extension_tasks(debug=False):
+    test_serialization(debug)
+    test_tautology_extensions(debug)
+
 pretest_validity(False)
 test_task1(True)
 test_task2(True)
@@ -60,3 +65,4 @@ test_task5(True)
 #test_task7(True) # Optional
 #test_task8(True) # Optional
 #test_task9(True) # Optional
+test_extension_tasks(True)
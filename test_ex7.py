@@ -43,6 +43,10 @@ def test_task8(debug=False):
 def test_task9(debug=False):
     test_is_model_of(debug)
 
+def test_extension_tasks(debug=False):
+    test_extensions(debug)
+    test_semantics_extensions(debug)
+
 test_task1(True)
 test_task2(True)
 test_task3(True)
@@ -52,3 +56,4 @@ test_task6(True)
 test_task7(True)
 test_task8(True)
 test_task9(True)
+test_extension_tasks(True)
@@ -7,6 +7,7 @@
 
 from predicates.syntax_test import *
 from predicates.proofs_test import *
+from predicates.serialization_test import test_serialization
 
 def test_task1(debug=False):
     test_term_substitute(debug)
@@ -48,6 +49,9 @@ def test_task11(debug=False):
 def test_task12(debug=False):
     test_prove_tautology(debug)
 
+def test_extension_tasks(debug=False):
+    test_serialization(debug)
+
 test_task1(True)
 test_task2(True)
 test_task3(True)
@@ -61,3 +65,4 @@ test_combined(True)
 test_task10(True)
 test_task11(True)
 test_task12(True)
+test_extension_tasks(True)